@@ -0,0 +1,113 @@
+"""
+Compares the old five minute window with the dispatch watermark: the time to find
+new events, then how many messages two rounds of overlapping scheduled runs
+publish for a backlog of 2000 events. Runs against the database in the usual environment
+variables, with a stand-in SNS client, and removes its alert_dispatch row at the
+end. Fill the event table first with database/synthetic.py and create the tables
+in database/schema.sql, then run from this folder: python bench_dispatch.py
+"""
+from collections import Counter
+from statistics import median
+from threading import Barrier, Thread
+from time import perf_counter
+
+from db_queries import get_pg_connection, fetch_earthquakes_after
+from poll_service import handle_recent_earthquakes
+
+TOPIC_ARN = "arn:bench-dispatch"
+BACKLOG = 2000
+RUNS = 50
+
+WINDOW_QUERY = """
+    SELECT e.event_id, c.country_name
+    FROM public.event e
+    LEFT JOIN public.country c
+    ON e.country_id = c.country_id
+    WHERE e.creation_time >= (NOW() AT TIME ZONE 'utc') - INTERVAL '5 MINUTES'
+    ORDER BY e.creation_time ASC;
+"""
+
+
+class CountingSNS:
+    """Counts the messages published."""
+
+    def __init__(self, counts: Counter):
+        self.counts = counts
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        """Counts the batch's messages."""
+        self.counts["published"] += len(PublishBatchRequestEntries)
+        return {"Failed": []}
+
+
+def median_ms(func) -> float:
+    """Median run time of func in milliseconds."""
+    timings = []
+    for _ in range(RUNS):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+def window_query(conn) -> None:
+    """The query every run made before."""
+    with conn.cursor() as cur:
+        cur.execute(WINDOW_QUERY)
+        cur.fetchall()
+
+
+def set_backlog(conn, size: int) -> None:
+    """Puts the bench topic's watermark size events behind the newest."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO alert_dispatch (topic_arn, last_event_id)
+            SELECT %(topic_arn)s, event_id FROM event ORDER BY event_id DESC OFFSET %(size)s LIMIT 1
+            ON CONFLICT (topic_arn) DO UPDATE SET last_event_id = EXCLUDED.last_event_id;
+        """, {"topic_arn": TOPIC_ARN, "size": size})
+    conn.commit()
+
+
+def overlapping_runs(conns: list, counts: Counter) -> list[dict]:
+    """Starts one alerts run per connection at the same moment."""
+    barrier = Barrier(len(conns))
+    results = [None] * len(conns)
+
+    def run(index):
+        barrier.wait()
+        results[index] = handle_recent_earthquakes(
+            conns[index], CountingSNS(counts), TOPIC_ARN, subscribe_every_time=False)
+
+    threads = [Thread(target=run, args=(index,)) for index in range(len(conns))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+if __name__ == "__main__":
+    conns = [get_pg_connection(), get_pg_connection()]
+    conn = conns[0]
+    try:
+        set_backlog(conn, 0)
+        window_ms = median_ms(lambda: window_query(conn))
+        seek_ms = median_ms(lambda: fetch_earthquakes_after(conn, 10**12, 100))
+        conn.rollback()
+        print(f"find new events: window {window_ms:.2f} ms, watermark seek {seek_ms:.2f} ms")
+
+        set_backlog(conn, BACKLOG)
+        counts = Counter()
+        for round_ in (1, 2):
+            start = perf_counter()
+            results = overlapping_runs(conns, counts)
+            ms = (perf_counter() - start) * 1000
+            print(f"overlapping runs, round {round_}: "
+                  f"{[r['published_events'] for r in results]} published in {ms:.0f} ms")
+        print(f"{counts['published']} messages for a backlog of {BACKLOG} events")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM alert_dispatch WHERE topic_arn = %s;", (TOPIC_ARN,))
+        conn.commit()
+        for c in conns:
+            c.close()
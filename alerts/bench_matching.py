@@ -0,0 +1,63 @@
+"""
+Times finding the recipients of bursts of earthquakes among 100k subscribers,
+checking every subscriber with matches as a nested loop would against the
+SubscriberIndex lookups, and checks both pick the same subscribers.
+Run from this folder: python bench_matching.py
+"""
+import random
+from time import perf_counter
+
+from classes import EarthquakeEvent, Subscriber
+from preferences import SubscriberIndex, matches
+
+SUBSCRIBERS = 100_000
+BURSTS = [10, 100, 1000]
+# The nested loop is only timed up to this burst size, about 10M calls.
+MAX_NESTED_BURST = 100
+COUNTRIES = 250
+
+
+def synthetic_subscribers(count: int, rng: random.Random) -> list[Subscriber]:
+    """Subscribers, a third for any country and a third for any magnitude."""
+    return [Subscriber(i, "Subscriber", f"s{i}@example.com", False,
+                       None if rng.random() < 1 / 3 else rng.randrange(COUNTRIES),
+                       None if rng.random() < 1 / 3 else round(rng.uniform(0, 7), 1))
+            for i in range(count)]
+
+
+def synthetic_events(count: int, rng: random.Random) -> list[EarthquakeEvent]:
+    """Events with the skew of the event table towards small magnitudes."""
+    return [EarthquakeEvent(i, rng.randrange(COUNTRIES), round(rng.expovariate(1 / 1.5), 1),
+                            "2026-02-06T00:00:00Z")
+            for i in range(count)]
+
+
+def nested_loop(subs: list[Subscriber], events: list[EarthquakeEvent]) -> list[list]:
+    """Every subscriber checked against every event."""
+    return [[sub for sub in subs if matches(sub, ev)] for ev in events]
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    subs = synthetic_subscribers(SUBSCRIBERS, rng)
+
+    start = perf_counter()
+    index = SubscriberIndex(subs)
+    print(f"index of {SUBSCRIBERS:,} subscribers built in {(perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"{'burst':>6}{'recipients':>12}{'nested ms':>11}{'index ms':>10}")
+    for size in BURSTS:
+        events = synthetic_events(size, rng)
+        start = perf_counter()
+        found = [index.recipients(ev) for ev in events]
+        index_ms = (perf_counter() - start) * 1000
+        recipients = sum(len(subs_found) for subs_found in found)
+
+        nested = "-"
+        if size <= MAX_NESTED_BURST:
+            start = perf_counter()
+            expected = nested_loop(subs, events)
+            nested = f"{(perf_counter() - start) * 1000:.0f}"
+            assert all(sorted(s.subscriber_id for s in a) == [s.subscriber_id for s in b]
+                       for a, b in zip(found, expected))
+        print(f"{size:>6}{recipients:>12,}{nested:>11}{index_ms:>10.1f}")
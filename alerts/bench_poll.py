@@ -0,0 +1,141 @@
+"""
+Times a scheduled alerts run for bursts of 1, 100 and 1000 new earthquakes, looking
+country names up one event at a time as before against the process-level country
+names, loaded once per process, with and without a simulated network round trip to the database.
+Runs against the database in the usual environment variables, inside a
+transaction that is rolled back, with a stand-in SNS client. Fill the event table
+first with database/synthetic.py and create the tables in database/schema.sql,
+then run from this folder: python bench_poll.py
+"""
+from dataclasses import replace
+from time import perf_counter, sleep
+
+from bench_publish import publish_event_once
+from db_queries import get_pg_connection, fetch_earthquakes_after
+from formatting import format_subject, format_body
+from poll_service import handle_recent_earthquakes
+
+BURSTS = [1, 100, 1000]
+ROUND_TRIPS_MS = [0.0, 1.0]
+
+
+class RoundTripCursor:
+    """Cursor that waits round_trip_ms before each query, like a remote database."""
+
+    def __init__(self, cursor, round_trip_ms: float, counter: list):
+        self.cursor = cursor
+        self.round_trip_ms = round_trip_ms
+        self.counter = counter
+
+    def execute(self, query, params=None):
+        """Runs the query after the round trip."""
+        self.counter[0] += 1
+        sleep(self.round_trip_ms / 1000)
+        return self.cursor.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cursor.close()
+
+
+class RoundTripConnection:
+    """Connection whose cursors are RoundTripCursors."""
+
+    def __init__(self, conn, round_trip_ms: float):
+        self.conn = conn
+        self.round_trip_ms = round_trip_ms
+        self.queries = [0]
+
+    def cursor(self):
+        """A cursor that counts and delays its queries."""
+        return RoundTripCursor(self.conn.cursor(), self.round_trip_ms, self.queries)
+
+    def commit(self):
+        """Leaves every change to the rollback at the end of the benchmark."""
+
+
+class StandInSNS:
+    """Records when the first and last messages are published."""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.first_ms = None
+        self.last_ms = None
+
+    def list_subscriptions_by_topic(self, **kwargs):
+        """An empty topic."""
+        return {"Subscriptions": []}
+
+    def publish(self, **kwargs):
+        """Notes the publish time."""
+        self.last_ms = (perf_counter() - self.start) * 1000
+        if self.first_ms is None:
+            self.first_ms = self.last_ms
+
+    def publish_batch(self, **kwargs):
+        """Notes the publish time of a batch."""
+        self.publish()
+        return {"Failed": []}
+
+
+def country_name_per_event(conn, country_id: int) -> str:
+    """The original lookup, one query per event."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT country_name FROM public.country WHERE country_id = %s LIMIT 1;",
+                    (country_id,))
+        row = cur.fetchone()
+    return str(row[0]) if row and row[0] is not None else None
+
+
+def before_run(conn, sns, after_event_id: int, size: int) -> None:
+    """The original loop: a country name query before each publish."""
+    for ev in fetch_earthquakes_after(conn, after_event_id, size):
+        ev = replace(ev, country_name=country_name_per_event(conn, ev.country_id))
+        publish_event_once(sns, topic_arn="arn:topic", subject=format_subject(ev),
+                           body=format_body(ev), country_id=ev.country_id,
+                           magnitude=ev.magnitude)
+
+
+def after_run(conn, sns, after_event_id: int, size: int) -> None:
+    """The run as it is now, without subscription changes."""
+    handle_recent_earthquakes(conn, sns_client=sns, topic_arn="arn:topic",
+                              subscribe_every_time=False)
+
+
+def start_burst(conn, size: int) -> int:
+    """
+    Sets the topic's dispatch watermark size events behind the newest, so the
+    next run has that many to publish, and returns it.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO alert_dispatch (topic_arn, last_event_id)
+            SELECT 'arn:topic', event_id FROM event ORDER BY event_id DESC OFFSET %(size)s LIMIT 1
+            ON CONFLICT (topic_arn) DO UPDATE SET last_event_id = EXCLUDED.last_event_id
+            RETURNING last_event_id;
+        """, {"size": size})
+        return cur.fetchone()[0]
+
+
+if __name__ == "__main__":
+    conn = get_pg_connection()
+    print(f"{'burst':>6}{'rtt ms':>8}  {'path':<8}{'queries':>8}{'first ms':>10}{'last ms':>10}")
+    try:
+        for size in BURSTS:
+            for round_trip_ms in ROUND_TRIPS_MS:
+                for name, run in (("before", before_run), ("after", after_run)):
+                    after_event_id = start_burst(conn, size)
+                    timed_conn = RoundTripConnection(conn, round_trip_ms)
+                    sns = StandInSNS(perf_counter())
+                    run(timed_conn, sns, after_event_id, size)
+                    print(f"{size:>6}{round_trip_ms:>8.1f}  {name:<8}{timed_conn.queries[0]:>8}"
+                          f"{sns.first_ms:>10.1f}{sns.last_ms:>10.1f}")
+            conn.rollback()
+    finally:
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,88 @@
+"""
+Times publishing bursts of 100 and 1000 alerts one Publish call at a time, as
+before, against PublishBatch calls sent by the worker pool, with a stand-in SNS
+that takes 20 ms per call and fails 5% of batch entries once. Checks that every
+alert is delivered once and that each failed entry is sent again exactly once.
+Run from this folder: python bench_publish.py
+"""
+import random
+from collections import Counter
+from threading import Lock
+from time import perf_counter, sleep
+
+from sns_client import message_attributes, publish_entry, publish_events
+
+BURSTS = [100, 1000]
+CALL_MS = 20
+FAILURE_RATE = 0.05
+
+
+class StandInSNS:
+    """SNS with a fixed latency per call that fails some batch entries once."""
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+        self.lock = Lock()
+        self.calls = 0
+        self.delivered = Counter()
+        self.sent = Counter()
+        self.failed_once = set()
+
+    def publish(self, **kwargs):
+        """Delivers one message."""
+        sleep(CALL_MS / 1000)
+        with self.lock:
+            self.calls += 1
+            self.delivered[kwargs["Subject"]] += 1
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        """Delivers the batch, failing each entry not failed before at FAILURE_RATE."""
+        sleep(CALL_MS / 1000)
+        failed = []
+        with self.lock:
+            self.calls += 1
+            for entry in PublishBatchRequestEntries:
+                self.sent[entry["Id"]] += 1
+                if entry["Id"] not in self.failed_once and self.random.random() < FAILURE_RATE:
+                    self.failed_once.add(entry["Id"])
+                    failed.append({"Id": entry["Id"], "Code": "InternalError",
+                                   "SenderFault": False})
+                else:
+                    self.delivered[entry["Subject"]] += 1
+        return {"Failed": failed}
+
+
+def publish_event_once(sns, topic_arn: str, subject: str, body: str, country_id: int,
+                       magnitude: float) -> None:
+    """The original publish, one Publish call per event."""
+    sns.publish(TopicArn=topic_arn, Subject=subject[:100], Message=body,
+                MessageAttributes=message_attributes(country_id, magnitude))
+
+
+def before_run(sns, size: int) -> None:
+    """The original loop: one Publish call per alert."""
+    for i in range(size):
+        publish_event_once(sns, "arn:topic", subject=str(i), body="Body", country_id=81,
+                           magnitude=3.0)
+
+
+def after_run(sns, size: int) -> list:
+    """PublishBatch calls from the worker pool, with retries."""
+    return publish_events(sns, "arn:topic",
+                          [publish_entry(i, str(i), "Body", 81, 3.0) for i in range(size)])
+
+
+if __name__ == "__main__":
+    print(f"{'burst':>6}  {'path':<8}{'calls':>7}{'ms':>9}{'msgs/s':>9}"
+          f"{'failed once':>13}{'resent':>8}{'lost':>6}{'dupes':>7}")
+    for size in BURSTS:
+        for name, run in (("before", before_run), ("after", after_run)):
+            sns = StandInSNS()
+            start = perf_counter()
+            run(sns, size)
+            ms = (perf_counter() - start) * 1000
+            resent = sum(count - 1 for count in sns.sent.values())
+            lost = size - len(sns.delivered)
+            dupes = sum(count - 1 for count in sns.delivered.values())
+            print(f"{size:>6}  {name:<8}{sns.calls:>7}{ms:>9.0f}{size / ms * 1000:>9.0f}"
+                  f"{len(sns.failed_once):>13}{resent:>8}{lost:>6}{dupes:>7}")
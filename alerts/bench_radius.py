@@ -0,0 +1,88 @@
+"""
+Times finding the radius subscribers near bursts of earthquakes among 100k and
+250k of them, checking every subscriber's distance against the RadiusIndex grid
+lookups, and checks both pick the same subscribers. Subscribers live mostly around
+a few hundred cities with radii of 10 to 500 km, and events fall near cities too.
+Run from this folder: python bench_radius.py
+"""
+import random
+import tracemalloc
+from time import perf_counter
+
+from bench_matching import nested_loop
+from classes import EarthquakeEvent, Subscriber
+from geo import MAX_RADIUS_KM
+from preferences import RadiusIndex
+
+SUBSCRIBERS = [100_000, 250_000]
+BURSTS = [10, 100, 1000]
+# The nested loop is only timed up to this burst size.
+MAX_NESTED_BURST = 10
+CITIES = 300
+
+
+def near(rng: random.Random, lat: float, lon: float, spread: float) -> tuple[float, float]:
+    """A point up to spread degrees from (lat, lon)."""
+    return (max(-90.0, min(90.0, lat + rng.uniform(-spread, spread))),
+            (lon + rng.uniform(-spread, spread) + 180) % 360 - 180)
+
+
+def synthetic_subscribers(count: int, cities: list, rng: random.Random) -> list[Subscriber]:
+    """Radius subscribers, nine in ten within a degree of a city."""
+    subs = []
+    for i in range(count):
+        if rng.random() < 0.9:
+            lat, lon = near(rng, *rng.choice(cities), 1.0)
+        else:
+            lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+        subs.append(Subscriber(i, "Subscriber", f"s{i}@example.com", False, None,
+                               round(rng.uniform(0, 6), 1), home_latitude=lat,
+                               home_longitude=lon,
+                               radius_km=rng.choice([10, 25, 50, 100, 200, MAX_RADIUS_KM])))
+    return subs
+
+
+def synthetic_events(count: int, cities: list, rng: random.Random) -> list[EarthquakeEvent]:
+    """Events, half within a few degrees of a city."""
+    events = []
+    for i in range(count):
+        if rng.random() < 0.5:
+            lat, lon = near(rng, *rng.choice(cities), 3.0)
+        else:
+            lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+        events.append(EarthquakeEvent(i, None, round(rng.expovariate(1 / 2.5), 1),
+                                      "2026-02-06T00:00:00Z", latitude=lat, longitude=lon))
+    return events
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    cities = [(rng.uniform(-45, 60), rng.uniform(-180, 180)) for _ in range(CITIES)]
+
+    print(f"{'subscribers':>12}{'build ms':>10}{'index MB':>10}{'burst':>7}"
+          f"{'recipients':>12}{'nested ms':>11}{'index ms':>10}")
+    for count in SUBSCRIBERS:
+        subs = synthetic_subscribers(count, cities, rng)
+        start = perf_counter()
+        index = RadiusIndex(subs)
+        build_ms = (perf_counter() - start) * 1000
+        tracemalloc.start()
+        RadiusIndex(subs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        for size in BURSTS:
+            events = synthetic_events(size, cities, rng)
+            start = perf_counter()
+            found = [index.recipients(ev) for ev in events]
+            index_ms = (perf_counter() - start) * 1000
+
+            nested = "-"
+            if size <= MAX_NESTED_BURST:
+                start = perf_counter()
+                expected = nested_loop(subs, events)
+                nested = f"{(perf_counter() - start) * 1000:.0f}"
+                assert all(sorted(s.subscriber_id for s in a) == [s.subscriber_id for s in b]
+                           for a, b in zip(found, expected))
+            print(f"{count:>12,}{build_ms:>10.0f}{peak / 1e6:>10.0f}{size:>7}"
+                  f"{sum(len(f) for f in found):>12,}{nested:>11}{index_ms:>10.1f}")
@@ -0,0 +1,154 @@
+"""
+Counts the SNS calls and time of scheduled alerts runs for 10,000 subscribers:
+re-syncing every subscriber each run as before, against reconciling only new,
+changed and deleted ones. Uses the database in the usual environment variables,
+with the subscriber columns from database/schema.sql, and a stand-in SNS topic.
+The bench subscribers are deleted at the end. Run from this folder:
+python bench_reconcile.py
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+from psycopg2.extras import execute_values
+
+import poll_service
+import sns_client
+from db_queries import get_pg_connection, fetch_subscribers
+from sns_client import (build_filter_policy, list_topic_subscriptions_map,
+                        ensure_email_subscription_with_policy)
+
+SUBSCRIBERS = 10_000
+CHANGED = 20
+DELETED = 10
+ADDED = 10
+PAGE_SIZE = 100
+
+
+class StandInTopic:
+    """An SNS topic of confirmed email subscriptions that counts the calls made to it."""
+
+    def __init__(self):
+        self.subscriptions: dict[str, str] = {}
+        self.calls = Counter()
+
+    def list_subscriptions_by_topic(self, TopicArn, NextToken=None):
+        """Pages of PAGE_SIZE subscriptions, as SNS returns them."""
+        self.calls["list_subscriptions_by_topic"] += 1
+        items = list(self.subscriptions.items())
+        start = int(NextToken or 0)
+        page = {"Subscriptions": [{"Protocol": "email", "Endpoint": e, "SubscriptionArn": a}
+                                  for e, a in items[start:start + PAGE_SIZE]]}
+        if start + PAGE_SIZE < len(items):
+            page["NextToken"] = str(start + PAGE_SIZE)
+        return page
+
+    def subscribe(self, TopicArn, Endpoint, **kwargs):
+        """Subscribes and confirms straight away."""
+        self.calls["subscribe"] += 1
+        self.subscriptions[Endpoint] = f"arn:sub:{Endpoint}"
+        return {"SubscriptionArn": self.subscriptions[Endpoint]}
+
+    def set_subscription_attributes(self, **kwargs):
+        """Sets a filter policy."""
+        self.calls["set_subscription_attributes"] += 1
+
+    def unsubscribe(self, SubscriptionArn):
+        """Removes a subscription."""
+        self.calls["unsubscribe"] += 1
+        self.subscriptions = {e: a for e, a in self.subscriptions.items()
+                              if a != SubscriptionArn}
+
+
+def before_run(conn, sns) -> None:
+    """The original run: list the topic, then set every subscriber's policy."""
+    existing_map = list_topic_subscriptions_map(sns, "arn:topic")
+    for s in fetch_subscribers(conn):
+        sub_arn = ensure_email_subscription_with_policy(
+            sns, topic_arn="arn:topic", email=s.subscriber_email,
+            filter_policy=build_filter_policy(s.country_id, s.magnitude_value),
+            existing_map=existing_map)
+        existing_map.setdefault(s.subscriber_email, sub_arn)
+
+
+def after_run(conn, sns) -> None:
+    """The run as it is now."""
+    poll_service.reconcile_subscriptions(conn, sns, "arn:topic")
+
+
+def add_subscribers(conn, first: int, count: int) -> None:
+    """Adds bench subscribers whose preferences last changed over the past day."""
+    day_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO subscriber (subscriber_name, subscriber_email, weekly, country_id,
+                                    magnitude_value, updated_at)
+            VALUES %s
+        """, [(f"Bench {i}", f"bench-{i}@example.com", False, None, float(i % 60) / 10,
+               day_ago + timedelta(seconds=5 * i)) for i in range(first, first + count)])
+    conn.commit()
+
+
+def change_subscribers(conn) -> None:
+    """Changes, deletes and adds a few bench subscribers."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE subscriber SET magnitude_value = magnitude_value + 0.5
+            WHERE subscriber_email IN (SELECT subscriber_email FROM subscriber
+                                       WHERE subscriber_email LIKE 'bench-%%'
+                                       ORDER BY subscriber_id LIMIT %s)
+        """, (CHANGED,))
+        cur.execute("""
+            DELETE FROM subscriber
+            WHERE subscriber_id IN (SELECT subscriber_id FROM subscriber
+                                    WHERE subscriber_email LIKE 'bench-%%'
+                                    ORDER BY subscriber_id DESC LIMIT %s)
+        """, (DELETED,))
+    conn.commit()
+    add_subscribers(conn, SUBSCRIBERS, ADDED)
+
+
+def sweep_due(_conn) -> None:
+    """Lets the next run look for deleted subscribers, as it would after ORPHAN_SWEEP_SECONDS."""
+    poll_service._SWEPT_AT.clear()
+
+
+def timed(run, conn, sns) -> tuple[float, Counter]:
+    """Run time in ms and SNS calls of one run."""
+    sns.calls.clear()
+    start = perf_counter()
+    run(conn, sns)
+    conn.commit()
+    return (perf_counter() - start) * 1000, Counter(sns.calls)
+
+
+def reset_subscribers(conn) -> None:
+    """Replaces the bench subscribers with SUBSCRIBERS unchanged ones."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM subscriber WHERE subscriber_email LIKE 'bench-%%'")
+    add_subscribers(conn, 0, SUBSCRIBERS)
+
+
+if __name__ == "__main__":
+    conn = get_pg_connection()
+    try:
+        print(f"{'path':<8}{'run':<15}{'ms':>8}{'SNS calls':>11}  by method")
+        for name, run in (("before", before_run), ("after", after_run)):
+            reset_subscribers(conn)
+            poll_service._RECONCILED_THROUGH.clear()
+            poll_service._SWEPT_AT.clear()
+            sns_client._TOPIC_MAPS.clear()
+            sns = StandInTopic()
+            for step, prepare in (("first", None), ("no changes", None),
+                                  ("a few changes", change_subscribers),
+                                  ("sweep due", sweep_due)):
+                if prepare:
+                    prepare(conn)
+                ms, calls = timed(run, conn, sns)
+                print(f"{name:<8}{step:<15}{ms:>8.0f}{sum(calls.values()):>11}  {dict(calls)}")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM subscriber WHERE subscriber_email LIKE 'bench-%%'")
+        conn.commit()
+        conn.close()
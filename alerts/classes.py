@@ -1,5 +1,6 @@
 """Python script containing the construction of the data classes"""
 from dataclasses import dataclass
+from datetime import datetime
 
 # Organising data
 
@@ -13,6 +14,11 @@ class Subscriber:
     weekly: bool
     country_id: int
     magnitude_value: float
+    updated_at: datetime = None
+    policy_hash: str = None
+    home_latitude: float = None
+    home_longitude: float = None
+    radius_km: float = None
 
 
 @dataclass(frozen=True)
@@ -24,3 +30,5 @@ class EarthquakeEvent:
     occurred_at: str
     place: str = None
     country_name: str = None
+    latitude: float = None
+    longitude: float = None
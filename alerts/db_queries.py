@@ -1,11 +1,18 @@
 """Script containing DB connection and queries"""
+from datetime import datetime
 from os import environ as ENV
+from time import monotonic
 
 from psycopg2 import connect
 from psycopg2.extensions import connection as Connection
+from psycopg2.extras import Json, execute_values
 
 from classes import EarthquakeEvent, Subscriber
 
+COUNTRY_NAMES_TTL_SECONDS = 3600
+
+_COUNTRY_NAMES: dict = {"loaded_at": None, "names": {}}
+
 
 def get_pg_connection() -> Connection:
     """Returns a connection to RDS."""
@@ -65,47 +72,249 @@ def fetch_subscribers(conn: Connection) -> list[Subscriber]:
     return subs
 
 
-def fetch_country_name(conn: Connection, country_id: int) -> str:
-    """Fetches country name by ID from earthquakes.country."""
+def fetch_subscribers_to_reconcile(conn: Connection, since: datetime = None) -> list[Subscriber]:
+    """
+    Returns the subscribers whose preferences changed at or after since, and those
+    whose filter policy has not been applied yet. Returns all of them without since.
+    """
     query = """
-        SELECT country_name
-        FROM public.country
-        WHERE country_id = %s
-        LIMIT 1;
+        SELECT
+            subscriber_id,
+            subscriber_name,
+            subscriber_email,
+            weekly,
+            country_id,
+            magnitude_value,
+            updated_at,
+            policy_hash,
+            home_latitude,
+            home_longitude,
+            radius_km
+        FROM public.subscriber
+        WHERE subscriber_email IS NOT NULL
     """
+    params = None
+    if since is not None:
+        query += " AND (updated_at >= %(since)s OR policy_hash IS NULL)"
+        params = {"since": since}
     with conn.cursor() as cur:
-        cur.execute(query, (country_id,))
-        row = cur.fetchone()
+        cur.execute(query + ";", params)
+        rows = cur.fetchall()
 
-    if not row:
-        return None
-    return str(row[0]) if row[0] is not None else None
+    return [
+        Subscriber(
+            subscriber_id=int(subscriber_id),
+            subscriber_name=str(subscriber_name) if subscriber_name is not None else "",
+            subscriber_email=str(subscriber_email),
+            weekly=bool(weekly) if weekly is not None else False,
+            country_id=int(country_id) if country_id is not None else None,
+            magnitude_value=float(magnitude_value) if magnitude_value is not None else None,
+            updated_at=updated_at,
+            policy_hash=policy_hash,
+            home_latitude=float(home_latitude) if home_latitude is not None else None,
+            home_longitude=float(home_longitude) if home_longitude is not None else None,
+            radius_km=float(radius_km) if radius_km is not None else None,
+        )
+        for (subscriber_id, subscriber_name, subscriber_email, weekly, country_id,
+             magnitude_value, updated_at, policy_hash, home_latitude, home_longitude,
+             radius_km) in rows
+    ]
 
 
-def fetch_recent_earthquakes(conn: Connection) -> list[EarthquakeEvent]:
+def fetch_radius_subscribers_version(conn: Connection) -> int:
     """
-    Fetch earthquakes from the last N minutes.
+    Returns the radius subscribers' version, which a trigger moves on whenever one
+    is added, removed or has its preferences changed.
     """
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM public.radius_subscriber_version;")
+        row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+def fetch_radius_subscribers(conn: Connection) -> list[Subscriber]:
+    """Returns every subscriber alerted for earthquakes near a home location."""
     query = """
         SELECT
-            event_id,
-            country_id,
+            subscriber_id,
+            subscriber_name,
+            subscriber_email,
+            weekly,
             magnitude_value,
-            creation_time,
-            description,
-            longitude,
-            latitude
-        FROM public.event
-        WHERE creation_time >= (NOW() AT TIME ZONE 'utc') - INTERVAL '5 MINUTES'
-        ORDER BY creation_time ASC;
+            home_latitude,
+            home_longitude,
+            radius_km
+        FROM public.subscriber
+        WHERE radius_km IS NOT NULL
+        AND subscriber_email IS NOT NULL;
     """
-
     with conn.cursor() as cur:
         cur.execute(query)
         rows = cur.fetchall()
 
+    return [
+        Subscriber(
+            subscriber_id=int(subscriber_id),
+            subscriber_name=str(subscriber_name) if subscriber_name is not None else "",
+            subscriber_email=str(subscriber_email),
+            weekly=bool(weekly) if weekly is not None else False,
+            country_id=None,
+            magnitude_value=float(magnitude_value) if magnitude_value is not None else None,
+            home_latitude=float(home_latitude),
+            home_longitude=float(home_longitude),
+            radius_km=float(radius_km),
+        )
+        for (subscriber_id, subscriber_name, subscriber_email, weekly, magnitude_value,
+             home_latitude, home_longitude, radius_km) in rows
+    ]
+
+
+def fetch_subscriber_emails(conn: Connection) -> set[str]:
+    """Returns the email of every subscriber."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT subscriber_email FROM public.subscriber;")
+        return {str(row[0]) for row in cur.fetchall() if row[0] is not None}
+
+
+def save_policy_hashes(conn: Connection, hashes: dict[int, str]) -> None:
+    """
+    Records the filter policy hash applied to SNS for each subscriber ID. A None
+    hash marks the subscriber's policy as not applied yet.
+    """
+    if not hashes:
+        return
+    query = """
+        UPDATE public.subscriber AS s
+        SET policy_hash = v.policy_hash
+        FROM (VALUES %s) AS v (subscriber_id, policy_hash)
+        WHERE s.subscriber_id = v.subscriber_id;
+    """
+    with conn.cursor() as cur:
+        execute_values(cur, query, list(hashes.items()), page_size=len(hashes))
+
+
+def load_country_names(conn: Connection, country_ids=(), clock=monotonic) -> dict[int, str]:
+    """
+    Returns every country name by ID. Loaded in one query on first use and kept for
+    the life of the process, so warm Lambda invocations do not query it again.
+    Reloaded when one of country_ids is missing, in case the country was added
+    since, but at most once every COUNTRY_NAMES_TTL_SECONDS, so an unknown ID
+    does not reload the table on every lookup.
+    """
+    loaded_at = _COUNTRY_NAMES["loaded_at"]
+    missing = any(c is not None and c not in _COUNTRY_NAMES["names"] for c in country_ids)
+    if loaded_at is None or (missing and clock() - loaded_at >= COUNTRY_NAMES_TTL_SECONDS):
+        with conn.cursor() as cur:
+            cur.execute("SELECT country_id, country_name FROM public.country;")
+            names = {int(country_id): str(country_name)
+                     for country_id, country_name in cur.fetchall()
+                     if country_name is not None}
+        _COUNTRY_NAMES.update(loaded_at=clock(), names=names)
+    return _COUNTRY_NAMES["names"]
+
+
+def claim_dispatch_watermark(conn: Connection, topic_arn: str) -> int:
+    """
+    Locks the topic's alert_dispatch row until the transaction ends and returns the
+    last event_id published to it, or None if another run holds the row. A topic
+    without a row starts from the newest event, rather than alerting on history.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO public.alert_dispatch (topic_arn, last_event_id)
+            SELECT %(topic_arn)s, COALESCE(MAX(event_id), 0) FROM public.event
+            ON CONFLICT (topic_arn) DO NOTHING;
+        """, {"topic_arn": topic_arn})
+        cur.execute("""
+            SELECT last_event_id
+            FROM public.alert_dispatch
+            WHERE topic_arn = %(topic_arn)s
+            FOR UPDATE SKIP LOCKED;
+        """, {"topic_arn": topic_arn})
+        row = cur.fetchone()
+
+    return int(row[0]) if row else None
+
+
+def advance_dispatch_watermark(conn: Connection, topic_arn: str, last_event_id: int) -> None:
+    """Moves the topic's watermark on to the last event_id published."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE public.alert_dispatch
+            SET last_event_id = %(last_event_id)s,
+                updated_at = NOW() AT TIME ZONE 'utc'
+            WHERE topic_arn = %(topic_arn)s;
+        """, {"topic_arn": topic_arn, "last_event_id": last_event_id})
+
+
+def save_pending_entries(conn: Connection, topic_arn: str, entries: list[dict]) -> None:
+    """Saves PublishBatch entries SNS did not take, for the next run to send again."""
+    if not entries:
+        return
+    query = """
+        INSERT INTO public.alert_pending (topic_arn, entry_id, entry)
+        VALUES %s
+        ON CONFLICT (topic_arn, entry_id) DO NOTHING;
+    """
+    with conn.cursor() as cur:
+        execute_values(cur, query, [(topic_arn, entry["Id"], Json(entry)) for entry in entries],
+                       page_size=len(entries))
+
+
+def fetch_pending_entries(conn: Connection, topic_arn: str, limit: int) -> list[dict]:
+    """Returns up to limit of the topic's pending entries, oldest first."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT entry
+            FROM public.alert_pending
+            WHERE topic_arn = %(topic_arn)s
+            ORDER BY created_at, entry_id
+            LIMIT %(limit)s;
+        """, {"topic_arn": topic_arn, "limit": limit})
+        return [row[0] for row in cur.fetchall()]
+
+
+def delete_pending_entries(conn: Connection, topic_arn: str, entry_ids: list[str]) -> None:
+    """Deletes pending entries that have been sent or that SNS rejected."""
+    if not entry_ids:
+        return
+    with conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM public.alert_pending
+            WHERE topic_arn = %(topic_arn)s AND entry_id = ANY(%(entry_ids)s);
+        """, {"topic_arn": topic_arn, "entry_ids": list(entry_ids)})
+
+
+def fetch_earthquakes_after(conn: Connection, after_event_id: int,
+                            limit: int) -> list[EarthquakeEvent]:
+    """
+    Fetch up to limit earthquakes with an event_id past after_event_id, oldest first,
+    as a seek on the primary key, with their country names from the process-level
+    country names rather than looked up one event at a time.
+    """
+    query = """
+        SELECT
+            e.event_id,
+            e.country_id,
+            e.magnitude_value,
+            e.creation_time,
+            e.description,
+            e.longitude,
+            e.latitude
+        FROM public.event e
+        WHERE e.event_id > %(after_event_id)s
+        ORDER BY e.event_id ASC
+        LIMIT %(limit)s;
+    """
+
+    with conn.cursor() as cur:
+        cur.execute(query, {"after_event_id": after_event_id, "limit": limit})
+        rows = cur.fetchall()
+    country_names = load_country_names(conn, {row[1] for row in rows})
+
     events: list[EarthquakeEvent] = []
-    for event_id, country_id, magnitude_value, creation_time, description, longitude, latitude in rows:
+    for (event_id, country_id, magnitude_value, creation_time, description, longitude,
+         latitude) in rows:
 
         place_parts = []
         if description:
@@ -119,12 +328,14 @@ def fetch_recent_earthquakes(conn: Connection) -> list[EarthquakeEvent]:
         events.append(
             EarthquakeEvent(
                 earthquake_id=int(event_id),
-                country_id=int(country_id),
+                country_id=int(country_id) if country_id is not None else None,
                 magnitude=float(magnitude_value),
                 occurred_at=creation_time.isoformat() if hasattr(
                     creation_time, "isoformat") else str(creation_time),
                 place=place,
-                country_name=None,
+                country_name=country_names.get(country_id),
+                latitude=float(latitude) if latitude is not None else None,
+                longitude=float(longitude) if longitude is not None else None,
             )
         )
 
@@ -0,0 +1,68 @@
+"""
+Geospatial helpers for radius subscriptions. The distance and bounding box maths
+mirror app/geo.py, which the alerts image does not include.
+"""
+from math import asin, cos, degrees, floor, radians, sin, sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+# Must match subscriber_radius_check in database/schema.sql.
+MAX_RADIUS_KM = 500
+
+
+def grid_cell(lat: float, lon: float) -> int:
+    """
+    Returns the 1 degree grid cell a point falls in, numbered as in app/geo.py.
+    Points on latitude 90 or longitude 180 go in the last row or column.
+    """
+    return (min(floor(lat), 89) + 90) * 360 + min(floor(lon), 179) + 180
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Returns the great-circle distance between two points in km."""
+    d_lat = radians(lat2 - lat1)
+    d_lon = radians(lon2 - lon1)
+    a = sin(d_lat / 2) ** 2 + \
+        cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """
+    Returns (min_lat, max_lat, min_lon, max_lon) enclosing a circle on the globe.
+    When the box crosses the antimeridian min_lon is greater than max_lon.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat = lat - degrees(angular)
+    max_lat = lat + degrees(angular)
+
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    spread = sin(angular) / cos(radians(lat))
+    if spread >= 1:
+        return min_lat, max_lat, -180.0, 180.0
+
+    d_lon = degrees(asin(spread))
+    min_lon = lon - d_lon
+    max_lon = lon + d_lon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def lon_ranges(min_lon: float, max_lon: float) -> list[tuple[float, float]]:
+    """Splits a longitude range crossing the antimeridian into two plain ranges."""
+    if min_lon <= max_lon:
+        return [(min_lon, max_lon)]
+    return [(min_lon, 180.0), (-180.0, max_lon)]
+
+
+def circle_cells(lat: float, lon: float, radius_km: float) -> list[int]:
+    """Returns every grid cell touched by the bounding box of a circle."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    rows = range(floor(min_lat), min(floor(max_lat), 89) + 1)
+    cols = {c for a, b in lon_ranges(min_lon, max_lon)
+            for c in range(floor(a), min(floor(b), 179) + 1)}
+    return [(r + 90) * 360 + c + 180 for r in rows for c in cols]
@@ -20,6 +20,7 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": json.dumps({"message": "SNS_TOPIC_ARN not set"})}
 
     subscribe_every_time = bool(event.get("subscribe_every_time", True))
+    full_resync = bool(event.get("full_resync", False))
 
     try:
         with get_pg_connection() as conn:
@@ -28,6 +29,7 @@ def lambda_handler(event, context):
                 sns_client=SNS,
                 topic_arn=topic_arn,
                 subscribe_every_time=subscribe_every_time,
+                full_resync=full_resync,
             )
     except Exception as e:
         return {"statusCode": 500,
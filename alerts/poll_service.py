@@ -1,82 +1,269 @@
 """Scheduled polling alert service"""
-from dataclasses import replace
+from datetime import datetime, timedelta
+from time import monotonic
 
-from db_queries import fetch_subscribers, fetch_country_name, fetch_recent_earthquakes
+from db_queries import (fetch_subscribers_to_reconcile, fetch_subscriber_emails,
+                        save_policy_hashes, claim_dispatch_watermark,
+                        advance_dispatch_watermark, fetch_earthquakes_after,
+                        save_pending_entries, fetch_pending_entries, delete_pending_entries,
+                        fetch_radius_subscribers_version, fetch_radius_subscribers)
 from formatting import format_subject, format_body
+from preferences import RadiusIndex
 from sns_client import (
     build_filter_policy,
-    publish_event_once,
-    list_topic_subscriptions_map,
+    build_recipient_filter_policy,
+    policy_hash,
+    cached_topic_subscriptions_map,
     ensure_email_subscription_with_policy,
+    remove_subscription,
+    publish_entry,
+    recipient_entries,
+    entry_event_id,
+    publish_events,
 )
 
+# Preference changes committed late can carry an updated_at a little before the
+# last run's watermark, so each run looks back this far past it.
+RECONCILE_LAG = timedelta(minutes=5)
 
-def handle_recent_earthquakes(
-    conn,
-    sns_client,
-    topic_arn: str,
-    subscribe_every_time: bool = True,
-) -> dict:
-    """Fetches recent earthquakes and subscribers matches them against policy filter"""
-    subs = fetch_subscribers(conn)
-    quakes = fetch_recent_earthquakes(conn)
+# Finding deleted subscribers reads every subscriber's email, so it runs on full
+# resyncs, cold starts and at most this often, like re-listing the topic.
+ORPHAN_SWEEP_SECONDS = 900
+
+# Bounds one run's catch-up after an outage, so it finishes inside the Lambda
+# timeout. The rest is left for the next scheduled run.
+ALERT_BATCH_SIZE = 100
+MAX_BATCHES_PER_RUN = 10
+# Entries left unsent by earlier runs that each run sends again, before new events.
+PENDING_ENTRIES_PER_RUN = 1000
+
+_RECONCILED_THROUGH: dict[str, datetime] = {}
+_RADIUS_INDEX: dict[int, RadiusIndex] = {}
+_SWEPT_AT: dict[str, float] = {}
+
+
+def reconcile_subscriptions(conn, sns_client, topic_arn: str, full: bool = False,
+                            clock=monotonic) -> dict:
+    """
+    Brings the topic's email subscriptions in line with the subscriber table,
+    calling SNS only for subscribers that are new, changed or deleted. Reads the
+    subscribers changed since this process's last run, or all of them on a cold
+    start, and skips those whose applied policy hash still matches. Deleted
+    subscribers are unsubscribed at most every ORPHAN_SWEEP_SECONDS. full re-lists
+    the topic, reapplies every subscriber's policy and sweeps deleted subscribers.
+    """
+    since = None if full else _RECONCILED_THROUGH.get(topic_arn)
+    subs = fetch_subscribers_to_reconcile(conn, since)
+    existing_map = cached_topic_subscriptions_map(sns_client, topic_arn, refresh=full)
 
     subscribed_attempts = 0
     pending_confirmations = 0
     filter_policies_set = 0
     already_subscribed = 0
     newly_subscribed = 0
+    policies_unchanged = 0
+    applied: dict[int, str] = {}
 
-    existing_map = list_topic_subscriptions_map(sns_client, topic_arn)
-
-    if subscribe_every_time:
-        for s in subs:
+    for s in subs:
+        if s.radius_km is not None:
+            policy = build_recipient_filter_policy(s.subscriber_id)
+        else:
             policy = build_filter_policy(s.country_id, s.magnitude_value)
+        digest = policy_hash(policy)
 
-            prev_arn = existing_map.get(s.subscriber_email)
-            sub_arn = ensure_email_subscription_with_policy(
-                sns_client,
-                topic_arn=topic_arn,
-                email=s.subscriber_email,
-                filter_policy=policy,
-                existing_map=existing_map,
-            )
-            subscribed_attempts += 1
-
-            if prev_arn:
-                already_subscribed += 1
-            else:
-                newly_subscribed += 1
-                if sub_arn:
-                    existing_map[s.subscriber_email] = sub_arn
-
-            if sub_arn and str(sub_arn).lower().startswith("pending"):
-                pending_confirmations += 1
-            elif sub_arn:
-                filter_policies_set += 1
+        prev_arn = existing_map.get(s.subscriber_email)
+        if prev_arn and not full and digest == s.policy_hash:
+            policies_unchanged += 1
+            continue
 
-    published = 0
-    for ev in quakes:
-        country_name = fetch_country_name(conn, country_id=ev.country_id)
-        ev = replace(ev, country_name=country_name)
-
-        publish_event_once(
+        sub_arn = ensure_email_subscription_with_policy(
             sns_client,
             topic_arn=topic_arn,
-            subject=format_subject(ev),
-            body=format_body(ev),
-            country_id=ev.country_id,
-            magnitude=ev.magnitude,
+            email=s.subscriber_email,
+            filter_policy=policy,
+            existing_map=existing_map,
         )
-        published += 1
+        subscribed_attempts += 1
+
+        if prev_arn:
+            already_subscribed += 1
+        else:
+            newly_subscribed += 1
+            if sub_arn:
+                existing_map[s.subscriber_email] = sub_arn
+
+        if sub_arn and str(sub_arn).lower().startswith("pending"):
+            pending_confirmations += 1
+            if not prev_arn:
+                # Subscribed with the policy attached, applied once confirmed
+                applied[s.subscriber_id] = digest
+            elif digest != s.policy_hash:
+                # The policy attached at subscribe time is stale and SNS cannot
+                # change it until confirmed, so clear the hash to be read again
+                # on every run until it is applied.
+                applied[s.subscriber_id] = None
+        elif sub_arn:
+            filter_policies_set += 1
+            applied[s.subscriber_id] = digest
+
+    save_policy_hashes(conn, applied)
+    updated = [s.updated_at for s in subs if s.updated_at is not None]
+    if updated:
+        _RECONCILED_THROUGH[topic_arn] = max(updated) - RECONCILE_LAG
+
+    unsubscribed = 0
+    swept_at = _SWEPT_AT.get(topic_arn)
+    if full or swept_at is None or clock() - swept_at >= ORPHAN_SWEEP_SECONDS:
+        emails = fetch_subscriber_emails(conn)
+        if emails:
+            for email, sub_arn in list(existing_map.items()):
+                if email not in emails and remove_subscription(sns_client, sub_arn):
+                    del existing_map[email]
+                    unsubscribed += 1
+        _SWEPT_AT[topic_arn] = clock()
 
     return {
         "subscribers": len(subs),
-        "earthquakes_found": len(quakes),
-        "published_events": published,
         "subscribed_attempts": subscribed_attempts,
         "already_subscribed": already_subscribed,
         "newly_subscribed": newly_subscribed,
         "pending_confirmations": pending_confirmations,
         "filter_policies_set": filter_policies_set,
+        "policies_unchanged": policies_unchanged,
+        "unsubscribed": unsubscribed,
+    }
+
+
+def current_radius_index(conn) -> RadiusIndex:
+    """
+    The spatial index of radius subscribers, kept for the life of the process and
+    rebuilt only when a radius subscriber has been added, changed or removed.
+    """
+    version = fetch_radius_subscribers_version(conn)
+    if version not in _RADIUS_INDEX:
+        _RADIUS_INDEX.clear()
+        _RADIUS_INDEX[version] = RadiusIndex(fetch_radius_subscribers(conn))
+    return _RADIUS_INDEX[version]
+
+
+def alert_entries(quakes: list, radius_index: RadiusIndex) -> tuple[list[dict], int]:
+    """
+    The PublishBatch entries for a batch of earthquakes: one per earthquake for the
+    country and magnitude filter policies, and more listing the radius subscribers
+    each one is near. Returns them with the number of radius entries.
+    """
+    entries = []
+    radius_entries = 0
+    for ev in quakes:
+        subject, body = format_subject(ev), format_body(ev)
+        entries.append(publish_entry(ev.earthquake_id, subject, body,
+                                     ev.country_id, ev.magnitude))
+        nearby = radius_index.recipients(ev)
+        if nearby:
+            extra = recipient_entries(ev.earthquake_id, subject, body,
+                                      sorted(sub.subscriber_id for sub in nearby))
+            entries.extend(extra)
+            radius_entries += len(extra)
+    return entries, radius_entries
+
+
+def retry_pending_entries(conn, sns_client, topic_arn: str) -> tuple[int, int]:
+    """
+    Sends the topic's entries left unsent by earlier runs again, and deletes those
+    SNS took or rejected. Returns the number sent and the number still pending.
+    """
+    entries = fetch_pending_entries(conn, topic_arn, PENDING_ENTRIES_PER_RUN)
+    if not entries:
+        return 0, 0
+    failures = publish_events(sns_client, topic_arn, entries)
+    still_pending = {f["Id"] for f in failures if not f.get("SenderFault")}
+    delete_pending_entries(conn, topic_arn,
+                           [entry["Id"] for entry in entries if entry["Id"] not in still_pending])
+    return len(entries) - len(failures), len(still_pending)
+
+
+def handle_recent_earthquakes(
+    conn,
+    sns_client,
+    topic_arn: str,
+    subscribe_every_time: bool = True,
+    full_resync: bool = False,
+) -> dict:
+    """
+    Reconciles subscriptions with subscriber preferences, then publishes the
+    earthquakes past the topic's dispatch watermark for SNS to match against each
+    subscription's filter policy, with radius subscribers matched here and listed
+    in messages of their own. Each batch is claimed, published and its
+    watermark moved on in one transaction, so overlapping runs never publish the
+    same event twice. Entries SNS still fails to take after retries are saved in
+    that transaction for the next run to send again, on their own, and stop this
+    run. Events SNS rejects as malformed are counted and skipped.
+    """
+    result = {
+        "subscribers": 0,
+        "subscribed_attempts": 0,
+        "already_subscribed": 0,
+        "newly_subscribed": 0,
+        "pending_confirmations": 0,
+        "filter_policies_set": 0,
+        "policies_unchanged": 0,
+        "unsubscribed": 0,
+    }
+    if subscribe_every_time:
+        result = reconcile_subscriptions(conn, sns_client, topic_arn, full=full_resync)
+
+    conn.commit()
+
+    radius_index = None
+    found = 0
+    published = 0
+    radius_messages = 0
+    rejected = 0
+    unsent = 0
+    retried = 0
+    pending = 0
+    batches = 0
+    while batches < MAX_BATCHES_PER_RUN:
+        last_event_id = claim_dispatch_watermark(conn, topic_arn)
+        if last_event_id is None:
+            break
+        if batches == 0:
+            retried, pending = retry_pending_entries(conn, sns_client, topic_arn)
+        quakes = fetch_earthquakes_after(conn, last_event_id, ALERT_BATCH_SIZE)
+        if not quakes:
+            conn.commit()
+            break
+
+        if radius_index is None:
+            radius_index = current_radius_index(conn)
+        found += len(quakes)
+        entries, radius_entries = alert_entries(quakes, radius_index)
+        failures = publish_events(sns_client, topic_arn, entries)
+        retry_entry_ids = {f["Id"] for f in failures if not f.get("SenderFault")}
+        unsent_entries = [entry for entry in entries if entry["Id"] in retry_entry_ids]
+        failed_ids = {entry_event_id(f["Id"]) for f in failures}
+        retry_ids = {entry_event_id(entry_id) for entry_id in retry_entry_ids}
+        published += len(quakes) - len(failed_ids)
+        radius_messages += radius_entries
+        rejected += len(failed_ids - retry_ids)
+        unsent += len(retry_ids)
+        pending += len(unsent_entries)
+
+        save_pending_entries(conn, topic_arn, unsent_entries)
+        advance_dispatch_watermark(conn, topic_arn, quakes[-1].earthquake_id)
+        conn.commit()
+        batches += 1
+        if unsent_entries or len(quakes) < ALERT_BATCH_SIZE:
+            break
+
+    return {
+        "earthquakes_found": found,
+        "published_events": published,
+        "radius_messages": radius_messages,
+        "rejected_events": rejected,
+        "unsent_events": unsent,
+        "retried_entries": retried,
+        "pending_entries": pending,
+        "batches": batches,
+        **result,
     }
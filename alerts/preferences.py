@@ -1,13 +1,92 @@
 """Python script containing the logic for matching subscriber preferences"""
+from bisect import bisect_right
+from math import inf
+
 from classes import Subscriber, EarthquakeEvent
+from geo import circle_cells, grid_cell, haversine_km
 
 
 def matches(sub: Subscriber, event: EarthquakeEvent) -> bool:
     """
    Returns a boolean based on whether or not there is a matching preference
     """
+    if sub.radius_km is not None and not within_radius(sub, event):
+        return False
     if sub.country_id is not None and sub.country_id != event.country_id:
         return False
     if sub.magnitude_value is not None and event.magnitude < sub.magnitude_value:
         return False
     return True
+
+
+def within_radius(sub: Subscriber, event: EarthquakeEvent) -> bool:
+    """Whether the event is located within the subscriber's radius of their home."""
+    if event.latitude is None or event.longitude is None:
+        return False
+    return haversine_km(sub.home_latitude, sub.home_longitude,
+                        event.latitude, event.longitude) <= sub.radius_km
+
+
+class SubscriberIndex:
+    """
+    Subscribers grouped for matching many events at once: one bucket per country_id
+    and one for subscribers of any country, each sorted by magnitude threshold. An
+    event's recipients are a dictionary lookup and a binary search in each of its
+    two buckets, the same subscribers matches would pick. Radius subscribers are
+    matched by a RadiusIndex.
+    """
+
+    def __init__(self, subscribers: list[Subscriber]):
+        self.radius = RadiusIndex(subscribers)
+        grouped: dict[int, list[Subscriber]] = {}
+        for sub in subscribers:
+            if sub.radius_km is None:
+                grouped.setdefault(sub.country_id, []).append(sub)
+
+        self.buckets: dict[int, tuple[list[float], list[Subscriber]]] = {}
+        for country_id, subs in grouped.items():
+            subs.sort(key=threshold)
+            self.buckets[country_id] = ([threshold(sub) for sub in subs], subs)
+        self.any_country = self.buckets.pop(None, ([], []))
+
+    def recipients(self, event: EarthquakeEvent) -> list[Subscriber]:
+        """The subscribers whose preferences match the event."""
+        found = []
+        buckets = [self.any_country]
+        if event.country_id is not None and event.country_id in self.buckets:
+            buckets.append(self.buckets[event.country_id])
+        for thresholds, subs in buckets:
+            found.extend(subs[:bisect_right(thresholds, event.magnitude)])
+        return found + self.radius.recipients(event)
+
+
+class RadiusIndex:
+    """
+    Subscribers alerted for earthquakes near a home location, filed under every 1
+    degree grid cell the bounding box of their circle touches. An event's candidates
+    are the subscribers filed under its own cell, checked for distance and
+    magnitude threshold, rather than every radius subscriber.
+    """
+
+    def __init__(self, subscribers: list[Subscriber]):
+        self.cells: dict[int, list[Subscriber]] = {}
+        self.size = 0
+        for sub in subscribers:
+            if sub.radius_km is None:
+                continue
+            self.size += 1
+            for cell in circle_cells(sub.home_latitude, sub.home_longitude, sub.radius_km):
+                self.cells.setdefault(cell, []).append(sub)
+
+    def recipients(self, event: EarthquakeEvent) -> list[Subscriber]:
+        """The radius subscribers whose preferences match the event."""
+        if event.latitude is None or event.longitude is None:
+            return []
+        candidates = self.cells.get(grid_cell(event.latitude, event.longitude), [])
+        return [sub for sub in candidates
+                if not event.magnitude < threshold(sub) and within_radius(sub, event)]
+
+
+def threshold(sub: Subscriber) -> float:
+    """The smallest magnitude the subscriber is alerted for, -inf for any."""
+    return -inf if sub.magnitude_value is None else sub.magnitude_value
@@ -1,7 +1,31 @@
 """Handles connection to SNS subscription group, builds filters"""
+import hashlib
 import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic, sleep
 
 import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+TOPIC_LIST_TTL_SECONDS = 900
+
+# PublishBatch takes at most 10 entries. Batches are sent by a small pool of
+# threads sharing the one client, which boto3 allows.
+PUBLISH_BATCH_SIZE = 10
+PUBLISH_WORKERS = 8
+MAX_PUBLISH_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 0.2
+# Retries in one publish are capped at this share of its messages, so a throttled
+# or failing SNS gets fewer requests rather than more.
+RETRY_BUDGET_RATIO = 0.2
+MIN_RETRY_BUDGET = 10
+# Subscriber IDs listed per radius message, keeping a full batch well inside the
+# 256 KB PublishBatch payload limit.
+RECIPIENTS_PER_MESSAGE = 500
+
+_TOPIC_MAPS: dict[str, tuple[float, dict[str, str]]] = {}
 
 
 def get_sns_client(region: str):
@@ -24,9 +48,24 @@ def build_filter_policy(country_id: int, magnitude_value: float) -> dict[str: in
     return policy
 
 
+def build_recipient_filter_policy(subscriber_id: int) -> dict[str: list[str]]:
+    """
+    Builds the FilterPolicy of a radius subscriber, who is sent only the messages
+    listing their subscriber ID. Distance and magnitude are matched before publishing.
+    """
+    return {"recipient_id": [str(subscriber_id)]}
+
+
+def policy_hash(filter_policy: dict) -> str:
+    """Returns a stable hash of a filter policy, to tell whether SNS already has it."""
+    return hashlib.sha256(json.dumps(filter_policy, sort_keys=True).encode()).hexdigest()
+
+
 def list_topic_subscriptions_map(sns, topic_arn: str) -> dict[str: str]:
     """
     Returns mapping: email endpoint -> SubscriptionArn for the given topic.
+    Subscriptions with other protocols (SQS, Lambda, HTTPS) are left out, so
+    reconciling subscribers never touches them.
     """
     mapping: dict[str: str] = {}
     token: str = None
@@ -39,6 +78,8 @@ def list_topic_subscriptions_map(sns, topic_arn: str) -> dict[str: str]:
         resp = sns.list_subscriptions_by_topic(**kwargs)
 
         for sub in resp.get("Subscriptions", []):
+            if sub.get("Protocol") != "email":
+                continue
             endpoint = sub.get("Endpoint")
             arn = sub.get("SubscriptionArn")
             if endpoint and arn:
@@ -51,6 +92,20 @@ def list_topic_subscriptions_map(sns, topic_arn: str) -> dict[str: str]:
     return mapping
 
 
+def cached_topic_subscriptions_map(sns, topic_arn: str, refresh: bool = False,
+                                   clock=monotonic) -> dict[str: str]:
+    """
+    Returns the topic's email -> SubscriptionArn mapping, listing it again only if
+    the process-level copy is older than TOPIC_LIST_TTL_SECONDS or refresh is set.
+    Callers update the returned mapping as they subscribe and unsubscribe.
+    """
+    listed_at, mapping = _TOPIC_MAPS.get(topic_arn, (None, None))
+    if refresh or mapping is None or clock() - listed_at >= TOPIC_LIST_TTL_SECONDS:
+        mapping = list_topic_subscriptions_map(sns, topic_arn)
+        _TOPIC_MAPS[topic_arn] = (clock(), mapping)
+    return mapping
+
+
 def ensure_email_subscription_with_policy(
     sns,
     topic_arn: str,
@@ -75,31 +130,146 @@ def ensure_email_subscription_with_policy(
             )
         return sub_arn
 
-    # Not subscribed yet -> subscribe
+    # Not subscribed yet -> subscribe, with the policy applied once confirmed
+    kwargs = {}
+    if filter_policy:
+        kwargs["Attributes"] = {"FilterPolicy": json.dumps(filter_policy)}
     resp = sns.subscribe(
         TopicArn=topic_arn,
         Protocol="email",
         Endpoint=email,
         ReturnSubscriptionArn=True,
+        **kwargs,
     )
     return resp.get("SubscriptionArn", "")
 
 
-def publish_event_once(
-    sns,
-    topic_arn: str,
-    subject: str,
-    body: str,
-    country_id: int,
-    magnitude: float,
-) -> None:
-    """Publishes an event to the SNS based on preferences"""
-    sns.publish(
-        TopicArn=topic_arn,
-        Subject=subject[:100],
-        Message=body,
-        MessageAttributes={
-            "country_id": {"DataType": "String", "StringValue": str(country_id)},
-            "magnitude": {"DataType": "Number", "StringValue": str(float(magnitude))},
-        },
-    )
+def remove_subscription(sns, sub_arn: str) -> bool:
+    """Unsubscribes a confirmed subscription. Pending ones cannot be, and are left."""
+    if not sub_arn or sub_arn.lower().startswith("pending"):
+        return False
+    sns.unsubscribe(SubscriptionArn=sub_arn)
+    return True
+
+
+def message_attributes(country_id: int, magnitude: float) -> dict:
+    """The attributes subscription filter policies are matched against."""
+    return {
+        "country_id": {"DataType": "String", "StringValue": str(country_id)},
+        "magnitude": {"DataType": "Number", "StringValue": str(float(magnitude))},
+    }
+
+
+def publish_entry(entry_id: int, subject: str, body: str, country_id: int,
+                  magnitude: float) -> dict:
+    """One PublishBatch entry, identified by entry_id within its batch."""
+    return {
+        "Id": str(entry_id),
+        "Subject": subject[:100],
+        "Message": body,
+        "MessageAttributes": message_attributes(country_id, magnitude),
+    }
+
+
+def recipient_entries(entry_id: int, subject: str, body: str,
+                      recipient_ids: list[int]) -> list[dict]:
+    """
+    PublishBatch entries delivering a message to radius subscribers by ID, up to
+    RECIPIENTS_PER_MESSAGE per entry. They carry no country_id or magnitude, so
+    only recipient_id filter policies match them.
+    """
+    return [
+        {
+            "Id": f"{entry_id}-{part}",
+            "Subject": subject[:100],
+            "Message": body,
+            "MessageAttributes": {
+                "recipient_id": {
+                    "DataType": "String.Array",
+                    "StringValue": json.dumps(
+                        [str(i) for i in recipient_ids[start:start + RECIPIENTS_PER_MESSAGE]]),
+                },
+            },
+        }
+        for part, start in enumerate(range(0, len(recipient_ids), RECIPIENTS_PER_MESSAGE))
+    ]
+
+
+def entry_event_id(entry_id: str) -> int:
+    """The ID a publish_entry or recipient_entries entry was made from."""
+    return int(entry_id.split("-")[0])
+
+
+class RetryBudget:
+    """Retries left for one publish, shared by its worker threads."""
+
+    def __init__(self, retries: int):
+        self.retries = retries
+        self.lock = Lock()
+
+    def take(self, wanted: int) -> int:
+        """Takes up to wanted retries and returns how many were granted."""
+        with self.lock:
+            granted = min(wanted, self.retries)
+            self.retries -= granted
+            return granted
+
+
+def publish_batch_with_retries(sns, topic_arn: str, entries: list[dict],
+                               budget: RetryBudget, pause=sleep,
+                               jitter=random.random) -> list[dict]:
+    """
+    Sends up to PUBLISH_BATCH_SIZE entries with PublishBatch, then resends only the
+    entries that failed through no fault of the request, after a jittered backoff
+    and while the budget allows. A failed call, whether SNS refused it or it never
+    reached SNS, counts as every entry failing.
+    Returns the failures left, each with the entry's Id, Code and SenderFault.
+    """
+    pending = entries
+    given_up: list[dict] = []
+    for attempt in range(MAX_PUBLISH_ATTEMPTS):
+        try:
+            resp = sns.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=pending)
+            failed = resp.get("Failed", [])
+        except (ClientError, BotoCoreError) as e:
+            code = (e.response.get("Error", {}).get("Code", "ClientError")
+                    if isinstance(e, ClientError) else type(e).__name__)
+            failed = [{"Id": entry["Id"], "Code": code, "SenderFault": False}
+                      for entry in pending]
+
+        given_up += [f for f in failed if f.get("SenderFault")]
+        retryable = [f for f in failed if not f.get("SenderFault")]
+        granted = 0
+        if retryable and attempt < MAX_PUBLISH_ATTEMPTS - 1:
+            granted = budget.take(len(retryable))
+        given_up += retryable[granted:]
+        if not granted:
+            break
+
+        retry_ids = {f["Id"] for f in retryable[:granted]}
+        pending = [entry for entry in pending if entry["Id"] in retry_ids]
+        pause(jitter() * RETRY_BASE_SECONDS * 2 ** attempt)
+
+    return given_up
+
+
+def publish_events(sns, topic_arn: str, entries: list[dict],
+                   workers: int = PUBLISH_WORKERS, pause=sleep,
+                   jitter=random.random) -> list[dict]:
+    """
+    Publishes the entries in PublishBatch calls of up to PUBLISH_BATCH_SIZE, with up
+    to workers calls in flight, and returns the entries' failures that were not
+    retried into success. Retries across all batches share one budget.
+    """
+    batches = [entries[i:i + PUBLISH_BATCH_SIZE]
+               for i in range(0, len(entries), PUBLISH_BATCH_SIZE)]
+    if not batches:
+        return []
+
+    budget = RetryBudget(max(MIN_RETRY_BUDGET, int(len(entries) * RETRY_BUDGET_RATIO)))
+    with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+        results = pool.map(
+            lambda batch: publish_batch_with_retries(sns, topic_arn, batch, budget,
+                                                     pause, jitter),
+            batches)
+        return [failure for failures in results for failure in failures]
@@ -2,24 +2,40 @@
 # pylint: skip-file
 
 import json
+import random
+from dataclasses import replace
 from datetime import datetime, timezone
 
 import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
 
 from conftest import FakeCursor, FakeConn
 from classes import EarthquakeEvent, Subscriber
 from unittest.mock import Mock
+import db_queries
+import poll_service
+import sns_client
 from db_queries import (fetch_subscribers,
-                        fetch_country_name,
-                        fetch_recent_earthquakes)
+                        fetch_subscribers_to_reconcile,
+                        load_country_names,
+                        claim_dispatch_watermark,
+                        fetch_earthquakes_after,
+                        fetch_radius_subscribers)
 from formatting import (format_subject,
                         format_body)
-from poll_service import handle_recent_earthquakes
-from preferences import matches
+from poll_service import handle_recent_earthquakes, reconcile_subscriptions, alert_entries
+from geo import circle_cells, grid_cell, haversine_km
+from preferences import matches, SubscriberIndex, RadiusIndex
 from sns_client import (build_filter_policy,
+                        policy_hash,
                         list_topic_subscriptions_map,
+                        cached_topic_subscriptions_map,
                         ensure_email_subscription_with_policy,
-                        publish_event_once,
+                        remove_subscription,
+                        publish_entry,
+                        recipient_entries,
+                        entry_event_id,
+                        publish_events,
                         )
 
 
@@ -62,57 +78,92 @@ def test_fetch_subscribers_executes_expected_sql_and_parses_rows():
     ]
 
 
-@pytest.mark.parametrize(
-    "db_row,expected",
-    [
-        (("Japan",), "Japan"),
-        ((None,), None),
-        (None, None),
-    ],
-)
-def test_fetch_country_name_handles_found_null_and_missing(db_row, expected):
-    cur = FakeCursor(_fetchone=db_row)
+@pytest.fixture
+def no_cached_countries():
+    db_queries._COUNTRY_NAMES.update(loaded_at=None, names={})
+    yield
+    db_queries._COUNTRY_NAMES.update(loaded_at=None, names={})
+
+
+def test_load_country_names_skips_null_names_and_caches_across_calls(no_cached_countries):
+    cur = FakeCursor(_fetchall=[(81, "Japan"), (82, None)])
     conn = FakeConn(cur)
 
-    out = fetch_country_name(conn, country_id=81)
+    first = load_country_names(conn, {81})
+    second = load_country_names(conn, {81})
 
+    assert first == second == {81: "Japan"}
     assert len(cur.executed) == 1
-    query, params = cur.executed[0]
-    assert "FROM public.country" in query
-    assert params == (81,)
+    assert "FROM public.country" in cur.executed[0][0]
+
+
+def test_load_country_names_reloads_for_unknown_id_at_most_once_per_ttl(no_cached_countries):
+    now = [0.0]
+    cur = FakeCursor(_fetchall=[(81, "Japan")])
+    conn = FakeConn(cur)
+    load_country_names(conn, {81}, clock=lambda: now[0])
 
-    assert out == expected
+    for _ in range(3):
+        assert 83 not in load_country_names(conn, {83, None}, clock=lambda: now[0])
+    assert len(cur.executed) == 1
+
+    now[0] = db_queries.COUNTRY_NAMES_TTL_SECONDS
+    cur._fetchall = [(81, "Japan"), (83, "Peru")]
+    assert load_country_names(conn, {83}, clock=lambda: now[0])[83] == "Peru"
+    assert len(cur.executed) == 2
 
 
-def test_fetch_recent_earthquakes_hardcoded_5min_and_maps_rows():
+def test_fetch_earthquakes_after_seeks_past_watermark_and_maps_rows(monkeypatch):
     t = datetime(2026, 2, 6, 15, 0, 0, tzinfo=timezone.utc)
+    monkeypatch.setattr(db_queries, "_COUNTRY_NAMES", {"loaded_at": 0.0, "names": {81: "Japan"}})
 
     # event_id, country_id, magnitude_value, creation_time, description, longitude, latitude
     cur = FakeCursor(
         _fetchall=[
             (100, 81, 1.2, t, "7 km W of Cobb, CA", -122.725, 38.822),
+            (101, None, 2.5, t, "Mid-Atlantic Ridge", -30.1, 10.2),
         ]
     )
     conn = FakeConn(cur)
 
-    events = fetch_recent_earthquakes(conn)
+    events = fetch_earthquakes_after(conn, after_event_id=99, limit=50)
 
     assert len(cur.executed) == 1
     query, params = cur.executed[0]
 
     # SQL assertions
     assert "FROM public.event" in query
-    assert "INTERVAL '5 MINUTES'" in query.upper()
-    assert params is None
+    assert "JOIN" not in query
+    assert "e.event_id > %(after_event_id)s" in query
+    assert "ORDER BY e.event_id ASC" in query
+    assert params == {"after_event_id": 99, "limit": 50}
 
     # Mapping assertions
-    assert len(events) == 1
+    assert len(events) == 2
     ev = events[0]
     assert ev.earthquake_id == 100
     assert ev.country_id == 81
     assert ev.magnitude == 1.2
     assert ev.occurred_at.startswith("2026-02-06T15:00:00")
     assert "7 km W of Cobb, CA" in (ev.place or "")
+    assert ev.country_name == "Japan"
+    assert (ev.latitude, ev.longitude) == (38.822, -122.725)
+    assert events[1].country_id is None
+    assert events[1].country_name is None
+
+
+@pytest.mark.parametrize("row,expected", [((42,), 42), (None, None)])
+def test_claim_dispatch_watermark_locks_row_or_skips(row, expected):
+    cur = FakeCursor(_fetchone=row)
+    conn = FakeConn(cur)
+
+    assert claim_dispatch_watermark(conn, "arn:topic") == expected
+
+    insert, select = cur.executed
+    assert "ON CONFLICT (topic_arn) DO NOTHING" in insert[0]
+    assert "FOR UPDATE SKIP LOCKED" in select[0]
+    assert select[1] == {"topic_arn": "arn:topic"}
+
 
 # Formatting tests
 
@@ -210,24 +261,31 @@ def test_handle_recent_earthquakes_publishes_each_event_and_sets_subscriptions(m
     conn = Mock()
 
     monkeypatch.setattr(
-        "poll_service.fetch_subscribers", lambda _conn: subs)
+        "poll_service.fetch_subscribers_to_reconcile", lambda _conn, since: subs)
+    monkeypatch.setattr(
+        "poll_service.fetch_subscriber_emails", lambda _conn: {"a@example.com", "b@example.com"})
+    monkeypatch.setattr("poll_service.save_policy_hashes", lambda _conn, hashes: None)
+    monkeypatch.setattr("poll_service.claim_dispatch_watermark", lambda _conn, _arn: 9)
+    monkeypatch.setattr("poll_service.advance_dispatch_watermark", lambda _conn, _arn, _id: None)
+    monkeypatch.setattr("poll_service.fetch_pending_entries", lambda _conn, _arn, limit: [])
+    monkeypatch.setattr("poll_service.save_pending_entries", lambda _conn, _arn, entries: None)
     monkeypatch.setattr(
-        "poll_service.fetch_recent_earthquakes", lambda _conn, minutes=5: events)
-    monkeypatch.setattr("poll_service.fetch_country_name",
-                        lambda _conn, country_id: "Japan")
+        "poll_service.fetch_earthquakes_after", lambda _conn, after, limit: events)
+    monkeypatch.setattr("poll_service.current_radius_index", lambda _conn: RadiusIndex([]))
     monkeypatch.setattr(
         "poll_service.build_filter_policy", lambda c, m: {"x": "y"})
     monkeypatch.setattr(
-        "poll_service.list_topic_subscriptions_map", lambda _sns, _arn: {})
+        "poll_service.cached_topic_subscriptions_map", lambda _sns, _arn, refresh: {})
     monkeypatch.setattr(
         "poll_service.ensure_email_subscription_with_policy", lambda *a, **k: "arn:confirmed")
 
     published = []
 
-    def _publish(_sns, *, topic_arn, subject, body, country_id, magnitude):
-        published.append((topic_arn, country_id, magnitude, subject, body))
+    def _publish(_sns, topic_arn, entries):
+        published.extend((topic_arn, entry) for entry in entries)
+        return []
 
-    monkeypatch.setattr("poll_service.publish_event_once", _publish)
+    monkeypatch.setattr("poll_service.publish_events", _publish)
 
     result = handle_recent_earthquakes(
         conn,
@@ -240,10 +298,385 @@ def test_handle_recent_earthquakes_publishes_each_event_and_sets_subscriptions(m
     assert result["published_events"] == 2
     assert len(published) == 2
     assert all(p[0] == "arn:topic" for p in published)
+    assert [p[1]["Id"] for p in published] == ["10", "11"]
 
     assert result["subscribers"] == 2
     assert result["subscribed_attempts"] == 2
 
+@pytest.fixture
+def dispatch_ledger(monkeypatch):
+    """Stands in for the alert_dispatch row and the event table."""
+    ledger = {"last_event_id": 0, "locked": False, "events": [], "commits": 0,
+              "failures": [], "pending": {}}
+
+    def _fetch(_conn, after, limit):
+        return [ev for ev in ledger["events"] if ev.earthquake_id > after][:limit]
+
+    def _advance(_conn, _arn, last_event_id):
+        ledger["last_event_id"] = last_event_id
+
+    def _commit():
+        ledger["commits"] += 1
+
+    monkeypatch.setattr("poll_service.claim_dispatch_watermark",
+                        lambda _conn, _arn: None if ledger["locked"] else ledger["last_event_id"])
+    monkeypatch.setattr("poll_service.advance_dispatch_watermark", _advance)
+    monkeypatch.setattr("poll_service.fetch_earthquakes_after", _fetch)
+    monkeypatch.setattr("poll_service.save_pending_entries",
+                        lambda _conn, _arn, entries: ledger["pending"].update(
+                            (entry["Id"], entry) for entry in entries))
+    monkeypatch.setattr("poll_service.fetch_pending_entries",
+                        lambda _conn, _arn, limit: list(ledger["pending"].values())[:limit])
+    monkeypatch.setattr("poll_service.delete_pending_entries",
+                        lambda _conn, _arn, ids: [ledger["pending"].pop(i) for i in ids])
+    monkeypatch.setattr("poll_service.publish_events",
+                        lambda _sns, _arn, entries: ledger["failures"])
+    monkeypatch.setattr("poll_service.ALERT_BATCH_SIZE", 2)
+    monkeypatch.setattr("poll_service.current_radius_index", lambda _conn: RadiusIndex([]))
+    conn = Mock()
+    conn.commit.side_effect = _commit
+    return ledger, conn
+
+
+def quake(event_id):
+    return EarthquakeEvent(event_id, 81, 3.0, "2026-02-06T10:00:00Z")
+
+
+def radius_sub(subscriber_id, lat, lon, radius_km, magnitude=None):
+    return Subscriber(subscriber_id, "R", f"r{subscriber_id}@example.com", False, None,
+                      magnitude, home_latitude=lat, home_longitude=lon, radius_km=radius_km)
+
+
+def test_alert_entries_list_nearby_radius_subscribers(monkeypatch):
+    monkeypatch.setattr("sns_client.RECIPIENTS_PER_MESSAGE", 2)
+    index = RadiusIndex([radius_sub(i, 35.0, 139.0, 100) for i in (3, 1, 2)]
+                        + [radius_sub(9, -33.9, 151.2, 100)])
+    near = EarthquakeEvent(5, 116, 4.0, "2026-02-06T10:00:00Z", latitude=35.5, longitude=139.5)
+    far = EarthquakeEvent(6, 235, 4.0, "2026-02-06T10:00:00Z", latitude=0.0, longitude=0.0)
+
+    entries, radius_entries = alert_entries([near, far], index)
+
+    assert [e["Id"] for e in entries] == ["5", "5-0", "5-1", "6"]
+    assert radius_entries == 2
+    recipients = [json.loads(e["MessageAttributes"]["recipient_id"]["StringValue"])
+                  for e in entries[1:3]]
+    assert recipients == [["1", "2"], ["3"]]
+    assert "country_id" not in entries[1]["MessageAttributes"]
+    assert entry_event_id(entries[2]["Id"]) == 5
+
+
+def test_unsent_radius_message_is_saved_on_its_own(dispatch_ledger, monkeypatch):
+    ledger, conn = dispatch_ledger
+    monkeypatch.setattr("poll_service.current_radius_index",
+                        lambda _conn: RadiusIndex([radius_sub(7, 35.0, 139.0, 100)]))
+    ledger["events"] = [quake(1), replace(quake(2), latitude=35.1, longitude=139.1)]
+    ledger["failures"] = [{"Id": "2-0", "Code": "Throttled", "SenderFault": False}]
+
+    result = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+
+    assert result["unsent_events"] == 1
+    assert list(ledger["pending"]) == ["2-0"]
+    assert ledger["last_event_id"] == 2
+
+
+def test_publishes_each_event_once_across_runs(dispatch_ledger):
+    ledger, conn = dispatch_ledger
+    ledger["events"] = [quake(i) for i in (1, 2, 3)]
+
+    first = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+    second = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+    ledger["events"].append(quake(4))
+    third = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+
+    assert [r["published_events"] for r in (first, second, third)] == [3, 0, 1]
+    assert first["batches"] == 2
+    assert ledger["last_event_id"] == 4
+
+
+def test_catch_up_is_bounded_per_run(dispatch_ledger, monkeypatch):
+    ledger, conn = dispatch_ledger
+    ledger["events"] = [quake(i) for i in range(1, 11)]
+    monkeypatch.setattr("poll_service.MAX_BATCHES_PER_RUN", 3)
+
+    result = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+
+    assert result["published_events"] == 6
+    assert ledger["last_event_id"] == 6
+
+
+def test_skips_publishing_while_another_run_holds_the_ledger(dispatch_ledger):
+    ledger, conn = dispatch_ledger
+    ledger["events"] = [quake(1)]
+    ledger["locked"] = True
+
+    result = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+
+    assert result["published_events"] == 0
+    assert ledger["last_event_id"] == 0
+
+
+def test_unsent_event_is_saved_and_its_batch_passed(dispatch_ledger, monkeypatch):
+    ledger, conn = dispatch_ledger
+    monkeypatch.setattr("poll_service.ALERT_BATCH_SIZE", 3)
+    ledger["events"] = [quake(i) for i in (1, 2, 3, 4)]
+    ledger["failures"] = [{"Id": "2", "Code": "Throttled", "SenderFault": False}]
+
+    result = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+
+    assert result["published_events"] == 2
+    assert result["unsent_events"] == 1
+    assert result["pending_entries"] == 1
+    assert list(ledger["pending"]) == ["2"]
+    assert ledger["last_event_id"] == 3
+    assert result["batches"] == 1
+
+    ledger["failures"] = []
+    result = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+
+    assert result["retried_entries"] == 1
+    assert result["published_events"] == 1
+    assert ledger["pending"] == {}
+    assert ledger["last_event_id"] == 4
+
+
+def test_spent_retry_budget_mid_batch_sends_no_event_twice(dispatch_ledger, monkeypatch):
+    ledger, conn = dispatch_ledger
+    monkeypatch.setattr("poll_service.ALERT_BATCH_SIZE", 25)
+    monkeypatch.setattr("sns_client.MIN_RETRY_BUDGET", 1)
+    monkeypatch.setattr("sns_client.RETRY_BUDGET_RATIO", 0)
+    monkeypatch.setattr("poll_service.publish_events",
+                        lambda sns, arn, entries: publish_events(sns, arn, entries, workers=1,
+                                                                 pause=Mock()))
+    ledger["events"] = [quake(i) for i in range(1, 31)]
+    first = BatchSNS(fail={i: [("Throttled", False)] * 2 for i in ("3", "12", "20")})
+    second = BatchSNS()
+
+    handle_recent_earthquakes(conn, first, "arn:topic", subscribe_every_time=False)
+    result = handle_recent_earthquakes(conn, second, "arn:topic", subscribe_every_time=False)
+
+    assert ledger["pending"] == {}
+    assert second.calls[0] == ["3", "12", "20"]
+    assert result["retried_entries"] == 3
+    taken = first.taken + second.taken
+    assert sorted(taken, key=int) == [str(i) for i in range(1, 31)]
+
+
+def test_rejected_event_is_skipped(dispatch_ledger):
+    ledger, conn = dispatch_ledger
+    ledger["events"] = [quake(1), quake(2)]
+    ledger["failures"] = [{"Id": "1", "Code": "InvalidParameter", "SenderFault": True}]
+
+    result = handle_recent_earthquakes(conn, Mock(), "arn:topic", subscribe_every_time=False)
+
+    assert result["rejected_events"] == 1
+    assert result["published_events"] == 1
+    assert ledger["last_event_id"] == 2
+
+
+@pytest.fixture
+def fresh_process_state():
+    poll_service._RECONCILED_THROUGH.clear()
+    poll_service._RADIUS_INDEX.clear()
+    poll_service._SWEPT_AT.clear()
+    sns_client._TOPIC_MAPS.clear()
+    yield
+    poll_service._RECONCILED_THROUGH.clear()
+    poll_service._RADIUS_INDEX.clear()
+    poll_service._SWEPT_AT.clear()
+    sns_client._TOPIC_MAPS.clear()
+
+
+@pytest.fixture
+def reconcile_db(monkeypatch):
+    """Stands in for the subscriber table, recording what reconciliation reads and writes."""
+    db = {"subs": [], "emails": set(), "email_reads": [], "since": [], "saved": {}}
+
+    def _fetch(_conn, since):
+        db["since"].append(since)
+        return db["subs"]
+
+    monkeypatch.setattr("poll_service.fetch_subscribers_to_reconcile", _fetch)
+    monkeypatch.setattr("poll_service.fetch_subscriber_emails",
+                        lambda _conn: db["email_reads"].append(1) or db["emails"])
+    monkeypatch.setattr("poll_service.save_policy_hashes",
+                        lambda _conn, hashes: db["saved"].update(hashes))
+    return db
+
+
+def topic_listing(mapping):
+    return {"Subscriptions": [{"Protocol": "email", "Endpoint": e, "SubscriptionArn": a}
+                              for e, a in mapping.items()]}
+
+
+def test_reconcile_skips_subscribers_whose_policy_is_applied(fresh_process_state, reconcile_db):
+    t = datetime(2026, 2, 6, 10, 0, 0)
+    applied = policy_hash(build_filter_policy(81, 2.0))
+    reconcile_db["subs"] = [Subscriber(1, "A", "a@example.com", False, 81, 2.0, t, applied)]
+    reconcile_db["emails"] = {"a@example.com"}
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = topic_listing({"a@example.com": "arn:sub:a"})
+
+    result = reconcile_subscriptions(Mock(), sns, "arn:topic")
+
+    assert result["policies_unchanged"] == 1
+    assert result["subscribed_attempts"] == 0
+    sns.set_subscription_attributes.assert_not_called()
+    sns.subscribe.assert_not_called()
+    sns.unsubscribe.assert_not_called()
+
+
+def test_reconcile_applies_new_and_changed_policies(fresh_process_state, reconcile_db):
+    t = datetime(2026, 2, 6, 10, 0, 0)
+    reconcile_db["subs"] = [
+        Subscriber(1, "A", "a@example.com", False, 81, 3.0, t, "stale"),
+        Subscriber(2, "B", "b@example.com", False, None, 5.0, t, None),
+    ]
+    reconcile_db["emails"] = {"a@example.com", "b@example.com"}
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = topic_listing({"a@example.com": "arn:sub:a"})
+    sns.subscribe.return_value = {"SubscriptionArn": "PendingConfirmation"}
+
+    result = reconcile_subscriptions(Mock(), sns, "arn:topic")
+
+    assert result["filter_policies_set"] == 1
+    assert result["newly_subscribed"] == 1
+    sns.set_subscription_attributes.assert_called_once()
+    assert json.loads(sns.subscribe.call_args.kwargs["Attributes"]["FilterPolicy"]) == {
+        "magnitude": [{"numeric": [">=", 5.0]}]}
+    assert reconcile_db["saved"] == {
+        1: policy_hash(build_filter_policy(81, 3.0)),
+        2: policy_hash(build_filter_policy(None, 5.0)),
+    }
+
+
+def test_reconcile_retries_pending_subscribers_whose_preferences_changed(fresh_process_state,
+                                                                          reconcile_db):
+    t = datetime(2026, 2, 6, 10, 0, 0)
+    attached = policy_hash(build_filter_policy(81, 2.0))
+    reconcile_db["subs"] = [Subscriber(1, "A", "a@example.com", False, 81, 4.0, t, attached)]
+    reconcile_db["emails"] = {"a@example.com"}
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = topic_listing(
+        {"a@example.com": "PendingConfirmation"})
+
+    result = reconcile_subscriptions(Mock(), sns, "arn:topic")
+
+    assert result["pending_confirmations"] == 1
+    sns.set_subscription_attributes.assert_not_called()
+    assert reconcile_db["saved"] == {1: None}
+
+
+def test_reconcile_gives_radius_subscribers_a_recipient_policy(fresh_process_state,
+                                                              reconcile_db):
+    t = datetime(2026, 2, 6, 10, 0, 0)
+    reconcile_db["subs"] = [Subscriber(7, "R", "r@example.com", False, None, 3.0, t, None,
+                                       51.5, -0.1, 50.0)]
+    reconcile_db["emails"] = {"r@example.com"}
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = topic_listing({})
+    sns.subscribe.return_value = {"SubscriptionArn": "PendingConfirmation"}
+
+    reconcile_subscriptions(Mock(), sns, "arn:topic")
+
+    assert json.loads(sns.subscribe.call_args.kwargs["Attributes"]["FilterPolicy"]) == {
+        "recipient_id": ["7"]}
+
+
+def test_radius_index_is_rebuilt_only_when_radius_subscribers_change(fresh_process_state,
+                                                                     monkeypatch):
+    version = [1]
+    loads = []
+    monkeypatch.setattr("poll_service.fetch_radius_subscribers_version",
+                        lambda _conn: version[0])
+    monkeypatch.setattr("poll_service.fetch_radius_subscribers",
+                        lambda _conn: loads.append(1) or [radius_sub(1, 0, 0, 100)])
+
+    first = poll_service.current_radius_index(Mock())
+    assert poll_service.current_radius_index(Mock()) is first
+    version[0] = 2
+    assert poll_service.current_radius_index(Mock()) is not first
+    assert len(loads) == 2
+
+
+def test_reconcile_reads_from_watermark_and_reuses_listing(fresh_process_state, reconcile_db):
+    t = datetime(2026, 2, 6, 10, 0, 0)
+    reconcile_db["subs"] = [Subscriber(1, "A", "a@example.com", False, None, None, t, None)]
+    reconcile_db["emails"] = {"a@example.com"}
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = topic_listing({})
+    sns.subscribe.return_value = {"SubscriptionArn": "PendingConfirmation"}
+
+    reconcile_subscriptions(Mock(), sns, "arn:topic")
+    reconcile_db["subs"] = []
+    reconcile_subscriptions(Mock(), sns, "arn:topic")
+
+    assert reconcile_db["since"] == [None, t - poll_service.RECONCILE_LAG]
+    assert sns.list_subscriptions_by_topic.call_count == 1
+
+
+def test_reconcile_unsubscribes_deleted_subscribers(fresh_process_state, reconcile_db):
+    reconcile_db["emails"] = {"kept@example.com"}
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = topic_listing({
+        "kept@example.com": "arn:sub:kept",
+        "gone@example.com": "arn:sub:gone",
+        "unconfirmed@example.com": "PendingConfirmation",
+    })
+
+    result = reconcile_subscriptions(Mock(), sns, "arn:topic")
+
+    assert result["unsubscribed"] == 1
+    sns.unsubscribe.assert_called_once_with(SubscriptionArn="arn:sub:gone")
+    assert "gone@example.com" not in cached_topic_subscriptions_map(sns, "arn:topic")
+
+
+def test_reconcile_sweeps_deleted_subscribers_only_every_sweep_interval(fresh_process_state,
+                                                                        reconcile_db):
+    now = [1000.0]
+    reconcile_db["emails"] = {"kept@example.com"}
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = topic_listing({"kept@example.com": "arn:sub:a"})
+
+    reconcile_subscriptions(Mock(), sns, "arn:topic", clock=lambda: now[0])
+    now[0] += poll_service.ORPHAN_SWEEP_SECONDS - 1
+    reconcile_subscriptions(Mock(), sns, "arn:topic", clock=lambda: now[0])
+    assert len(reconcile_db["email_reads"]) == 1
+
+    reconcile_subscriptions(Mock(), sns, "arn:topic", full=True, clock=lambda: now[0])
+    now[0] += poll_service.ORPHAN_SWEEP_SECONDS
+    reconcile_subscriptions(Mock(), sns, "arn:topic", clock=lambda: now[0])
+    assert len(reconcile_db["email_reads"]) == 3
+
+
+def test_fetch_subscribers_to_reconcile_filters_from_since():
+    t = datetime(2026, 2, 6, 10, 0, 0)
+    cur = FakeCursor(_fetchall=[
+        (1, "A", "a@example.com", False, 81, 2.0, t, "abc", None, None, None),
+        (2, "B", "b@example.com", False, None, 3.0, t, None, 51.5, -0.1, 50),
+    ])
+    conn = FakeConn(cur)
+
+    subs = fetch_subscribers_to_reconcile(conn, since=t)
+
+    query, params = cur.executed[0]
+    assert "updated_at >= %(since)s OR policy_hash IS NULL" in query
+    assert params == {"since": t}
+    assert subs == [Subscriber(1, "A", "a@example.com", False, 81, 2.0, t, "abc"),
+                    Subscriber(2, "B", "b@example.com", False, None, 3.0, t, None,
+                               51.5, -0.1, 50.0)]
+
+
+def test_fetch_radius_subscribers_reads_only_radius_rows():
+    cur = FakeCursor(_fetchall=[(2, "B", "b@example.com", True, 3.0, 51.5, -0.1, 50)])
+
+    subs = fetch_radius_subscribers(FakeConn(cur))
+
+    query, _ = cur.executed[0]
+    assert "WHERE radius_km IS NOT NULL" in query
+    assert subs == [Subscriber(2, "B", "b@example.com", True, None, 3.0,
+                               home_latitude=51.5, home_longitude=-0.1, radius_km=50.0)]
+
+
 # Preferences tests
 
 
@@ -295,6 +728,83 @@ def test_matches_magnitude_threshold_is_inclusive(mag_only_subscriber, threshold
 
     assert matches(sub, ev) is expected
 
+
+def test_circle_cells_wrap_the_antimeridian_and_poles():
+    cells = set(circle_cells(10.0, 179.8, 50))
+    assert grid_cell(10.0, -179.9) in cells
+    assert grid_cell(10.0, 179.9) in cells
+    assert grid_cell(10.0, 0.0) not in cells
+
+    polar = set(circle_cells(89.9, 0.0, 50))
+    assert all(grid_cell(89.5, lon) in polar for lon in range(-180, 181, 30))
+
+
+def test_radius_index_matches_within_radius_and_threshold():
+    index = RadiusIndex([radius_sub(1, 10.0, 179.8, 50, magnitude=3.0),
+                         radius_sub(2, 10.0, 179.8, 10)])
+    across = EarthquakeEvent(1, None, 3.5, "2026-02-06T00:00:00Z",
+                             latitude=10.0, longitude=-179.9)
+    small = EarthquakeEvent(2, None, 2.0, "2026-02-06T00:00:00Z",
+                            latitude=10.0, longitude=-179.9)
+
+    assert haversine_km(10.0, 179.8, 10.0, -179.9) < 50
+    assert [s.subscriber_id for s in index.recipients(across)] == [1]
+    assert index.recipients(small) == []
+    assert index.recipients(EarthquakeEvent(3, None, 5.0, "2026-02-06T00:00:00Z")) == []
+
+
+def random_point(rng):
+    # Bias towards the poles and the antimeridian, where grid cells wrap.
+    lat = rng.choice([rng.uniform(-90, 90), rng.uniform(80, 90), rng.uniform(-90, -80)])
+    lon = rng.choice([rng.uniform(-180, 180), rng.uniform(175, 180), rng.uniform(-180, -175)])
+    return lat, lon
+
+
+def test_subscriber_index_agrees_with_matches():
+    rng = random.Random(7)
+    countries = [None, 81, 116, 235]
+    magnitudes = [None, 1.0, 2.0, 2.5, 4.0]
+    subs = [Subscriber(i, "S", f"s{i}@example.com", False, rng.choice(countries),
+                       rng.choice(magnitudes)) for i in range(300)]
+    subs += [radius_sub(i, *random_point(rng), rng.choice([1, 50, 200, 500]),
+                        rng.choice(magnitudes)) for i in range(300, 600)]
+    events = []
+    for i in range(400):
+        # Most events land within a few degrees of a radius subscriber's home.
+        home = rng.choice(subs[300:])
+        lat = max(-90, min(90, home.home_latitude + rng.uniform(-5, 5)))
+        lon = (home.home_longitude + rng.uniform(-10, 10) + 180) % 360 - 180
+        if i % 20 == 0:
+            lat = lon = None
+        events.append(EarthquakeEvent(
+            i, rng.choice(countries + [999]),
+            rng.choice([0.5, 1.0, 2.0, 2.4, 2.5, 4.0, 7.0, float("nan")]),
+            "2026-02-06T00:00:00Z", latitude=lat, longitude=lon))
+
+    index = SubscriberIndex(subs)
+
+    radius_matches = 0
+    for ev in events:
+        expected = sorted(sub.subscriber_id for sub in subs if matches(sub, ev))
+        assert sorted(sub.subscriber_id for sub in index.recipients(ev)) == expected
+        radius_matches += sum(1 for i in expected if i >= 300)
+    assert radius_matches > 100
+
+
+def test_subscriber_index_buckets(any_subscriber, japan_only_subscriber, mag_only_subscriber,
+                                  both_constraints_subscriber, event_japan_small,
+                                  event_japan_big, event_other_big):
+    index = SubscriberIndex([any_subscriber, japan_only_subscriber, mag_only_subscriber,
+                             both_constraints_subscriber])
+
+    def ids(ev):
+        return sorted(sub.subscriber_id for sub in index.recipients(ev))
+
+    assert ids(event_japan_small) == [1, 2]
+    assert ids(event_japan_big) == [1, 2, 3, 4]
+    assert ids(event_other_big) == [1, 3]
+    assert SubscriberIndex([]).recipients(event_japan_big) == []
+
 # SNS_Client (Pure)
 
 
@@ -321,13 +831,15 @@ def test_list_topic_subscriptions_map_handles_pagination():
     sns.list_subscriptions_by_topic.side_effect = [
         {
             "Subscriptions": [
-                {"Endpoint": "a@example.com", "SubscriptionArn": "arn:sub:a"},
+                {"Protocol": "email", "Endpoint": "a@example.com",
+                 "SubscriptionArn": "arn:sub:a"},
             ],
             "NextToken": "TOKEN",
         },
         {
             "Subscriptions": [
-                {"Endpoint": "b@example.com", "SubscriptionArn": "arn:sub:b"},
+                {"Protocol": "email", "Endpoint": "b@example.com",
+                 "SubscriptionArn": "arn:sub:b"},
             ],
         },
     ]
@@ -338,6 +850,39 @@ def test_list_topic_subscriptions_map_handles_pagination():
     assert sns.list_subscriptions_by_topic.call_count == 2
 
 
+def test_list_topic_subscriptions_map_keeps_only_email_subscriptions():
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = {"Subscriptions": [
+        {"Protocol": "email", "Endpoint": "a@example.com", "SubscriptionArn": "arn:sub:a"},
+        {"Protocol": "sqs", "Endpoint": "arn:aws:sqs:eu-west-2:1:queue",
+         "SubscriptionArn": "arn:sub:sqs"},
+        {"Protocol": "lambda", "Endpoint": "arn:aws:lambda:eu-west-2:1:function:f",
+         "SubscriptionArn": "arn:sub:lambda"},
+        {"Protocol": "https", "Endpoint": "https://ops.example.com/hook",
+         "SubscriptionArn": "arn:sub:https"},
+    ]}
+
+    assert list_topic_subscriptions_map(sns, "arn:topic") == {"a@example.com": "arn:sub:a"}
+
+
+def test_reconcile_leaves_other_protocol_subscriptions_alone(fresh_process_state,
+                                                              reconcile_db):
+    reconcile_db["emails"] = {"a@example.com"}
+    sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = {"Subscriptions": [
+        {"Protocol": "email", "Endpoint": "a@example.com", "SubscriptionArn": "arn:sub:a"},
+        {"Protocol": "sqs", "Endpoint": "arn:aws:sqs:eu-west-2:1:queue",
+         "SubscriptionArn": "arn:sub:sqs"},
+        {"Protocol": "https", "Endpoint": "https://ops.example.com/hook",
+         "SubscriptionArn": "arn:sub:https"},
+    ]}
+
+    result = reconcile_subscriptions(Mock(), sns, "arn:topic")
+
+    assert result["unsubscribed"] == 0
+    sns.unsubscribe.assert_not_called()
+
+
 def test_ensure_email_subscription_does_not_resubscribe_if_existing_confirmed():
     sns = Mock()
     existing = {"me@example.com": "arn:confirmed"}
@@ -393,26 +938,142 @@ def test_ensure_email_subscription_subscribes_if_missing():
     sns.subscribe.assert_called_once()
 
 
-def test_publish_event_once_sends_expected_message_attributes():
+def test_policy_hash_ignores_key_order():
+    assert policy_hash({"a": 1, "b": [2]}) == policy_hash({"b": [2], "a": 1})
+    assert policy_hash({"a": 1}) != policy_hash({"a": 2})
+
+
+def test_cached_topic_subscriptions_map_relists_after_ttl(fresh_process_state):
     sns = Mock()
+    sns.list_subscriptions_by_topic.return_value = topic_listing({"a@example.com": "arn:sub:a"})
+    now = [0.0]
 
-    publish_event_once(
-        sns,
-        topic_arn="arn:topic",
-        subject="Hello",
-        body="Body",
-        country_id=81,
-        magnitude=3.2,
-    )
+    for t in (0.0, 100.0, sns_client.TOPIC_LIST_TTL_SECONDS + 1):
+        now[0] = t
+        cached_topic_subscriptions_map(sns, "arn:topic", clock=lambda: now[0])
+
+    assert sns.list_subscriptions_by_topic.call_count == 2
+
+
+def test_remove_subscription_leaves_pending():
+    sns = Mock()
+
+    assert remove_subscription(sns, "PendingConfirmation") is False
+    assert remove_subscription(sns, "arn:sub:a") is True
+    sns.unsubscribe.assert_called_once_with(SubscriptionArn="arn:sub:a")
+
+
+def test_publish_entry_sends_expected_message_attributes():
+    entry = publish_entry(10, "S" * 120, "Body", 81, 3.2)
+
+    assert entry["Id"] == "10"
+    assert entry["Subject"] == "S" * 100
+    assert entry["Message"] == "Body"
+    assert entry["MessageAttributes"]["country_id"]["StringValue"] == "81"
+    assert entry["MessageAttributes"]["country_id"]["DataType"] == "String"
+    assert entry["MessageAttributes"]["magnitude"]["DataType"] == "Number"
+    assert entry["MessageAttributes"]["magnitude"]["StringValue"].startswith("3.2")
+
+
+class BatchSNS:
+    """Fails each entry Id with the codes queued for it, then takes it."""
+
+    def __init__(self, fail=None, raise_first=None):
+        self.fail = fail or {}
+        self.raise_first = raise_first
+        self.calls = []
+        self.taken = []
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        ids = [entry["Id"] for entry in PublishBatchRequestEntries]
+        self.calls.append(ids)
+        if self.raise_first:
+            code, self.raise_first = self.raise_first, None
+            raise ClientError({"Error": {"Code": code}}, "PublishBatch")
+        failed = []
+        for entry_id in ids:
+            codes = self.fail.get(entry_id)
+            if codes:
+                code, sender_fault = codes.pop(0)
+                failed.append({"Id": entry_id, "Code": code, "SenderFault": sender_fault})
+        self.taken += [i for i in ids if i not in {f["Id"] for f in failed}]
+        return {"Successful": [{"Id": i} for i in ids if i not in {f["Id"] for f in failed}],
+                "Failed": failed}
+
+
+def entries(count):
+    return [publish_entry(i, "S", "B", 81, 3.0) for i in range(count)]
+
+
+def test_publish_events_sends_batches_of_ten():
+    sns = BatchSNS()
+
+    assert publish_events(sns, "arn:topic", entries(25), pause=Mock()) == []
+    assert sorted(len(ids) for ids in sns.calls) == [5, 10, 10]
+    assert sorted(i for ids in sns.calls for i in ids) == sorted(str(i) for i in range(25))
+
+
+def test_publish_events_retries_only_failed_entries_once():
+    sns = BatchSNS(fail={"3": [("InternalError", False)], "7": [("Throttled", False)]})
+    pause = Mock()
+
+    failures = publish_events(sns, "arn:topic", entries(10), pause=pause, jitter=lambda: 0.5)
+
+    assert failures == []
+    assert sns.calls == [[str(i) for i in range(10)], ["3", "7"]]
+    pause.assert_called_once_with(0.5 * sns_client.RETRY_BASE_SECONDS)
+
+
+def test_publish_events_does_not_retry_sender_faults():
+    sns = BatchSNS(fail={"1": [("InvalidParameter", True)]})
+
+    failures = publish_events(sns, "arn:topic", entries(3), pause=Mock())
+
+    assert [f["Id"] for f in failures] == ["1"]
+    assert len(sns.calls) == 1
+
+
+def test_publish_events_gives_up_after_max_attempts():
+    sns = BatchSNS(fail={"0": [("InternalError", False)] * 5})
+
+    failures = publish_events(sns, "arn:topic", entries(2), pause=Mock())
+
+    assert [f["Id"] for f in failures] == ["0"]
+    assert len(sns.calls) == sns_client.MAX_PUBLISH_ATTEMPTS
+
+
+def test_publish_events_stops_retrying_when_budget_is_spent(monkeypatch):
+    monkeypatch.setattr("sns_client.MIN_RETRY_BUDGET", 1)
+    monkeypatch.setattr("sns_client.RETRY_BUDGET_RATIO", 0)
+    sns = BatchSNS(fail={"0": [("Throttled", False)], "1": [("Throttled", False)]})
+
+    failures = publish_events(sns, "arn:topic", entries(2), pause=Mock())
+
+    assert [f["Id"] for f in failures] == ["1"]
+    assert sns.calls == [["0", "1"], ["0"]]
+
+
+def test_publish_events_retries_a_failed_call():
+    sns = BatchSNS(raise_first="Throttling")
+
+    assert publish_events(sns, "arn:topic", entries(4), pause=Mock()) == []
+    assert sns.calls == [["0", "1", "2", "3"]] * 2
+
+
+def test_publish_events_counts_a_transport_error_as_retryable_failures():
+    class FlakySNS(BatchSNS):
+        def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+            if PublishBatchRequestEntries[0]["Id"] == "10":
+                self.calls.append([entry["Id"] for entry in PublishBatchRequestEntries])
+                raise EndpointConnectionError(endpoint_url="https://sns.example")
+            return super().publish_batch(TopicArn, PublishBatchRequestEntries)
+
+    sns = FlakySNS()
+
+    failures = publish_events(sns, "arn:topic", entries(25), pause=Mock())
 
-    sns.publish.assert_called_once()
-    _, kwargs = sns.publish.call_args
-
-    assert kwargs["TopicArn"] == "arn:topic"
-    assert kwargs["Subject"] == "Hello"
-    assert kwargs["Message"] == "Body"
-    attrs = kwargs["MessageAttributes"]
-    assert attrs["country_id"]["DataType"] == "String"
-    assert attrs["country_id"]["StringValue"] == "81"
-    assert attrs["magnitude"]["DataType"] == "Number"
-    assert attrs["magnitude"]["StringValue"].startswith("3.2")
+    assert sorted(f["Id"] for f in failures) == sorted(str(i) for i in range(10, 20))
+    assert {f["Code"] for f in failures} == {"EndpointConnectionError"}
+    assert not any(f["SenderFault"] for f in failures)
+    assert sorted(sns.taken, key=int) == [str(i) for i in range(10)] + [
+        str(i) for i in range(20, 25)]
@@ -5,12 +5,20 @@ from os import environ as ENV
 import psycopg2
 from psycopg2 import connect
 from dotenv import load_dotenv
-from flask import Flask, jsonify
-from psycopg2.extras import RealDictCursor
+from flask import Flask, Response, jsonify, make_response, request
 from psycopg2.extensions import connection
 from psycopg2 import Error
 
+from countries import load_country_index
+from metrics import InstrumentedCursor, instrument
+from queries import (MOST_RECENT_QUERY, RECENT_QUERY, COUNTRY_QUERY,
+                     MAGNITUDE_ORDER_QUERY, MIN_MAGNITUDE_QUERY,
+                     MOST_RECENT_VALIDATOR_QUERY, RECENT_VALIDATOR_QUERY,
+                     parse_near, parse_bbox, parse_stats, shape_stats,
+                     parse_histogram, shape_histogram)
+
 app = Flask(__name__)
+instrument(app)
 
 
 def get_db_connection() -> connection:
@@ -29,23 +37,47 @@ def get_db_connection() -> connection:
         return None
 
 
+def get_etag(connection, validator_query: str, params: tuple = ()) -> str:
+    """Runs a validator query, returning None if the window is empty."""
+    with connection.cursor(cursor_factory=InstrumentedCursor) as curs:
+        curs.execute(validator_query, params)
+        return curs.fetchone()["etag"]
+
+
+def not_modified(etag: str) -> Response:
+    """Returns a 304 response for a client that already has this window."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def with_etag(body, etag: str) -> Response:
+    """Tags a response so clients can revalidate it with If-None-Match."""
+    response = make_response(body)
+    if etag:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 @app.route("/", methods=["GET"])
 def index():
-    """Returns the most recent earthquake."""
+    """Returns the most recent earthquake, or 304 if the client has it already."""
     connection = get_db_connection()
     if not connection:
         return {"error": "Database connection failed."}, 500
 
     try:
-        with connection.cursor(cursor_factory=RealDictCursor) as curs:
-            curs.execute("""
-                       SELECT * FROM event
-                        ORDER BY start_time DESC 
-                        LIMIT 1;
-                        """)
+        etag = get_etag(connection, MOST_RECENT_VALIDATOR_QUERY)
+        if etag and request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        with connection.cursor(cursor_factory=InstrumentedCursor) as curs:
+            curs.execute(MOST_RECENT_QUERY)
             most_recent_earthquake = curs.fetchall()
 
-        return [most_recent_earthquake]
+        return with_etag([most_recent_earthquake], etag)
     except Error as e:
         return {"error": str(e)}, 500
     finally:
@@ -56,26 +88,21 @@ def index():
 @app.route('/recent', defaults={'limit': 20})
 @app.route('/recent/<int:limit>')
 def get_all_recent_earthquakes(limit):
-    """Returns the most recent earthquakes, default 20."""
+    """Returns the most recent earthquakes, default 20, or 304 if unchanged."""
     connection = get_db_connection()
     if not connection:
         return {"error": "Database connection failed."}, 500
 
     try:
-        with connection.cursor(cursor_factory=RealDictCursor) as curs:
-            curs.execute(
-                """
-                SELECT *
-                FROM event e
-                JOIN country c ON e.country_id = c.country_id
-                ORDER BY start_time DESC
-                LIMIT %s;
-                """,
-                (limit,)
-            )
+        etag = get_etag(connection, RECENT_VALIDATOR_QUERY, (limit,))
+        if etag and request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        with connection.cursor(cursor_factory=InstrumentedCursor) as curs:
+            curs.execute(RECENT_QUERY, (limit,))
             earthquakes = curs.fetchall()
 
-        return jsonify(earthquakes)
+        return with_etag(jsonify(earthquakes), etag)
 
     except Error as e:
         return {"error": str(e)}, 500
@@ -88,32 +115,28 @@ def get_all_recent_earthquakes(limit):
 @app.route('/<country_name>', defaults={'limit': 20})
 @app.route('/<country_name>/<int:limit>')
 def get_earthquakes_in_country(country_name, limit):
-    """Returns recent earthquakes from a given country."""
+    """Returns recent earthquakes from a given country name, alias or ISO code."""
     connection = get_db_connection()
     if not connection:
         return {"error": "Database connection failed."}, 500
 
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-                       SELECT * FROM event e
-                        JOIN country c ON (e.country_id = c.country_id) 
-                        WHERE country_name ILIKE %s
-                        ORDER BY start_time DESC
-                        LIMIT %s;
-                        """,
-                       (f"%{country_name}%", limit))
+        country_id = load_country_index(connection).resolve(country_name)
+        if country_id is None:
+            return {"error": "Country not found."}, 404
+
+        cursor = connection.cursor(cursor_factory=InstrumentedCursor)
+        cursor.execute(COUNTRY_QUERY, (country_id, limit))
 
         earthquake = cursor.fetchall()
+        cursor.close()
         if earthquake:
             return jsonify(earthquake)
         return {"error": "No recent earthquakes here."}, 404
     except Error as e:
         return {"error": str(e)}, 500
     finally:
-        if connection:
-            cursor.close()
-            connection.close()
+        connection.close()
 
 
 @app.route('/magnitude/<string:order>', defaults={'limit': 20})
@@ -129,16 +152,9 @@ def get_earthquakes_ordered_by_magnitude(order, limit):
         return {"error": "Invalid order direction."}, 400
 
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-
-        query = f"""
-            SELECT *
-            FROM event e
-            JOIN country c ON e.country_id = c.country_id
-            ORDER BY magnitude_value {order.upper()}
-            LIMIT %s;
-        """
+        cursor = connection.cursor(cursor_factory=InstrumentedCursor)
 
+        query = MAGNITUDE_ORDER_QUERY.format(order=order.upper())
         cursor.execute(query, (limit,))
         earthquakes = cursor.fetchall()
         return jsonify(earthquakes)
@@ -164,14 +180,8 @@ def get_earthquakes_of_certain_magnitude(mag, limit):
         return {'error': "Invalid magnitude value."}, 500
 
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-                       SELECT * FROM event e
-                        JOIN country c ON (e.country_id = c.country_id) 
-                        WHERE magnitude_value >= %s
-                        LIMIT %s;
-                        """,
-                       (mag, limit))
+        cursor = connection.cursor(cursor_factory=InstrumentedCursor)
+        cursor.execute(MIN_MAGNITUDE_QUERY, (mag, limit))
         earthquakes = cursor.fetchall()
         return jsonify(earthquakes)
 
@@ -184,6 +194,105 @@ def get_earthquakes_of_certain_magnitude(mag, limit):
             connection.close()
 
 
+def run_query(query: str, params: list):
+    """Runs a read query on a fresh connection and returns the rows as JSON."""
+    connection = get_db_connection()
+    if not connection:
+        return {"error": "Database connection failed."}, 500
+
+    try:
+        with connection.cursor(cursor_factory=InstrumentedCursor) as curs:
+            curs.execute(query, params)
+            earthquakes = curs.fetchall()
+        return jsonify(earthquakes)
+    except Error as e:
+        return {"error": str(e)}, 500
+    finally:
+        connection.close()
+
+
+@app.route("/near", methods=["GET"])
+def get_earthquakes_near():
+    """
+    Returns recent earthquakes within radius_km (default 100) of lat/lon.
+    Accepts the start, end, min_magnitude, max_magnitude and limit filters.
+    """
+    try:
+        query, params = parse_near(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    return run_query(query, params)
+
+
+@app.route("/bbox", methods=["GET"])
+def get_earthquakes_in_bbox():
+    """
+    Returns recent earthquakes inside min_lat/max_lat/min_lon/max_lon.
+    A min_lon greater than max_lon selects a box across the antimeridian.
+    Accepts the start, end, min_magnitude, max_magnitude and limit filters.
+    """
+    try:
+        query, params = parse_bbox(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    return run_query(query, params)
+
+
+def run_summary(parse, shape):
+    """
+    Runs an aggregate endpoint: resolves the optional country parameter, builds the
+    query from the request and returns the shaped result as JSON.
+    """
+    connection = get_db_connection()
+    if not connection:
+        return {"error": "Database connection failed."}, 500
+
+    try:
+        country_id = None
+        if request.args.get("country"):
+            country_id = load_country_index(connection).resolve(request.args["country"])
+            if country_id is None:
+                return {"error": "Country not found."}, 404
+
+        try:
+            query, params, meta = parse(request.args, country_id)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        with connection.cursor(cursor_factory=InstrumentedCursor) as curs:
+            curs.execute(query, params)
+            rows = curs.fetchall()
+        return jsonify(shape(rows, meta))
+    except Error as e:
+        return {"error": str(e)}, 500
+    finally:
+        connection.close()
+
+
+@app.route("/stats", methods=["GET"])
+def get_statistics():
+    """
+    Returns the total, max and average magnitude, deepest and shallowest depth (km)
+    and countries affected between start and end (default the last 7 days), overall,
+    per time bucket (hour, day, week or month) and for the top limit countries.
+    Accepts the country, min_magnitude and max_magnitude filters.
+    """
+    return run_summary(parse_stats, shape_stats)
+
+
+@app.route("/histogram", methods=["GET"])
+def get_histogram():
+    """
+    Returns a histogram of magnitude or depth (km) between start and end in bins
+    (default 20) equal-width bins, and with group=bucket or group=country the counts
+    in the same bins per time bucket or for the top limit countries. Accepts the
+    country, min_magnitude and max_magnitude filters.
+    """
+    return run_summary(parse_histogram, shape_histogram)
+
+
 if __name__ == "__main__":
     app.config['TESTING'] = True
     app.config['DEBUG'] = True
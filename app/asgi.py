@@ -0,0 +1,347 @@
+"""
+This script contains an async (ASGI) server for the same routes as app.py, backed by
+an asyncpg connection pool. Run it with: uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import re
+from contextlib import asynccontextmanager
+from datetime import date
+from functools import wraps
+from os import environ as ENV
+
+import asyncpg
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.convertors import FloatConvertor, register_url_convertor
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+from werkzeug.http import http_date, parse_etags
+
+from countries import CountryIndex
+from feed import Broadcaster, Subscriber, sse_message
+from queries import (MOST_RECENT_QUERY, RECENT_QUERY, COUNTRY_QUERY,
+                     MAGNITUDE_ORDER_QUERY, MIN_MAGNITUDE_QUERY,
+                     MOST_RECENT_VALIDATOR_QUERY, RECENT_VALIDATOR_QUERY,
+                     get_float_arg, parse_near, parse_bbox, parse_stats, shape_stats,
+                     parse_histogram, shape_histogram)
+
+load_dotenv()
+
+POOL_MIN_SIZE = int(ENV.get("DB_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(ENV.get("DB_POOL_MAX_SIZE", "20"))
+MAX_IN_FLIGHT = int(ENV.get("MAX_IN_FLIGHT", "100"))
+REQUEST_TIMEOUT = float(ENV.get("REQUEST_TIMEOUT", "10"))
+
+
+def to_asyncpg(query: str) -> str:
+    """Rewrites psycopg2 %s placeholders as asyncpg $1, $2, ... placeholders."""
+    counter = iter(range(1, query.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", query)
+
+
+def json_default(value):
+    """Serialises dates the same way as Flask's jsonify."""
+    if isinstance(value, date):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FlaskJSONResponse(JSONResponse):
+    """JSON response whose body matches the Flask server's output."""
+
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=json_default, sort_keys=True,
+                          separators=(",", ":")).encode("utf-8")
+
+
+class FlaskFloatConvertor(FloatConvertor):
+    """
+    Matches only numbers with a decimal point, like Flask's float converter, where
+    Starlette's float also matches integers.
+    """
+    regex = r"[0-9]+\.[0-9]+"
+
+
+register_url_convertor("flaskfloat", FlaskFloatConvertor())
+
+
+async def fetch(request, query: str, *params) -> list[dict]:
+    """Runs a read query on a pooled connection and returns the rows as dicts."""
+    async with request.app.state.pool.acquire() as conn:
+        rows = await conn.fetch(to_asyncpg(query), *params)
+    return [dict(r) for r in rows]
+
+
+def guarded(handler):
+    """
+    Applies back-pressure and a timeout to a route: requests beyond MAX_IN_FLIGHT
+    are rejected with 503 straight away and requests running longer than
+    REQUEST_TIMEOUT are cancelled with 504. Database errors become 500s.
+    """
+    @wraps(handler)
+    async def wrapper(request):
+        state = request.app.state
+        if state.in_flight >= MAX_IN_FLIGHT:
+            return FlaskJSONResponse({"error": "Server busy, retry later."}, 503,
+                                     headers={"Retry-After": "1"})
+        state.in_flight += 1
+        try:
+            return await asyncio.wait_for(handler(request), REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            return FlaskJSONResponse({"error": "Request timed out."}, 504)
+        except (asyncpg.PostgresError, OSError) as e:
+            return FlaskJSONResponse({"error": str(e)}, 500)
+        finally:
+            state.in_flight -= 1
+    return wrapper
+
+
+async def fetch_etag(request, validator_query: str, *params) -> str:
+    """Runs a validator query, returning None if the window is empty."""
+    async with request.app.state.pool.acquire() as conn:
+        return await conn.fetchval(to_asyncpg(validator_query), *params)
+
+
+def etag_matches(request, etag: str) -> bool:
+    """Returns True if the client's If-None-Match already has this etag."""
+    return bool(etag) and parse_etags(request.headers.get("if-none-match")).contains(etag)
+
+
+def not_modified(etag: str) -> Response:
+    """Returns a 304 response for a client that already has this window."""
+    return Response(status_code=304,
+                    headers={"ETag": f'"{etag}"', "Cache-Control": "no-cache"})
+
+
+def with_etag(response, etag: str):
+    """Tags a response so clients can revalidate it with If-None-Match."""
+    if etag:
+        response.headers["ETag"] = f'"{etag}"'
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@guarded
+async def index(request):
+    """Returns the most recent earthquake, or 304 if the client has it already."""
+    etag = await fetch_etag(request, MOST_RECENT_VALIDATOR_QUERY)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return with_etag(FlaskJSONResponse([await fetch(request, MOST_RECENT_QUERY)]), etag)
+
+
+@guarded
+async def get_all_recent_earthquakes(request):
+    """Returns the most recent earthquakes, default 20, or 304 if unchanged."""
+    limit = request.path_params.get("limit", 20)
+    etag = await fetch_etag(request, RECENT_VALIDATOR_QUERY, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return with_etag(FlaskJSONResponse(await fetch(request, RECENT_QUERY, limit)), etag)
+
+
+@guarded
+async def get_earthquakes_in_country(request):
+    """Returns recent earthquakes from a given country name, alias or ISO code."""
+    limit = request.path_params.get("limit", 20)
+    country_id = request.app.state.country_index.resolve(
+        request.path_params["country_name"])
+    if country_id is None:
+        return FlaskJSONResponse({"error": "Country not found."}, 404)
+
+    earthquakes = await fetch(request, COUNTRY_QUERY, country_id, limit)
+    if earthquakes:
+        return FlaskJSONResponse(earthquakes)
+    return FlaskJSONResponse({"error": "No recent earthquakes here."}, 404)
+
+
+@guarded
+async def get_earthquakes_ordered_by_magnitude(request):
+    """Returns all earthquakes in a given order of magnitude."""
+    limit = request.path_params.get("limit", 20)
+    order = request.path_params["order"].lower()
+    if order not in ("asc", "desc"):
+        return FlaskJSONResponse({"error": "Invalid order direction."}, 400)
+
+    query = MAGNITUDE_ORDER_QUERY.format(order=order.upper())
+    return FlaskJSONResponse(await fetch(request, query, limit))
+
+
+@guarded
+async def get_earthquakes_of_certain_magnitude(request):
+    """Returns only earthquakes that are of the given magnitude or higher."""
+    limit = request.path_params.get("limit", 20)
+    mag = request.path_params["mag"]
+    if not 0 <= mag <= 10:
+        return FlaskJSONResponse({"error": "Invalid magnitude value."}, 500)
+
+    return FlaskJSONResponse(await fetch(request, MIN_MAGNITUDE_QUERY, mag, limit))
+
+
+@guarded
+async def get_earthquakes_near(request):
+    """Returns recent earthquakes within radius_km (default 100) of lat/lon."""
+    try:
+        query, params = parse_near(request.query_params)
+    except ValueError as e:
+        return FlaskJSONResponse({"error": str(e)}, 400)
+    return FlaskJSONResponse(await fetch(request, query, *params))
+
+
+@guarded
+async def get_earthquakes_in_bbox(request):
+    """Returns recent earthquakes inside min_lat/max_lat/min_lon/max_lon."""
+    try:
+        query, params = parse_bbox(request.query_params)
+    except ValueError as e:
+        return FlaskJSONResponse({"error": str(e)}, 400)
+    return FlaskJSONResponse(await fetch(request, query, *params))
+
+
+async def run_summary(request, parse, shape):
+    """Runs an aggregate endpoint with the optional country parameter resolved."""
+    country_id = None
+    if request.query_params.get("country"):
+        country_id = request.app.state.country_index.resolve(request.query_params["country"])
+        if country_id is None:
+            return FlaskJSONResponse({"error": "Country not found."}, 404)
+    try:
+        query, params, meta = parse(request.query_params, country_id)
+    except ValueError as e:
+        return FlaskJSONResponse({"error": str(e)}, 400)
+    return FlaskJSONResponse(shape(await fetch(request, query, *params), meta))
+
+
+@guarded
+async def get_statistics(request):
+    """Returns summary statistics overall, per time bucket and per country."""
+    return await run_summary(request, parse_stats, shape_stats)
+
+
+@guarded
+async def get_histogram(request):
+    """Returns a magnitude or depth histogram."""
+    return await run_summary(request, parse_histogram, shape_histogram)
+
+
+def make_subscriber(state, params) -> Subscriber:
+    """Builds a feed subscriber from the min_magnitude and country parameters."""
+    min_magnitude = None
+    if params.get("min_magnitude") is not None:
+        min_magnitude = get_float_arg(params, "min_magnitude", -2, 10)
+    country_id = None
+    if params.get("country") is not None:
+        country_id = state.country_index.resolve(params["country"])
+        if country_id is None:
+            raise ValueError("Country not found.")
+    return Subscriber(min_magnitude, country_id)
+
+
+async def stream(request):
+    """Streams newly ingested or revised earthquakes as server-sent events."""
+    broadcaster = request.app.state.broadcaster
+    try:
+        subscriber = make_subscriber(request.app.state, request.query_params)
+        broadcaster.subscribe(subscriber)
+    except ValueError as e:
+        return FlaskJSONResponse({"error": str(e)}, 400)
+    except ConnectionRefusedError as e:
+        return FlaskJSONResponse({"error": str(e)}, 503, headers={"Retry-After": "5"})
+
+    async def messages():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                items = await subscriber.next()
+                yield b"".join(sse_message(*item) for item in items) or b": keepalive\n\n"
+        except ConnectionAbortedError:
+            return
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(messages(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
+
+
+async def websocket_stream(websocket):
+    """Sends newly ingested or revised earthquakes as WebSocket text messages."""
+    broadcaster = websocket.app.state.broadcaster
+    try:
+        subscriber = make_subscriber(websocket.app.state, websocket.query_params)
+        broadcaster.subscribe(subscriber)
+    except (ValueError, ConnectionRefusedError) as e:
+        await websocket.close(code=1008 if isinstance(e, ValueError) else 1013,
+                              reason=str(e))
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            for _, data in await subscriber.next():
+                await websocket.send_text(data)
+    except ConnectionAbortedError:
+        await websocket.close(code=1013, reason="Subscriber fell too far behind.")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+@asynccontextmanager
+async def lifespan(application):
+    """
+    Opens the connection pool, loads the country index and starts the live feed
+    listener once per process.
+    """
+    connect_kwargs = {
+        "user": ENV.get("DB_USERNAME"),
+        "password": ENV.get("DB_PASSWORD"),
+        "host": ENV.get("DB_HOST"),
+        "port": ENV.get("DB_PORT"),
+        "database": ENV.get("DB_NAME"),
+    }
+    application.state.pool = await asyncpg.create_pool(
+        **connect_kwargs,
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        command_timeout=REQUEST_TIMEOUT,
+    )
+    async with application.state.pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT country_id, country_name, country_code FROM country;")
+    application.state.country_index = CountryIndex(rows)
+    application.state.in_flight = 0
+    application.state.broadcaster = Broadcaster(
+        application.state.pool, connect_kwargs, json_default)
+    application.state.broadcaster.start()
+    yield
+    await application.state.broadcaster.stop()
+    await application.state.pool.close()
+
+
+# Static routes come first, and the float magnitude route before the string one,
+# mirroring Flask's route matching. The feed routes are long-lived, so they are not
+# guarded by the request timeout.
+routes = [
+    Route("/", index),
+    Route("/stream", stream),
+    WebSocketRoute("/ws", websocket_stream),
+    Route("/near", get_earthquakes_near),
+    Route("/bbox", get_earthquakes_in_bbox),
+    Route("/stats", get_statistics),
+    Route("/histogram", get_histogram),
+    Route("/recent", get_all_recent_earthquakes),
+    Route("/recent/{limit:int}", get_all_recent_earthquakes),
+    Route("/magnitude/{mag:flaskfloat}", get_earthquakes_of_certain_magnitude),
+    Route("/magnitude/{mag:flaskfloat}/{limit:int}", get_earthquakes_of_certain_magnitude),
+    Route("/magnitude/{order:str}", get_earthquakes_ordered_by_magnitude),
+    Route("/magnitude/{order:str}/{limit:int}", get_earthquakes_ordered_by_magnitude),
+    Route("/{country_name:str}", get_earthquakes_in_country),
+    Route("/{country_name:str}/{limit:int}", get_earthquakes_in_country),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
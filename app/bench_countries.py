@@ -0,0 +1,73 @@
+"""
+Benchmarks the /<country_name> lookup before and after the country index.
+Fill the event table first with database/synthetic.py, then run: python bench_countries.py
+"""
+
+from statistics import median
+from time import perf_counter
+
+from dotenv import load_dotenv
+
+from app import get_db_connection
+from countries import load_country_index
+from queries import COUNTRY_QUERY
+
+RUNS = 5
+LIMIT = 20
+QUERIES = ["Japan", "America", "Chile", "Indoneisa", "Iceland"]
+
+ILIKE_QUERY = """
+    SELECT * FROM event e
+    JOIN country c ON (e.country_id = c.country_id)
+    WHERE country_name ILIKE %s
+    ORDER BY start_time DESC
+    LIMIT %s;
+"""
+
+
+def median_ms(func) -> float:
+    """Returns the median run time of func in milliseconds."""
+    timings = []
+    for _ in range(RUNS):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+def ilike_lookup(conn, name: str) -> list:
+    """The original substring lookup."""
+    with conn.cursor() as cur:
+        cur.execute(ILIKE_QUERY, (f"%{name}%", LIMIT))
+        return cur.fetchall()
+
+
+def indexed_lookup(conn, name: str) -> list:
+    """Resolves the name in memory, then seeks the (country_id, start_time) index."""
+    country_id = load_country_index(conn).resolve(name)
+    if country_id is None:
+        return []
+    with conn.cursor() as cur:
+        cur.execute(COUNTRY_QUERY, (country_id, LIMIT))
+        return cur.fetchall()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM event;")
+        print(f"event rows: {cur.fetchone()[0]:,}")
+
+    load_country_index(conn)
+    after = {q: median_ms(lambda q=q: indexed_lookup(conn, q)) for q in QUERIES}
+
+    with conn.cursor() as cur:
+        cur.execute("DROP INDEX event_country_id_start_time_idx;")
+    before = {q: median_ms(lambda q=q: ilike_lookup(conn, q)) for q in QUERIES}
+    conn.rollback()
+    conn.close()
+
+    print(f"{'query':<12}{'ILIKE ms':>12}{'indexed ms':>14}")
+    for q in QUERIES:
+        print(f"{q:<12}{before[q]:>12.1f}{after[q]:>14.2f}")
@@ -0,0 +1,38 @@
+"""
+Compares full and conditional (If-None-Match) responses for / and /recent against a
+local database. Fill the event table first with database/synthetic.py, then run:
+python bench_etag.py
+"""
+
+from statistics import median
+from time import perf_counter
+
+from dotenv import load_dotenv
+
+from app import app
+
+RUNS = 20
+URLS = ["/", "/recent", "/recent/500"]
+
+
+def time_get(client, url: str, headers: dict = None) -> tuple[float, int, object]:
+    """Returns the median latency (ms), body size and last response of a GET."""
+    timings = []
+    for _ in range(RUNS):
+        start = perf_counter()
+        response = client.get(url, headers=headers or {})
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings), len(response.get_data()), response
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    client = app.test_client()
+
+    print(f"{'url':<14}{'200 ms':>10}{'200 bytes':>12}{'304 ms':>10}{'304 bytes':>12}")
+    for url in URLS:
+        full_ms, full_bytes, response = time_get(client, url)
+        etag = response.headers["ETag"]
+        hit_ms, hit_bytes, hit = time_get(client, url, {"If-None-Match": etag})
+        assert hit.status_code == 304
+        print(f"{url:<14}{full_ms:>10.2f}{full_bytes:>12}{hit_ms:>10.2f}{hit_bytes:>12}")
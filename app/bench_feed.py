@@ -0,0 +1,104 @@
+"""
+Benchmarks the /stream live feed: opens many idle subscribers, notifies a batch of
+existing events the way the pipeline does and times the fan-out.
+
+    uvicorn asgi:app --port 5001
+    python bench_feed.py http://localhost:5001/stream --clients 2000 --pid <uvicorn pid>
+"""
+
+import argparse
+import asyncio
+import json
+from time import perf_counter
+
+import aiohttp
+from dotenv import load_dotenv
+
+from app import get_db_connection
+from feed import FEED_CHANNEL
+
+EVENTS = 10
+
+
+def rss_mb(pid: int) -> float:
+    """Returns the resident memory of a process in MB."""
+    with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+async def subscriber(session, url: str, ready: asyncio.Event, done: list):
+    """Reads the stream until EVENTS events have arrived."""
+    received = 0
+    async with session.get(url) as resp:
+        async for line in resp.content:
+            if line.startswith(b"retry:"):
+                ready.set()
+            if line.startswith(b"data:"):
+                received += 1
+                if received == EVENTS:
+                    done.append(perf_counter())
+                    return
+
+
+def notify(usgs_event_ids: list[str]) -> None:
+    """Sends one feed notification the way the pipeline load step does."""
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_notify(%s, %s);", (FEED_CHANNEL, json.dumps(usgs_event_ids)))
+    conn.commit()
+    conn.close()
+
+
+def latest_event_ids() -> list[str]:
+    """Returns the usgs_event_ids of a few recent events."""
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT usgs_event_id FROM event ORDER BY event_id DESC LIMIT %s;",
+                    (EVENTS,))
+        ids = [row[0] for row in cur.fetchall()]
+    conn.close()
+    return ids
+
+
+async def main(url: str, clients: int, pid: int) -> None:
+    """Connects the subscribers, notifies once and reports fan-out latency."""
+    usgs_event_ids = latest_event_ids()
+    before_mb = rss_mb(pid) if pid else 0
+    if pid:
+        print(f"server RSS before: {before_mb:.1f} MB")
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        readies = [asyncio.Event() for _ in range(clients)]
+        done = []
+        tasks = [asyncio.create_task(subscriber(session, url, r, done))
+                 for r in readies]
+        await asyncio.gather(*(r.wait() for r in readies))
+        print(f"{clients} subscribers connected")
+        if pid:
+            after_mb = rss_mb(pid)
+            print(f"server RSS connected: {after_mb:.1f} MB "
+                  f"({(after_mb - before_mb) * 1024 / clients:.1f} KB per subscriber)")
+
+        start = perf_counter()
+        await asyncio.to_thread(notify, usgs_event_ids)
+        await asyncio.wait_for(asyncio.gather(*tasks), 60)
+
+    latencies = sorted((t - start) * 1000 for t in done)
+    print(f"{EVENTS} events x {clients} subscribers delivered")
+    print(f"fan-out ms: first {latencies[0]:.1f}  p50 {latencies[len(latencies) // 2]:.1f}"
+          f"  last {latencies[-1]:.1f}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Live feed fan-out benchmark")
+    parser.add_argument("url")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--pid", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.clients, args.pid))
@@ -0,0 +1,67 @@
+"""
+Benchmarks the /near and /bbox queries against a local database.
+Fill the event table first with database/synthetic.py, then run: python bench_geo.py
+"""
+
+from statistics import median
+from time import perf_counter
+
+from dotenv import load_dotenv
+
+from app import get_db_connection
+from queries import near_query, bbox_query
+
+RUNS = 5
+SITES = [
+    ("San Francisco", 37.8, -122.4),
+    ("Tokyo", 35.7, 139.7),
+    ("Mid Atlantic", 10.0, -35.0),
+]
+
+
+def time_query(conn, query: str, params: list) -> tuple[float, int]:
+    """Returns the median latency (ms) and row count of a query."""
+    timings = []
+    with conn.cursor() as cur:
+        for _ in range(RUNS):
+            start = perf_counter()
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            timings.append((perf_counter() - start) * 1000)
+    return median(timings), len(rows)
+
+
+def run_benchmarks(conn) -> list[tuple[str, float, int]]:
+    """Times radius and viewport queries at a few sites."""
+    results = []
+    for name, lat, lon in SITES:
+        for radius_km in (50, 200, 1000):
+            ms, rows = time_query(
+                conn, *near_query(lat, lon, radius_km, "TRUE", [], 100))
+            results.append((f"near {name} {radius_km} km", ms, rows))
+
+        ms, rows = time_query(conn, *bbox_query(
+            lat - 5, lat + 5, lon - 5, lon + 5,
+            "e.magnitude_value >= %s", [4.0], 100))
+        results.append((f"bbox {name} 10x10 deg, M4+", ms, rows))
+    return results
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM event;")
+        print(f"event rows: {cur.fetchone()[0]:,}")
+
+    indexed = run_benchmarks(conn)
+
+    with conn.cursor() as cur:
+        cur.execute("DROP INDEX event_grid_cell_idx;")
+    unindexed = run_benchmarks(conn)
+    conn.rollback()
+    conn.close()
+
+    print(f"{'query':<36}{'rows':>6}{'no index ms':>14}{'grid index ms':>16}")
+    for (name, ms, rows), (_, base_ms, _) in zip(indexed, unindexed):
+        print(f"{name:<36}{rows:>6}{base_ms:>14.1f}{ms:>16.1f}")
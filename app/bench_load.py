@@ -0,0 +1,75 @@
+"""
+Load-tests a running API server at several levels of concurrency.
+
+    python app.py                                  # Flask/psycopg2 on :5000
+    uvicorn asgi:app --port 5001                   # ASGI/asyncpg on :5001
+    python bench_load.py http://localhost:5000/Japan http://localhost:5001/Japan
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+import aiohttp
+
+CONCURRENCY = [1, 50, 500]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Returns the pct-th percentile of an unsorted list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def client(session, url: str, deadline: float, latencies: list, errors: list) -> None:
+    """Sends requests back to back until the deadline, backing off when told to."""
+    while perf_counter() < deadline:
+        start = perf_counter()
+        try:
+            async with session.get(url) as resp:
+                await resp.read()
+                if resp.status != 200:
+                    errors.append(resp.status)
+                    if resp.status == 503:
+                        await asyncio.sleep(float(resp.headers.get("Retry-After", 1)))
+                    continue
+        except aiohttp.ClientError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append((perf_counter() - start) * 1000)
+
+
+async def run_level(url: str, concurrency: int, seconds: float) -> dict:
+    """Runs one concurrency level and summarises its latencies."""
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = perf_counter() + seconds
+        await asyncio.gather(*(client(session, url, deadline, latencies, errors)
+                               for _ in range(concurrency)))
+    return {
+        "concurrency": concurrency,
+        "rps": len(latencies) / seconds,
+        "p50": percentile(latencies, 50) if latencies else float("nan"),
+        "p99": percentile(latencies, 99) if latencies else float("nan"),
+        "errors": len(errors),
+    }
+
+
+async def main(urls: list[str], seconds: float) -> None:
+    """Benchmarks every url at every concurrency level."""
+    print(f"{'url':<40}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for url in urls:
+        for concurrency in CONCURRENCY:
+            r = await run_level(url, concurrency, seconds)
+            print(f"{url:<40}{r['concurrency']:>8}{r['rps']:>10.1f}"
+                  f"{r['p50']:>10.1f}{r['p99']:>10.1f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--seconds", type=float, default=15)
+    args = parser.parse_args()
+    asyncio.run(main(args.urls, args.seconds))
@@ -0,0 +1,79 @@
+"""
+Compares /stats computed in SQL with fetching the rows and aggregating them in
+pandas the way the dashboard does, and checks both give the same figures.
+Fill the event table first with database/synthetic.py, then run: python bench_stats.py
+"""
+
+import json
+import sys
+from datetime import timedelta
+from pathlib import Path
+from time import perf_counter
+
+import pandas as pd
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+
+from app import get_db_connection
+from queries import parse_stats, shape_stats
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "dashboard" / "data"))
+import metrics_calculations as mc  # pylint: disable=wrong-import-position
+
+RANGES = [1, 7, 30]
+
+ROWS_QUERY = """
+    SELECT e.*, c.country_name
+    FROM event e
+    LEFT JOIN country c ON e.country_id = c.country_id
+    WHERE e.start_time >= %s AND e.start_time <= %s
+    ORDER BY e.start_time DESC;
+"""
+
+
+def pandas_stats(conn, start, end) -> tuple[dict, float, int]:
+    """Fetches the rows and aggregates them with metrics_calculations."""
+    begin = perf_counter()
+    df = pd.read_sql(ROWS_QUERY, conn, params=(start, end))
+    stats = {
+        "total_earthquakes": mc.total_quakes(df),
+        "max_magnitude": mc.max_magnitude(df),
+        "average_magnitude": mc.average_magnitude(df),
+        "deepest_km": mc.deepest(df),
+        "shallowest_km": mc.shallowest(df),
+        "countries_affected": mc.countries_affected(df),
+    }
+    return stats, (perf_counter() - begin) * 1000, int(df.memory_usage(deep=True).sum())
+
+
+def sql_stats(conn, args: dict) -> tuple[dict, float, int]:
+    """Runs the /stats query and shapes it as the endpoint does."""
+    begin = perf_counter()
+    query, params, meta = parse_stats(args)
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, params)
+        result = shape_stats(cur.fetchall(), meta)
+    elapsed = (perf_counter() - begin) * 1000
+    return result, elapsed, len(json.dumps(result, default=str))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT MAX(start_time) FROM event;")
+        latest = cur.fetchone()[0]
+
+    print(f"{'days':>5}{'rows':>10}{'pandas ms':>12}{'frame MB':>10}"
+          f"{'SQL ms':>10}{'JSON KB':>10}  same")
+    for days in RANGES:
+        start = latest - timedelta(days=days)
+        args = {"start": start.isoformat(), "end": latest.isoformat(),
+                "bucket": "day" if days <= 30 else "week"}
+        expected, pandas_ms, frame_bytes = pandas_stats(conn, start, latest)
+        result, sql_ms, json_bytes = sql_stats(conn, args)
+        same = {k: float(v) for k, v in expected.items()} == \
+            {k: float(v) for k, v in result["summary"].items()}
+        print(f"{days:>5}{expected['total_earthquakes']:>10}{pandas_ms:>12.0f}"
+              f"{frame_bytes / 1e6:>10.1f}{sql_ms:>10.0f}{json_bytes / 1024:>10.1f}  {same}")
+    conn.close()
@@ -3,6 +3,7 @@
 import pytest
 from unittest.mock import MagicMock
 from app import app
+from countries import CountryIndex
 
 
 @pytest.fixture
@@ -71,4 +72,14 @@ def earthquake_data():
         "country_id": 2,
         "country_name": "Islamic Republic of Afghanistan"
     },
-    ]
\ No newline at end of file
+    ]
+
+@pytest.fixture
+def country_index():
+    """Country index built from a few fake country rows."""
+    return CountryIndex([
+        (2, "Islamic Republic of Afghanistan", "AF"),
+        (116, "Japan", "JP"),
+        (235, "United States of America", "US"),
+        (236, "United Kingdom of Great Britain and Northern Ireland", "GB"),
+    ])
@@ -0,0 +1,106 @@
+"""This script contains the in-memory country index used to resolve country names to ids."""
+
+import re
+from difflib import get_close_matches
+
+FUZZY_CUTOFF = 0.8
+
+# Common names that are not contained in the official names stored in the country table.
+ALIASES = {
+    "usa": "US",
+    "united states": "US",
+    "uk": "GB",
+    "britain": "GB",
+    "great britain": "GB",
+    "england": "GB",
+    "scotland": "GB",
+    "wales": "GB",
+    "mexico": "MX",
+    "russia": "RU",
+    "south korea": "KR",
+    "north korea": "KP",
+    "syria": "SY",
+    "vietnam": "VN",
+    "laos": "LA",
+    "turkey": "TR",
+    "czech republic": "CZ",
+    "ivory coast": "CI",
+    "international waters": "IW",
+    "ocean": "IW",
+}
+
+_CACHE: dict = {}
+
+
+def normalise(text: str) -> str:
+    """Lower-cases a name and collapses punctuation and whitespace."""
+    return " ".join(re.sub(r"[^\w']+", " ", text.casefold()).split())
+
+
+def short_name(name: str) -> str:
+    """Returns the common part of an official name, e.g. 'Republic of Chile' -> 'chile'."""
+    head, comma, _ = name.partition(",")
+    if comma:
+        return normalise(head)
+    _, _, short = normalise(name).rpartition(" of ")
+    return short.removeprefix("the ")
+
+
+class CountryIndex:
+    """Lookup of country ids by ISO code, official name, short name or alias."""
+
+    def __init__(self, rows: list[tuple[int, str, str]]):
+        """Builds the index from (country_id, country_name, country_code) rows."""
+        self.names: dict[str, int] = {}
+        self.keys: dict[str, int] = {}
+        codes: dict[str, int] = {}
+        shorts: dict[str, list[int]] = {}
+
+        for country_id, country_name, country_code in rows:
+            self.names[normalise(country_name)] = country_id
+            codes[country_code.upper()] = country_id
+            short = short_name(country_name)
+            if short:
+                shorts.setdefault(short, []).append(country_id)
+
+        self.codes = codes
+        for alias, code in ALIASES.items():
+            if code in codes:
+                self.keys[alias] = codes[code]
+        for short, ids in shorts.items():
+            if len(ids) == 1:
+                self.keys[short] = ids[0]
+        self.keys.update(self.names)
+
+    def resolve(self, query: str) -> int:
+        """
+        Returns the id of the country best matching the query, or None.
+        Tries an exact ISO code, name or alias, then a whole-word match
+        inside an official name, then a fuzzy match for typos.
+        """
+        if query.upper() in self.codes:
+            return self.codes[query.upper()]
+
+        key = normalise(query)
+        if not key:
+            return None
+        if key in self.keys:
+            return self.keys[key]
+
+        pattern = re.compile(rf"\b{re.escape(key)}\b")
+        contained = [name for name in self.names if pattern.search(name)]
+        if contained:
+            return self.names[min(contained, key=len)]
+
+        close = get_close_matches(key, self.keys, n=1, cutoff=FUZZY_CUTOFF)
+        return self.keys[close[0]] if close else None
+
+
+def load_country_index(connection) -> CountryIndex:
+    """Returns the process-wide country index, loading it from the database on first use."""
+    if "index" not in _CACHE:
+        with connection.cursor() as curs:
+            curs.execute(
+                "SELECT country_id, country_name, country_code FROM country;")
+            _CACHE["index"] = CountryIndex(curs.fetchall())
+    return _CACHE["index"]
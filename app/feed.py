@@ -0,0 +1,169 @@
+"""
+This script contains the live feed behind the /stream (server-sent events) and /ws
+(WebSocket) endpoints of the async server. A single LISTEN connection per process
+receives the usgs_event_ids the pipeline load step notifies on FEED_CHANNEL, fetches
+those events once, serialises each once and fans the bytes out to every subscriber
+whose filters match.
+"""
+
+import asyncio
+import json
+import logging
+from os import environ as ENV
+
+import asyncpg
+
+FEED_CHANNEL = "event_upserted"
+FEED_QUEUE_SIZE = int(ENV.get("FEED_QUEUE_SIZE", "100"))
+FEED_HEARTBEAT = float(ENV.get("FEED_HEARTBEAT", "15"))
+MAX_SUBSCRIBERS = int(ENV.get("MAX_SUBSCRIBERS", "10000"))
+RECONNECT_DELAY = 5
+
+FEED_EVENTS_QUERY = """
+    SELECT e.*, c.country_name, c.country_code
+    FROM event e
+    JOIN country c ON e.country_id = c.country_id
+    WHERE e.usgs_event_id = ANY($1::VARCHAR[])
+    ORDER BY e.start_time;
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """
+    One connected client. Its queue is bounded: a client that falls FEED_QUEUE_SIZE
+    events behind is disconnected rather than buffered without limit.
+    """
+
+    def __init__(self, min_magnitude: float = None, country_id: int = None):
+        self.min_magnitude = min_magnitude
+        self.country_id = country_id
+        self.queue = asyncio.Queue(maxsize=FEED_QUEUE_SIZE)
+        self.lagged = False
+
+    def matches(self, event: dict) -> bool:
+        """Returns True if the event passes this subscriber's filters."""
+        if self.country_id is not None and event["country_id"] != self.country_id:
+            return False
+        if self.min_magnitude is not None and event["magnitude_value"] < self.min_magnitude:
+            return False
+        return True
+
+    def offer(self, event_id: int, data: str) -> None:
+        """Queues an encoded event, marking the subscriber as lagged if it is full."""
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait((event_id, data))
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    async def next(self) -> list[tuple[int, str]]:
+        """
+        Waits for events and returns every (event_id, data) pair queued so far, so a
+        burst is written to the client at once. Returns an empty list on a heartbeat
+        timeout and raises ConnectionAbortedError once the subscriber has lagged.
+        """
+        if self.lagged:
+            raise ConnectionAbortedError("Subscriber fell too far behind.")
+        try:
+            items = [await asyncio.wait_for(self.queue.get(), FEED_HEARTBEAT)]
+        except asyncio.TimeoutError:
+            return []
+        while not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        return items
+
+
+def encode_event(event: dict, json_default) -> str:
+    """Serialises an event row for the feed."""
+    return json.dumps(event, default=json_default, sort_keys=True, separators=(",", ":"))
+
+
+def sse_message(event_id: int, data: str) -> bytes:
+    """Formats an event as a server-sent events message."""
+    return f"id: {event_id}\nevent: earthquake\ndata: {data}\n\n".encode("utf-8")
+
+
+class Broadcaster:
+    """Owns the LISTEN connection and the set of subscribers of one process."""
+
+    def __init__(self, pool, connect_kwargs: dict, json_default):
+        self.pool = pool
+        self.connect_kwargs = connect_kwargs
+        self.json_default = json_default
+        self.subscribers = set()
+        self.pending = set()
+        self.task = None
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        """Registers a subscriber, raising ConnectionRefusedError when full."""
+        if len(self.subscribers) >= MAX_SUBSCRIBERS:
+            raise ConnectionRefusedError("Too many subscribers.")
+        self.subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Removes a subscriber."""
+        self.subscribers.discard(subscriber)
+
+    def publish(self, events: list[dict]) -> int:
+        """Encodes each event once and offers it to matching subscribers."""
+        delivered = 0
+        for event in events:
+            data = None
+            for subscriber in self.subscribers:
+                if not subscriber.matches(event):
+                    continue
+                if data is None:
+                    data = encode_event(event, self.json_default)
+                subscriber.offer(event["event_id"], data)
+                delivered += 1
+        return delivered
+
+    async def handle_notification(self, payload: str) -> None:
+        """Fetches the notified events and publishes them."""
+        if not self.subscribers:
+            return
+        usgs_event_ids = json.loads(payload)
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(FEED_EVENTS_QUERY, usgs_event_ids)
+        self.publish([dict(r) for r in rows])
+
+    def on_notification(self, _conn, _pid, _channel, payload: str) -> None:
+        """asyncpg listener callback; schedules the fetch off the listener."""
+        task = asyncio.get_running_loop().create_task(self.handle_notification(payload))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def listen(self) -> None:
+        """Holds the LISTEN connection, reconnecting if it drops."""
+        while True:
+            try:
+                conn = await asyncpg.connect(**self.connect_kwargs)
+            except (asyncpg.PostgresError, OSError) as e:
+                logger.warning("Feed listener could not connect: %s", e)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _: closed.set())
+            try:
+                await conn.add_listener(FEED_CHANNEL, self.on_notification)
+                await closed.wait()
+            finally:
+                await conn.close()
+            logger.warning("Feed listener disconnected, reconnecting.")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def start(self) -> None:
+        """Starts the listener task."""
+        self.task = asyncio.get_running_loop().create_task(self.listen())
+
+    async def stop(self) -> None:
+        """Stops the listener task."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,99 @@
+"""This script contains the geospatial helpers used by the /near and /bbox endpoints."""
+
+from math import asin, cos, degrees, floor, radians, sin, sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_GRID_CELLS = 2000
+
+# Events are bucketed into 1 degree grid cells, numbered row by row from (-90, -180).
+# This expression must match the event_grid_cell_idx index in database/schema.sql.
+GRID_CELL_SQL = "((FLOOR(e.latitude)::INTEGER + 90) * 360 + FLOOR(e.longitude)::INTEGER + 180)"
+
+DISTANCE_KM_SQL = f"""
+    2 * {EARTH_RADIUS_KM} * ASIN(SQRT(
+        POWER(SIN(RADIANS(e.latitude - %s) / 2), 2) +
+        COS(RADIANS(%s)) * COS(RADIANS(e.latitude)) *
+        POWER(SIN(RADIANS(e.longitude - %s) / 2), 2)
+    ))
+"""
+
+
+def grid_cell(lat: float, lon: float) -> int:
+    """Returns the grid cell a point falls in, mirroring GRID_CELL_SQL."""
+    return (floor(lat) + 90) * 360 + floor(lon) + 180
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Returns the great-circle distance between two points in km."""
+    d_lat = radians(lat2 - lat1)
+    d_lon = radians(lon2 - lon1)
+    a = sin(d_lat / 2) ** 2 + \
+        cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """
+    Returns (min_lat, max_lat, min_lon, max_lon) enclosing a circle on the globe.
+    When the box crosses the antimeridian min_lon is greater than max_lon.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat = lat - degrees(angular)
+    max_lat = lat + degrees(angular)
+
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    spread = sin(angular) / cos(radians(lat))
+    if spread >= 1:
+        return min_lat, max_lat, -180.0, 180.0
+
+    d_lon = degrees(asin(spread))
+    min_lon = lon - d_lon
+    max_lon = lon + d_lon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def lon_ranges(min_lon: float, max_lon: float) -> list[tuple[float, float]]:
+    """Splits a longitude range crossing the antimeridian into two plain ranges."""
+    if min_lon <= max_lon:
+        return [(min_lon, max_lon)]
+    return [(min_lon, 180.0), (-180.0, max_lon)]
+
+
+def grid_cells(min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> list[int]:
+    """
+    Returns every grid cell touched by the box, or None when the box is so large
+    that an index lookup would be slower than scanning the table.
+    """
+    rows = range(floor(min_lat), floor(max_lat) + 1)
+    cols = [c for a, b in lon_ranges(min_lon, max_lon)
+            for c in range(floor(a), floor(b) + 1)]
+
+    if len(rows) * len(cols) > MAX_GRID_CELLS:
+        return None
+    return [(r + 90) * 360 + c + 180 for r in rows for c in cols]
+
+
+def box_filter(min_lat: float, max_lat: float,
+               min_lon: float, max_lon: float) -> tuple[str, list]:
+    """Returns a WHERE clause (and its parameters) restricting events to a box."""
+    clauses = ["e.latitude BETWEEN %s AND %s"]
+    params = [min_lat, max_lat]
+
+    ranges = lon_ranges(min_lon, max_lon)
+    clauses.append(
+        "(" + " OR ".join("e.longitude BETWEEN %s AND %s" for _ in ranges) + ")")
+    for a, b in ranges:
+        params.extend([a, b])
+
+    cells = grid_cells(min_lat, max_lat, min_lon, max_lon)
+    if cells is not None:
+        clauses.append(f"{GRID_CELL_SQL} = ANY(%s)")
+        params.append(cells)
+
+    return " AND ".join(clauses), params
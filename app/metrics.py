@@ -0,0 +1,159 @@
+"""
+This script contains the request instrumentation for the Flask API: per-route
+histograms of total, database and serialisation time, rows and response bytes,
+exposed in Prometheus text format at /metrics, and a slow query log with EXPLAIN.
+"""
+
+import logging
+from bisect import bisect_left
+from os import environ as ENV
+from threading import Lock
+from time import perf_counter
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from psycopg2.extras import RealDictCursor
+
+SLOW_QUERY_MS = float(ENV.get("SLOW_QUERY_MS", "500"))
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000, 5000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """A Prometheus histogram with one series per route."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = Lock()
+
+    def observe(self, route: str, value: float) -> None:
+        """Records one observation for a route."""
+        with self.lock:
+            counts, total = self.series.get(route, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.series[route] = (counts, total + value)
+
+    def render(self) -> list[str]:
+        """Returns the histogram in Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {route: (list(counts), total)
+                      for route, (counts, total) in self.series.items()}
+        for route, (counts, total) in sorted(series.items()):
+            label = f'route="{route}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "api_request_duration_seconds", "Total time spent handling a request.", TIME_BUCKETS)
+DB_SECONDS = Histogram(
+    "api_db_duration_seconds", "Time spent executing and fetching queries.", TIME_BUCKETS)
+SERIALIZATION_SECONDS = Histogram(
+    "api_serialization_duration_seconds", "Time spent encoding JSON.", TIME_BUCKETS)
+RESPONSE_ROWS = Histogram(
+    "api_response_rows", "Rows fetched from the database per request.", ROW_BUCKETS)
+RESPONSE_BYTES = Histogram(
+    "api_response_bytes", "Response body size in bytes.", BYTE_BUCKETS)
+
+HISTOGRAMS = (REQUEST_SECONDS, DB_SECONDS, SERIALIZATION_SECONDS, RESPONSE_ROWS,
+              RESPONSE_BYTES)
+
+
+def add_to_request(name: str, value: float) -> None:
+    """Adds to a per-request total, if there is a request."""
+    if has_request_context():
+        setattr(g, name, g.get(name, 0) + value)
+
+
+def log_slow_query(cursor, query: str, params, elapsed_ms: float) -> None:
+    """Logs a slow query with its parameters and EXPLAIN plan."""
+    try:
+        with cursor.connection.cursor() as explain:
+            explain.execute(f"EXPLAIN {query}", params)
+            plan = "\n".join(row[0] for row in explain.fetchall())
+    except Exception as e:  # pylint: disable=broad-except
+        plan = f"EXPLAIN failed: {e}"
+    logger.warning("Slow query (%.1f ms) params=%r\n%s\n%s",
+                   elapsed_ms, params, query.strip(), plan)
+
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that records database time and rows on the current request."""
+
+    def execute(self, query, vars=None):  # pylint: disable=redefined-builtin
+        start = perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = perf_counter() - start
+            add_to_request("db_seconds", elapsed)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                log_slow_query(self, query, vars, elapsed * 1000)
+
+    def fetchall(self):
+        start = perf_counter()
+        rows = super().fetchall()
+        add_to_request("db_seconds", perf_counter() - start)
+        add_to_request("rows", len(rows))
+        return rows
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing the encoding of each response."""
+
+    def response(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return super().response(*args, **kwargs)
+        finally:
+            add_to_request("serialization_seconds", perf_counter() - start)
+
+
+def render_metrics() -> str:
+    """Returns every histogram in Prometheus text format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def instrument(app) -> None:
+    """Installs the timing hooks, JSON provider and /metrics route on a Flask app."""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timer():
+        g.start = perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if "start" not in g:
+            return response
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(route, perf_counter() - g.start)
+        DB_SECONDS.observe(route, g.get("db_seconds", 0))
+        SERIALIZATION_SECONDS.observe(route, g.get("serialization_seconds", 0))
+        RESPONSE_ROWS.observe(route, g.get("rows", 0))
+        if not response.is_streamed:
+            RESPONSE_BYTES.observe(route, response.calculate_content_length() or 0)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Returns the API metrics in Prometheus text format."""
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
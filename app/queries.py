@@ -0,0 +1,467 @@
+"""
+This script contains the SQL and query-parameter parsing shared by the Flask (app.py)
+and async (asgi.py) API servers. Queries use psycopg2 %s placeholders.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from geo import DISTANCE_KM_SQL, bounding_box, box_filter
+
+MAX_RADIUS_KM = 2000
+DEFAULT_STATS_DAYS = 7
+MAX_BUCKETS = 200
+MAX_BINS = 100
+MAX_STATS_COUNTRIES = 50
+# Bounds a grouped /histogram response to a few thousand counts.
+MAX_HISTOGRAM_CELLS = 2000
+
+BUCKET_SIZES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=31),
+}
+
+HISTOGRAM_FIELDS = {
+    "magnitude": "e.magnitude_value",
+    "depth": "e.depth / 1000.0",
+}
+
+# The same figures as dashboard/data/metrics_calculations.py, rolled up from
+# (bucket, country) cells: depths in km, and the shallowest ignores negative (above
+# sea level) depths.
+STATS_COLUMNS = """
+    SUM(cells.n)::BIGINT AS total_earthquakes,
+    ROUND(MAX(cells.max_magnitude)::NUMERIC, 2)::FLOAT AS max_magnitude,
+    ROUND((SUM(cells.sum_magnitude) / SUM(cells.n))::NUMERIC, 2)::FLOAT AS average_magnitude,
+    ROUND((MAX(cells.max_depth) / 1000)::NUMERIC, 1)::FLOAT AS deepest_km,
+    ROUND((MIN(cells.min_depth) / 1000)::NUMERIC, 1)::FLOAT AS shallowest_km,
+    COUNT(DISTINCT cells.country_id) AS countries_affected
+"""
+
+MOST_RECENT_QUERY = """
+    SELECT * FROM event
+    ORDER BY start_time DESC
+    LIMIT 1;
+"""
+
+RECENT_QUERY = """
+    SELECT *
+    FROM event e
+    JOIN country c ON e.country_id = c.country_id
+    ORDER BY start_time DESC
+    LIMIT %s;
+"""
+
+# Validators for the / and /recent windows: a digest of the (event_id, updated_at)
+# pairs the full query would return, read from the covering start_time index.
+MOST_RECENT_VALIDATOR_QUERY = """
+    SELECT md5(string_agg(event_id || ':' || updated_at, ',' ORDER BY event_id)) AS etag
+    FROM (
+        SELECT event_id, updated_at
+        FROM event
+        ORDER BY start_time DESC
+        LIMIT 1
+    ) AS latest;
+"""
+
+RECENT_VALIDATOR_QUERY = """
+    SELECT md5(string_agg(event_id || ':' || updated_at, ',' ORDER BY event_id)) AS etag
+    FROM (
+        SELECT event_id, updated_at
+        FROM event
+        WHERE country_id IS NOT NULL
+        ORDER BY start_time DESC
+        LIMIT %s
+    ) AS latest;
+"""
+
+COUNTRY_QUERY = """
+    SELECT * FROM event e
+    JOIN country c ON (e.country_id = c.country_id)
+    WHERE e.country_id = %s
+    ORDER BY e.start_time DESC
+    LIMIT %s;
+"""
+
+MAGNITUDE_ORDER_QUERY = """
+    SELECT *
+    FROM event e
+    JOIN country c ON e.country_id = c.country_id
+    ORDER BY magnitude_value {order}
+    LIMIT %s;
+"""
+
+MIN_MAGNITUDE_QUERY = """
+    SELECT * FROM event e
+    JOIN country c ON (e.country_id = c.country_id)
+    WHERE magnitude_value >= %s
+    LIMIT %s;
+"""
+
+
+def get_float_arg(args, name: str, low: float, high: float, default: float = None) -> float:
+    """Reads a float query parameter, raising ValueError if missing or out of range."""
+    value = args.get(name)
+    if value is None:
+        if default is None:
+            raise ValueError(f"Missing {name} parameter.")
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} value.") from None
+    if not low <= number <= high:
+        raise ValueError(f"Invalid {name} value.")
+    return number
+
+
+def get_limit_arg(args, default: int = 20) -> int:
+    """Reads the limit query parameter, raising ValueError if it is not a positive integer."""
+    value = args.get("limit", default)
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("Invalid limit value.") from None
+    if limit < 1:
+        raise ValueError("Invalid limit value.")
+    return limit
+
+
+def get_datetime_arg(args, name: str) -> datetime:
+    """Reads an ISO 8601 query parameter as a naive UTC datetime, matching the event table."""
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} value.") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def get_magnitude_filters(args) -> tuple[list, list]:
+    """Builds the min_magnitude and max_magnitude filter clauses and parameters."""
+    clauses = []
+    params = []
+    for name, operator in (("min_magnitude", ">="), ("max_magnitude", "<=")):
+        if args.get(name) is not None:
+            params.append(get_float_arg(args, name, -2, 10))
+            clauses.append(f"e.magnitude_value {operator} %s")
+    return clauses, params
+
+
+def get_event_filters(args) -> tuple[str, list]:
+    """
+    Builds the time and magnitude filters shared by the query-string endpoints
+    from the start, end, min_magnitude and max_magnitude parameters.
+    """
+    clauses = []
+    params = []
+
+    for name, operator in (("start", ">="), ("end", "<=")):
+        value = get_datetime_arg(args, name)
+        if value is not None:
+            params.append(value)
+            clauses.append(f"e.start_time {operator} %s")
+
+    magnitude_clauses, magnitude_params = get_magnitude_filters(args)
+    clauses.extend(magnitude_clauses)
+    params.extend(magnitude_params)
+
+    return " AND ".join(clauses) or "TRUE", params
+
+
+def get_time_range(args) -> tuple[datetime, datetime]:
+    """Reads start and end, defaulting to the DEFAULT_STATS_DAYS before now."""
+    end = get_datetime_arg(args, "end")
+    if end is None:
+        end = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    start = get_datetime_arg(args, "start")
+    if start is None:
+        start = end - timedelta(days=DEFAULT_STATS_DAYS)
+    if start > end:
+        raise ValueError("start must not be after end.")
+    return start, end
+
+
+def get_summary_filters(args, start: datetime, end: datetime,
+                        country_id: int = None) -> tuple[str, list]:
+    """Builds the time range, magnitude and country filters of /stats and /histogram."""
+    clauses = ["e.start_time >= %s", "e.start_time <= %s"]
+    params = [start, end]
+
+    magnitude_clauses, magnitude_params = get_magnitude_filters(args)
+    clauses.extend(magnitude_clauses)
+    params.extend(magnitude_params)
+
+    if country_id is not None:
+        clauses.append("e.country_id = %s")
+        params.append(country_id)
+
+    return " AND ".join(clauses), params
+
+
+def near_query(lat: float, lon: float, radius_km: float,
+               filters: str, filter_params: list, limit: int) -> tuple[str, list]:
+    """Returns the SQL (and parameters) for earthquakes within radius_km of a point."""
+    spatial, spatial_params = box_filter(*bounding_box(lat, lon, radius_km))
+    query = f"""
+        SELECT *
+        FROM (
+            SELECT e.*, c.country_name, c.country_code,
+                {DISTANCE_KM_SQL} AS distance_km
+            FROM event e
+            JOIN country c ON e.country_id = c.country_id
+            WHERE {spatial}
+            AND {filters}
+        ) AS nearby
+        WHERE distance_km <= %s
+        ORDER BY start_time DESC
+        LIMIT %s;
+    """
+    params = [lat, lat, lon,
+              *spatial_params, *filter_params, radius_km, limit]
+    return query, params
+
+
+def bbox_query(min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+               filters: str, filter_params: list, limit: int) -> tuple[str, list]:
+    """Returns the SQL (and parameters) for earthquakes inside a bounding box."""
+    spatial, spatial_params = box_filter(min_lat, max_lat, min_lon, max_lon)
+    query = f"""
+        SELECT e.*, c.country_name, c.country_code
+        FROM event e
+        JOIN country c ON e.country_id = c.country_id
+        WHERE {spatial}
+        AND {filters}
+        ORDER BY e.start_time DESC
+        LIMIT %s;
+    """
+    return query, [*spatial_params, *filter_params, limit]
+
+
+def parse_near(args) -> tuple[str, list]:
+    """Builds the /near query from its parameters, raising ValueError on bad input."""
+    lat = get_float_arg(args, "lat", -90, 90)
+    lon = get_float_arg(args, "lon", -180, 180)
+    radius_km = get_float_arg(args, "radius_km", 0, MAX_RADIUS_KM, default=100)
+    limit = get_limit_arg(args)
+    filters, filter_params = get_event_filters(args)
+    return near_query(lat, lon, radius_km, filters, filter_params, limit)
+
+
+def parse_bbox(args) -> tuple[str, list]:
+    """Builds the /bbox query from its parameters, raising ValueError on bad input."""
+    min_lat = get_float_arg(args, "min_lat", -90, 90)
+    max_lat = get_float_arg(args, "max_lat", -90, 90)
+    min_lon = get_float_arg(args, "min_lon", -180, 180)
+    max_lon = get_float_arg(args, "max_lon", -180, 180)
+    if min_lat > max_lat:
+        raise ValueError("min_lat must not be greater than max_lat.")
+    limit = get_limit_arg(args)
+    filters, filter_params = get_event_filters(args)
+    return bbox_query(min_lat, max_lat, min_lon, max_lon, filters, filter_params, limit)
+
+
+def parse_stats(args, country_id: int = None) -> tuple[str, list, dict]:
+    """
+    Builds the /stats query: one hash aggregate over the range into (bucket, country)
+    cells, rolled up into the overall figures, the figures per time bucket and the
+    figures per country.
+    """
+    bucket = args.get("bucket", "day")
+    if bucket not in BUCKET_SIZES:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKET_SIZES)}.")
+    start, end = get_time_range(args)
+    if (end - start) / BUCKET_SIZES[bucket] > MAX_BUCKETS:
+        raise ValueError(f"Too many {bucket} buckets, use a wider bucket or shorter range.")
+
+    limit = min(get_limit_arg(args), MAX_STATS_COUNTRIES)
+
+    filters, params = get_summary_filters(args, start, end, country_id)
+    query = f"""
+        WITH cells AS (
+            SELECT
+                date_trunc('{bucket}', e.start_time) AS bucket,
+                e.country_id,
+                COUNT(*) AS n,
+                MAX(e.magnitude_value) AS max_magnitude,
+                SUM(e.magnitude_value) AS sum_magnitude,
+                MAX(e.depth) AS max_depth,
+                MIN(e.depth) FILTER (WHERE e.depth >= 0) AS min_depth
+            FROM event e
+            WHERE {filters}
+            GROUP BY 1, 2
+        )
+        SELECT
+            GROUPING(cells.bucket, cells.country_id) AS grouping_set,
+            cells.bucket,
+            cells.country_id,
+            c.country_name,
+            {STATS_COLUMNS}
+        FROM cells
+        LEFT JOIN country c ON cells.country_id = c.country_id
+        GROUP BY GROUPING SETS ((), (cells.bucket), (cells.country_id, c.country_name));
+    """
+    return query, params, {"start": start, "end": end, "bucket": bucket, "limit": limit}
+
+
+def shape_stats(rows: list[dict], meta: dict) -> dict:
+    """
+    Splits the /stats rows into the overall summary, buckets in time order and
+    the top countries by count.
+    """
+    summary, buckets, countries = None, [], []
+    for row in rows:
+        row = dict(row)
+        grouping_set = row.pop("grouping_set")
+        if grouping_set == 3:
+            summary = {k: v for k, v in row.items()
+                       if k not in ("bucket", "country_id", "country_name")}
+        elif grouping_set == 1:
+            row.pop("country_id")
+            row.pop("country_name")
+            buckets.append(row)
+        else:
+            row.pop("bucket")
+            countries.append(row)
+
+    buckets.sort(key=lambda r: r["bucket"])
+    countries.sort(key=lambda r: (-r["total_earthquakes"], r["country_name"] or ""))
+    return {
+        "start": meta["start"],
+        "end": meta["end"],
+        "bucket": meta["bucket"],
+        "summary": summary,
+        "buckets": buckets,
+        "countries": countries[:meta["limit"]],
+    }
+
+
+def parse_histogram(args, country_id: int = None) -> tuple[str, list, dict]:
+    """
+    Builds the /histogram query: equal-width bins over the field's range, and with
+    group=bucket or group=country the counts in the same bins per time bucket or
+    for the top limit countries.
+    """
+    field = args.get("field", "magnitude")
+    if field not in HISTOGRAM_FIELDS:
+        raise ValueError(f"field must be one of {', '.join(HISTOGRAM_FIELDS)}.")
+    bins = args.get("bins", "20")
+    if not str(bins).isdigit() or not 1 <= int(bins) <= MAX_BINS:
+        raise ValueError("Invalid bins value.")
+    bins = int(bins)
+    start, end = get_time_range(args)
+    meta = {"start": start, "end": end, "field": field, "bins": bins, "group": None}
+
+    filters, params = get_summary_filters(args, start, end, country_id)
+    group = args.get("group")
+    if group is None:
+        group_column, top_groups = "NULL", ""
+    elif group == "bucket":
+        bucket = args.get("bucket", "day")
+        if bucket not in BUCKET_SIZES:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKET_SIZES)}.")
+        groups = (end - start) / BUCKET_SIZES[bucket]
+        if groups > MAX_BUCKETS or groups * bins > MAX_HISTOGRAM_CELLS:
+            raise ValueError(f"Too many {bucket} buckets, use a wider bucket, fewer bins "
+                             "or a shorter range.")
+        group_column, top_groups = f"date_trunc('{bucket}', e.start_time)", ""
+        meta.update(group=group, bucket=bucket)
+    elif group == "country":
+        limit = min(get_limit_arg(args), MAX_STATS_COUNTRIES, MAX_HISTOGRAM_CELLS // bins)
+        group_column = "e.country_id"
+        top_groups = f"""
+            HAVING GROUPING(binned.grp) = 1 OR binned.grp IN (
+                SELECT grp FROM filtered
+                GROUP BY grp
+                ORDER BY COUNT(*) DESC, grp
+                LIMIT {limit}
+            )"""
+        meta.update(group=group)
+    else:
+        raise ValueError("group must be one of bucket, country.")
+
+    country_join = "binned.grp" if group == "country" else "NULL"
+    # Without a group every grp is NULL, so the one grouping set is the overall bins.
+    grouping_sets = "(binned.grp, c.country_name, binned.bin)"
+    if group is not None:
+        grouping_sets = "(binned.bin), " + grouping_sets
+    query = f"""
+        WITH filtered AS (
+            SELECT {HISTOGRAM_FIELDS[field]} AS value, {group_column} AS grp
+            FROM event e
+            WHERE {filters}
+        ),
+        bounds AS (
+            SELECT MIN(value) AS low,
+                GREATEST(MAX(value), MIN(value) + 1e-9) AS high
+            FROM filtered
+        ),
+        binned AS (
+            SELECT filtered.grp,
+                LEAST(width_bucket(value, low, high, {bins}), {bins}) AS bin,
+                low,
+                high
+            FROM filtered, bounds
+        )
+        SELECT
+            GROUPING(binned.grp) AS grouping_set,
+            binned.grp,
+            c.country_name,
+            binned.bin,
+            MIN(binned.low) AS low,
+            MIN(binned.high) AS high,
+            COUNT(*) AS count
+        FROM binned
+        LEFT JOIN country c ON c.country_id = {country_join}
+        GROUP BY GROUPING SETS ({grouping_sets}){top_groups}
+        ORDER BY binned.bin;
+    """
+    return query, params, meta
+
+
+def shape_histogram(rows: list[dict], meta: dict) -> dict:
+    """
+    Turns the /histogram rows into every bin's bounds and count, empty bins included,
+    and with a group, each group's counts in the same bins.
+    """
+    bins = meta["bins"]
+    overall = [row for row in rows if not meta["group"] or row["grouping_set"] == 1]
+    counts = {row["bin"]: row["count"] for row in overall}
+    histogram = []
+    if rows:
+        low, high = rows[0]["low"], rows[0]["high"]
+        width = (high - low) / bins
+        histogram = [{"lower": round(low + i * width, 3),
+                      "upper": round(low + (i + 1) * width, 3),
+                      "count": counts.get(i + 1, 0)}
+                     for i in range(bins)]
+    result = {
+        "start": meta["start"],
+        "end": meta["end"],
+        "field": meta["field"],
+        "bins": histogram,
+    }
+    if not meta["group"]:
+        return result
+
+    groups = {}
+    for row in rows:
+        if row["grouping_set"] == 0 and row["bin"] is not None:
+            group = groups.setdefault(row["grp"], {"name": row["country_name"],
+                                                   "counts": [0] * bins})
+            group["counts"][row["bin"] - 1] = row["count"]
+    if meta["group"] == "bucket":
+        result["bucket"] = meta["bucket"]
+        result["groups"] = [{"bucket": grp, "counts": group["counts"]}
+                            for grp, group in sorted(groups.items())]
+    else:
+        result["groups"] = sorted(
+            ({"country_name": group["name"], "counts": group["counts"]}
+             for group in groups.values()),
+            key=lambda g: (-sum(g["counts"]), g["country_name"] or ""))
+    return result
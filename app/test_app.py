@@ -2,6 +2,8 @@
 # pylint: skip-file
 from unittest.mock import patch
 
+import pytest
+
 from psycopg2 import Error
 
 
@@ -17,13 +19,30 @@ def test_index_db_connection_failure(get_conn_mock, client):
 
 @patch("app.connect")
 def test_index_returns_earthquake(connect_mock, client, earthquake_data, mock_db):
-    mock_conn, _ = mock_db([earthquake_data])
+    mock_conn, mock_cursor = mock_db([earthquake_data])
+    mock_cursor.fetchone.side_effect = None
+    mock_cursor.fetchone.return_value = {"etag": "abc123"}
     connect_mock.return_value = mock_conn
 
     response = client.get("/")
 
     assert response.status_code == 200
     assert response.json == [[earthquake_data]]
+    assert response.headers["ETag"] == '"abc123"'
+
+
+@patch("app.connect")
+def test_index_not_modified(connect_mock, client, mock_db):
+    mock_conn, mock_cursor = mock_db([])
+    mock_cursor.fetchone.side_effect = None
+    mock_cursor.fetchone.return_value = {"etag": "abc123"}
+    connect_mock.return_value = mock_conn
+
+    response = client.get("/", headers={"If-None-Match": '"abc123"'})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"abc123"'
+    mock_cursor.fetchall.assert_not_called()
 
 
 @patch("app.connect")
@@ -44,37 +63,77 @@ def test_get_all_recent_earthquakes(connect_mock, client, earthquake_data, mock_
     rows = [earthquake_data]
 
     mock_conn, mock_cursor = mock_db(rows)
+    mock_cursor.fetchone.side_effect = None
+    mock_cursor.fetchone.return_value = {"etag": "abc123"}
     connect_mock.return_value = mock_conn
 
     response = client.get("/recent")
 
     assert response.status_code == 200
     assert response.json == rows
+    assert response.headers["ETag"] == '"abc123"'
 
-    mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_count == 2
 
 
-@patch('app.connect')
-def test_get_earthquakes_in_country_found(connect_mock, client, earthquake_data, mock_db):
+@pytest.mark.parametrize("if_none_match,expected", [
+    ('"abc123"', 304),
+    ('"abc123", "def456"', 304),
+    ('"def456"', 200),
+])
+@patch("app.connect")
+def test_get_all_recent_earthquakes_conditional(connect_mock, client, earthquake_data,
+                                                mock_db, if_none_match, expected):
     mock_conn, mock_cursor = mock_db([earthquake_data])
+    mock_cursor.fetchone.side_effect = None
+    mock_cursor.fetchone.return_value = {"etag": "abc123"}
+    connect_mock.return_value = mock_conn
+
+    response = client.get("/recent/5", headers={"If-None-Match": if_none_match})
+
+    assert response.status_code == expected
+    assert mock_cursor.fetchall.called is (expected == 200)
+
+
+@patch('app.load_country_index')
+@patch('app.connect')
+def test_get_earthquakes_in_country_found(connect_mock, index_mock, client, earthquake_data, mock_db, country_index):
+    mock_conn, mock_cursor = mock_db(earthquake_data)
     connect_mock.return_value = mock_conn
+    index_mock.return_value = country_index
 
     response = client.get('/America')
     assert response.status_code == 200
     data = response.get_json()
     assert data == earthquake_data
     mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_args[0][1] == (235, 20)
 
 
+@patch('app.load_country_index')
 @patch('app.connect')
-def test_get_earthquakes_in_country_not_found(connect_mock, client, mock_db):
+def test_get_earthquakes_in_country_no_earthquakes(connect_mock, index_mock, client, mock_db, country_index):
     mock_conn, mock_cursor = mock_db([])
     connect_mock.return_value = mock_conn
+    index_mock.return_value = country_index
 
-    response = client.get('/England')
+    response = client.get('/AF/5')
     assert response.status_code == 404
     assert response.get_json() == {"error": "No recent earthquakes here."}
-    mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_args[0][1] == (2, 5)
+
+
+@patch('app.load_country_index')
+@patch('app.connect')
+def test_get_earthquakes_in_country_not_found(connect_mock, index_mock, client, mock_db, country_index):
+    mock_conn, mock_cursor = mock_db([])
+    connect_mock.return_value = mock_conn
+    index_mock.return_value = country_index
+
+    response = client.get('/Atlantis')
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Country not found."}
+    mock_cursor.execute.assert_not_called()
 
 
 @patch('app.connect')
@@ -123,3 +182,90 @@ def test_get_earthquakes_ordered_by_magnitude_invalid(connect_mock, client, mock
     response = client.get('/magnitude/sideways')
     assert response.status_code == 400
     assert response.get_json() == {"error": "Invalid order direction."}
+
+
+@patch('app.connect')
+def test_get_earthquakes_near(connect_mock, client, earthquake_data, mock_db):
+    mock_conn, mock_cursor = mock_db(earthquake_data)
+    connect_mock.return_value = mock_conn
+
+    response = client.get('/near?lat=60.5&lon=-151.1&radius_km=200&min_magnitude=2')
+    assert response.status_code == 200
+    assert response.get_json() == earthquake_data
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert "distance_km <= %s" in query
+    assert "e.magnitude_value >= %s" in query
+    assert params[-2:] == [200.0, 20]
+
+
+@pytest.mark.parametrize("query_string", [
+    "lon=-151.1",
+    "lat=91&lon=0",
+    "lat=0&lon=0&radius_km=-5",
+    "lat=0&lon=0&start=yesterday",
+    "lat=0&lon=0&limit=0",
+])
+@patch('app.connect')
+def test_get_earthquakes_near_invalid(connect_mock, client, query_string):
+    response = client.get(f'/near?{query_string}')
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    connect_mock.assert_not_called()
+
+
+@patch('app.connect')
+def test_get_earthquakes_in_bbox_across_antimeridian(connect_mock, client, earthquake_data, mock_db):
+    mock_conn, mock_cursor = mock_db(earthquake_data)
+    connect_mock.return_value = mock_conn
+
+    response = client.get('/bbox?min_lat=50&max_lat=70&min_lon=170&max_lon=-140')
+    assert response.status_code == 200
+
+    query, params = mock_cursor.execute.call_args[0]
+    assert query.count("e.longitude BETWEEN %s AND %s") == 2
+    assert params[2:6] == [170.0, 180.0, -180.0, -140.0]
+
+
+@patch('app.connect')
+def test_get_earthquakes_in_bbox_invalid(connect_mock, client):
+    response = client.get('/bbox?min_lat=10&max_lat=0&min_lon=0&max_lon=10')
+    assert response.status_code == 400
+
+
+@patch('app.connect')
+def test_get_statistics(connect_mock, client, mock_db):
+    rows = [{"grouping_set": 3, "bucket": None, "country_id": None, "country_name": None,
+             "total_earthquakes": 4, "max_magnitude": 5.6}]
+    mock_conn, _ = mock_db(rows)
+    connect_mock.return_value = mock_conn
+
+    response = client.get("/stats?start=2026-02-01T00:00:00&end=2026-02-08T00:00:00")
+
+    assert response.status_code == 200
+    assert response.json["summary"] == {"total_earthquakes": 4, "max_magnitude": 5.6}
+    assert response.json["buckets"] == []
+
+
+@patch('app.connect')
+def test_get_statistics_invalid_bucket(connect_mock, client, mock_db):
+    mock_conn, mock_cursor = mock_db([])
+    connect_mock.return_value = mock_conn
+
+    response = client.get("/stats?bucket=decade")
+
+    assert response.status_code == 400
+    mock_cursor.execute.assert_not_called()
+
+
+@patch('app.load_country_index')
+@patch('app.connect')
+def test_get_histogram_country_not_found(connect_mock, index_mock, client, mock_db, country_index):
+    mock_conn, _ = mock_db([])
+    connect_mock.return_value = mock_conn
+    index_mock.return_value = country_index
+
+    response = client.get("/histogram?country=Atlantis")
+
+    assert response.status_code == 404
+    assert response.json == {"error": "Country not found."}
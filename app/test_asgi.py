@@ -0,0 +1,80 @@
+"""Tests for the async API server helpers."""
+# pylint: skip-file
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from starlette.routing import Match
+
+import app as flask_app
+import asgi
+from asgi import FlaskJSONResponse, guarded, to_asyncpg
+
+
+def make_request(in_flight=0):
+    state = SimpleNamespace(in_flight=in_flight)
+    return SimpleNamespace(app=SimpleNamespace(state=state))
+
+
+def test_to_asyncpg_numbers_placeholders():
+    query = "SELECT * FROM event WHERE country_id = %s AND magnitude_value >= %s LIMIT %s;"
+    assert to_asyncpg(query) == (
+        "SELECT * FROM event WHERE country_id = $1 AND magnitude_value >= $2 LIMIT $3;")
+
+
+def test_response_matches_flask_jsonify():
+    response = FlaskJSONResponse([{"b": 1, "a": datetime(2024, 1, 2, 3, 4, 5)}])
+    assert response.body == b'[{"a":"Tue, 02 Jan 2024 03:04:05 GMT","b":1}]'
+
+
+def test_guarded_rejects_when_busy():
+    @guarded
+    async def handler(request):
+        raise AssertionError("should not run")
+
+    response = asyncio.run(handler(make_request(in_flight=asgi.MAX_IN_FLIGHT)))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_guarded_times_out(monkeypatch):
+    monkeypatch.setattr(asgi, "REQUEST_TIMEOUT", 0.01)
+
+    @guarded
+    async def handler(request):
+        await asyncio.sleep(1)
+
+    request = make_request()
+    response = asyncio.run(handler(request))
+    assert response.status_code == 504
+    assert request.app.state.in_flight == 0
+
+
+def test_guarded_database_error():
+    @guarded
+    async def handler(request):
+        raise OSError("connection refused")
+
+    response = asyncio.run(handler(make_request()))
+    assert response.status_code == 500
+
+
+def asgi_endpoint(path):
+    scope = {"type": "http", "path": path, "method": "GET"}
+    for route in asgi.routes:
+        match, child = route.matches(scope)
+        if match == Match.FULL:
+            return route.endpoint.__name__, child["path_params"]
+    return None
+
+
+@pytest.mark.parametrize("path", ["/magnitude/5", "/magnitude/5.5", "/magnitude/5.5/10",
+                                  "/magnitude/5/10", "/magnitude/desc", "/recent/3"])
+def test_routes_match_the_same_view_as_flask(path):
+    name, params = asgi_endpoint(path)
+    flask_name, flask_params = flask_app.app.url_map.bind("localhost").match(path)
+
+    # Flask fills in route defaults such as limit, which the ASGI handlers default
+    assert name == flask_name
+    assert params.items() <= flask_params.items()
@@ -0,0 +1,55 @@
+"""Tests for the in-memory country index."""
+# pylint: skip-file
+import pytest
+
+import countries
+from countries import CountryIndex, load_country_index, short_name
+
+
+@pytest.mark.parametrize("name,expected", [
+    ("Republic of Chile", "chile"),
+    ("Republic of the Congo", "congo"),
+    ("Korea, Republic of", "korea"),
+    ("Japan", "japan"),
+])
+def test_short_name(name, expected):
+    assert short_name(name) == expected
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("US", 235),
+    ("jp", 116),
+    ("Japan", 116),
+    ("united states of america", 235),
+    ("America", 235),
+    ("Afghanistan", 2),
+    ("England", 236),
+    ("usa", 235),
+    ("Afganistan", 2),
+    ("Japn", 116),
+    ("Atlantis", None),
+    ("", None),
+])
+def test_country_index_resolve(country_index, query, expected):
+    assert country_index.resolve(query) == expected
+
+
+def test_country_index_prefers_shortest_containing_name():
+    index = CountryIndex([
+        (1, "Congo, The Democratic Republic of the", "CD"),
+        (2, "Republic of the Congo", "CG"),
+    ])
+
+    assert index.resolve("Congo") == 2
+
+
+def test_load_country_index_queries_once(mock_db, monkeypatch):
+    monkeypatch.setattr(countries, "_CACHE", {})
+    mock_conn, mock_cursor = mock_db([(116, "Japan", "JP")])
+
+    first = load_country_index(mock_conn)
+    second = load_country_index(mock_conn)
+
+    assert first is second
+    assert first.resolve("Japan") == 116
+    mock_cursor.execute.assert_called_once()
@@ -0,0 +1,72 @@
+"""Tests for the live feed fan-out."""
+# pylint: skip-file
+import asyncio
+
+import pytest
+
+import feed
+from asgi import json_default
+from feed import Broadcaster, Subscriber, sse_message
+
+
+def make_event(event_id=1, country_id=1, magnitude_value=5.0):
+    return {"event_id": event_id, "country_id": country_id,
+            "magnitude_value": magnitude_value}
+
+
+@pytest.mark.parametrize("subscriber,expected", [
+    (Subscriber(), True),
+    (Subscriber(min_magnitude=4.5), True),
+    (Subscriber(min_magnitude=5.5), False),
+    (Subscriber(country_id=1), True),
+    (Subscriber(country_id=2), False),
+])
+def test_subscriber_matches(subscriber, expected):
+    assert subscriber.matches(make_event()) is expected
+
+
+def test_publish_fans_out_to_matching_subscribers():
+    broadcaster = Broadcaster(None, {}, json_default)
+    japan, chile = Subscriber(country_id=1), Subscriber(country_id=2)
+    broadcaster.subscribe(japan)
+    broadcaster.subscribe(chile)
+
+    assert broadcaster.publish([make_event(7)]) == 1
+    assert japan.queue.get_nowait() == (
+        7, '{"country_id":1,"event_id":7,"magnitude_value":5.0}')
+    assert chile.queue.empty()
+
+
+def test_lagging_subscriber_is_dropped(monkeypatch):
+    monkeypatch.setattr(feed, "FEED_QUEUE_SIZE", 2)
+    subscriber = Subscriber()
+    for i in range(3):
+        subscriber.offer(i, "{}")
+
+    assert subscriber.lagged
+    with pytest.raises(ConnectionAbortedError):
+        asyncio.run(subscriber.next())
+
+
+def test_next_returns_empty_on_heartbeat(monkeypatch):
+    monkeypatch.setattr(feed, "FEED_HEARTBEAT", 0.01)
+    assert asyncio.run(Subscriber().next()) == []
+
+
+def test_next_drains_burst():
+    subscriber = Subscriber()
+    for i in range(3):
+        subscriber.offer(i, "{}")
+    assert asyncio.run(subscriber.next()) == [(0, "{}"), (1, "{}"), (2, "{}")]
+
+
+def test_subscribe_limit(monkeypatch):
+    monkeypatch.setattr(feed, "MAX_SUBSCRIBERS", 1)
+    broadcaster = Broadcaster(None, {}, json_default)
+    broadcaster.subscribe(Subscriber())
+    with pytest.raises(ConnectionRefusedError):
+        broadcaster.subscribe(Subscriber())
+
+
+def test_sse_message():
+    assert sse_message(7, "{}") == b"id: 7\nevent: earthquake\ndata: {}\n\n"
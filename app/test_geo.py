@@ -0,0 +1,54 @@
+"""Tests for the geospatial helper functions."""
+# pylint: skip-file
+import pytest
+
+from geo import (bounding_box, box_filter, grid_cell, grid_cells,
+                 haversine_km, lon_ranges)
+
+
+def test_haversine_km_known_distance():
+    # London to Paris is roughly 344 km.
+    assert haversine_km(51.5074, -0.1278, 48.8566, 2.3522) == pytest.approx(344, abs=2)
+
+
+def test_haversine_km_same_point():
+    assert haversine_km(10, 20, 10, 20) == 0
+
+
+def test_bounding_box_contains_circle():
+    min_lat, max_lat, min_lon, max_lon = bounding_box(60.0, 10.0, 200)
+
+    assert haversine_km(60.0, 10.0, max_lat, 10.0) == pytest.approx(200, rel=1e-6)
+    assert haversine_km(60.0, 10.0, 60.0, max_lon) >= 200
+    assert min_lat < 60.0 < max_lat
+    assert min_lon < 10.0 < max_lon
+
+
+def test_bounding_box_wraps_antimeridian():
+    min_lat, max_lat, min_lon, max_lon = bounding_box(0.0, 179.5, 200)
+
+    assert min_lon > max_lon
+    assert lon_ranges(min_lon, max_lon) == [(min_lon, 180.0), (-180.0, max_lon)]
+
+
+def test_bounding_box_near_pole_covers_all_longitudes():
+    assert bounding_box(89.5, 0.0, 300)[2:] == (-180.0, 180.0)
+
+
+def test_grid_cells_cover_points_inside_box():
+    cells = grid_cells(34.2, 36.8, 138.5, 140.1)
+
+    assert len(cells) == 3 * 3
+    assert grid_cell(35.7, 139.7) in cells
+    assert grid_cell(34.2, 140.1) in cells
+
+
+def test_grid_cells_too_large_returns_none():
+    assert grid_cells(-90, 90, -180, 180) is None
+
+
+def test_box_filter_skips_grid_for_large_boxes():
+    clause, params = box_filter(-80, 80, -170, 170)
+
+    assert "ANY" not in clause
+    assert params == [-80, 80, -170, 170]
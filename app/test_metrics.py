@@ -0,0 +1,53 @@
+"""Tests for the API instrumentation and /metrics endpoint."""
+# pylint: skip-file
+import logging
+from unittest.mock import MagicMock, patch
+
+from metrics import Histogram, log_slow_query
+
+
+def test_histogram_render():
+    histogram = Histogram("rows", "Rows.", (1, 10))
+    histogram.observe("/recent", 1)
+    histogram.observe("/recent", 5)
+    histogram.observe("/recent", 50)
+
+    assert histogram.render() == [
+        "# HELP rows Rows.",
+        "# TYPE rows histogram",
+        'rows_bucket{route="/recent",le="1"} 1',
+        'rows_bucket{route="/recent",le="10"} 2',
+        'rows_bucket{route="/recent",le="+Inf"} 3',
+        'rows_sum{route="/recent"} 56',
+        'rows_count{route="/recent"} 3',
+    ]
+
+
+@patch("app.connect")
+def test_metrics_records_route(connect_mock, client, earthquake_data, mock_db):
+    mock_conn, mock_cursor = mock_db(earthquake_data)
+    mock_cursor.fetchone.side_effect = None
+    mock_cursor.fetchone.return_value = {"etag": "abc123"}
+    connect_mock.return_value = mock_conn
+    client.get("/recent/2")
+
+    response = client.get("/metrics")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert 'api_request_duration_seconds_count{route="/recent/<int:limit>"}' in body
+    assert 'api_response_bytes_bucket{route="/recent/<int:limit>",le="+Inf"}' in body
+
+
+def test_log_slow_query_includes_plan(caplog):
+    cursor = MagicMock()
+    explain = cursor.connection.cursor.return_value.__enter__.return_value
+    explain.fetchall.return_value = [("Seq Scan on event",)]
+
+    with caplog.at_level(logging.WARNING, logger="metrics"):
+        log_slow_query(cursor, "SELECT * FROM event WHERE country_id = %s", (5,), 812.0)
+
+    explain.execute.assert_called_once_with(
+        "EXPLAIN SELECT * FROM event WHERE country_id = %s", (5,))
+    assert "Seq Scan on event" in caplog.text
+    assert "params=(5,)" in caplog.text
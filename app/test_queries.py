@@ -0,0 +1,124 @@
+"""Tests for the shared query building and shaping."""
+# pylint: skip-file
+from datetime import datetime
+
+import pytest
+
+from queries import (get_time_range, parse_stats, shape_stats, parse_histogram,
+                     shape_histogram, MOST_RECENT_VALIDATOR_QUERY, RECENT_VALIDATOR_QUERY)
+
+RANGE = {"start": "2026-02-01T00:00:00", "end": "2026-02-08T00:00:00"}
+
+
+def test_get_time_range_defaults_to_last_week():
+    start, end = get_time_range({"end": "2026-02-08T00:00:00"})
+    assert (start, end) == (datetime(2026, 2, 1), datetime(2026, 2, 8))
+
+
+def test_get_time_range_rejects_reversed_range():
+    with pytest.raises(ValueError):
+        get_time_range({"start": "2026-02-08T00:00:00", "end": "2026-02-01T00:00:00"})
+
+
+@pytest.mark.parametrize("query", [MOST_RECENT_VALIDATOR_QUERY, RECENT_VALIDATOR_QUERY])
+def test_validators_change_when_an_event_is_revised(query):
+    assert "event_id || ':' || updated_at" in query
+    assert "creation_time" not in query
+
+
+@pytest.mark.parametrize("args", [
+    {**RANGE, "bucket": "year"},
+    {**RANGE, "bucket": "hour", "start": "2026-01-01T00:00:00"},
+])
+def test_parse_stats_invalid(args):
+    with pytest.raises(ValueError):
+        parse_stats(args)
+
+
+def test_parse_stats_filters_country():
+    query, params, meta = parse_stats({**RANGE, "min_magnitude": "2"}, country_id=116)
+    assert "date_trunc('day', e.start_time)" in query
+    assert params == [datetime(2026, 2, 1), datetime(2026, 2, 8), 2.0, 116]
+    assert meta["bucket"] == "day"
+
+
+def test_shape_stats_splits_grouping_sets():
+    stats = {"total_earthquakes": 1, "max_magnitude": 2.0}
+    rows = [
+        {"grouping_set": 3, "bucket": None, "country_id": None, "country_name": None,
+         **stats, "total_earthquakes": 3},
+        {"grouping_set": 1, "bucket": datetime(2026, 2, 2), "country_id": None,
+         "country_name": None, **stats},
+        {"grouping_set": 1, "bucket": datetime(2026, 2, 1), "country_id": None,
+         "country_name": None, **stats, "total_earthquakes": 2},
+        {"grouping_set": 2, "bucket": None, "country_id": 1, "country_name": "Japan",
+         **stats},
+        {"grouping_set": 2, "bucket": None, "country_id": 2, "country_name": "Chile",
+         **stats, "total_earthquakes": 2},
+    ]
+    _, _, meta = parse_stats({**RANGE, "limit": "1"})
+
+    result = shape_stats(rows, meta)
+
+    assert result["summary"] == {**stats, "total_earthquakes": 3}
+    assert [b["bucket"] for b in result["buckets"]] == [datetime(2026, 2, 1),
+                                                        datetime(2026, 2, 2)]
+    assert result["countries"] == [{"country_id": 2, "country_name": "Chile",
+                                    **stats, "total_earthquakes": 2}]
+
+
+@pytest.mark.parametrize("args", [
+    {**RANGE, "field": "energy"},
+    {**RANGE, "bins": "0"},
+    {**RANGE, "bins": "1000"},
+    {**RANGE, "group": "magnitude"},
+    {**RANGE, "group": "bucket", "bucket": "hour", "bins": "20"},
+])
+def test_parse_histogram_invalid(args):
+    with pytest.raises(ValueError):
+        parse_histogram(args)
+
+
+def test_shape_histogram_fills_empty_bins():
+    _, _, meta = parse_histogram({**RANGE, "bins": "4"})
+    rows = [{"bin": 1, "low": 0.0, "high": 4.0, "count": 5},
+            {"bin": 4, "low": 0.0, "high": 4.0, "count": 1}]
+
+    result = shape_histogram(rows, meta)
+
+    assert result["bins"] == [
+        {"lower": 0.0, "upper": 1.0, "count": 5},
+        {"lower": 1.0, "upper": 2.0, "count": 0},
+        {"lower": 2.0, "upper": 3.0, "count": 0},
+        {"lower": 3.0, "upper": 4.0, "count": 1},
+    ]
+
+
+def test_parse_histogram_groups_by_top_countries():
+    query, _, meta = parse_histogram({**RANGE, "group": "country", "limit": "3"})
+
+    assert "e.country_id AS grp" in query
+    assert "LIMIT 3" in query
+    assert meta["group"] == "country"
+
+
+def test_shape_histogram_groups_by_bucket():
+    _, _, meta = parse_histogram({**RANGE, "bins": "2", "group": "bucket", "bucket": "day"})
+    day_1, day_2 = datetime(2026, 2, 1), datetime(2026, 2, 2)
+    rows = [{"grouping_set": 1, "grp": None, "country_name": None, "bin": 1,
+             "low": 0.0, "high": 4.0, "count": 3},
+            {"grouping_set": 1, "grp": None, "country_name": None, "bin": 2,
+             "low": 0.0, "high": 4.0, "count": 1},
+            {"grouping_set": 0, "grp": day_2, "country_name": None, "bin": 1,
+             "low": 0.0, "high": 4.0, "count": 1},
+            {"grouping_set": 0, "grp": day_1, "country_name": None, "bin": 1,
+             "low": 0.0, "high": 4.0, "count": 2},
+            {"grouping_set": 0, "grp": day_1, "country_name": None, "bin": 2,
+             "low": 0.0, "high": 4.0, "count": 1}]
+
+    result = shape_histogram(rows, meta)
+
+    assert [b["count"] for b in result["bins"]] == [3, 1]
+    assert result["bucket"] == "day"
+    assert result["groups"] == [{"bucket": day_1, "counts": [2, 1]},
+                                {"bucket": day_2, "counts": [1, 0]}]
@@ -99,7 +99,6 @@ with c1:
 
 
 df = load_earthquakes(start_dt, end_dt)
-st.session_state["df"] = df
 
 display_metrics(
     total_quakes(df),
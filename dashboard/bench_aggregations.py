@@ -0,0 +1,61 @@
+"""
+Compares the data each analytics chart ships to the browser when Altair is given
+every event against the pre-aggregated frames. Run from this folder:
+python bench_aggregations.py
+"""
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from data.aggregations import histogram, histogram_2d, time_series, top_countries
+
+SIZES = [10_000, 100_000, 800_000]
+
+
+def synthetic_events(n: int) -> pd.DataFrame:
+    """Random events shaped like the load_earthquakes frame."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "event_id": np.arange(n),
+        "usgs_event_id": [f"ev{i}" for i in range(n)],
+        "start_time": pd.Timestamp("2026-01-01") + pd.to_timedelta(
+            rng.uniform(0, 30 * 86400, n), unit="s"),
+        "description": "M 1.2 - 10 km N of Somewhere",
+        "magnitude_value": rng.gamma(2.0, 0.5, n),
+        "depth": rng.uniform(0, 300_000, n),
+        "latitude": rng.uniform(-60, 60, n),
+        "longitude": rng.uniform(-180, 180, n),
+        "country_name": rng.choice(["Japan", "Chile", "Indonesia", "Peru", "Mexico"], n),
+    })
+
+
+def arrow_bytes(df: pd.DataFrame) -> int:
+    """Size of a frame as Streamlit sends chart data: an Arrow table."""
+    return pa.Table.from_pandas(df).nbytes
+
+
+def timed(func):
+    """Returns func's result and its run time in ms."""
+    start = perf_counter()
+    result = func()
+    return result, (perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    print(f"{'rows':>8}  {'chart':<22}{'raw KB':>10}{'binned KB':>11}{'binning ms':>12}")
+    for n in SIZES:
+        df = synthetic_events(n)
+        charts = {
+            "magnitude histogram": lambda: histogram(df["magnitude_value"]),
+            "depth histogram": lambda: histogram(df["depth"] / 1000.0),
+            "depth vs magnitude": lambda: histogram_2d(df["magnitude_value"],
+                                                       df["depth"] / 1000.0),
+            "time series": lambda: time_series(df["start_time"], df["magnitude_value"]),
+            "top countries": lambda: top_countries(df["country_name"]),
+        }
+        raw_kb = arrow_bytes(df) / 1024
+        for name, build in charts.items():
+            frame, ms = timed(build)
+            print(f"{n:>8}  {name:<22}{raw_kb:>10.0f}{arrow_bytes(frame) / 1024:>11.1f}{ms:>12.1f}")
@@ -0,0 +1,55 @@
+"""
+Measures what each chart costs per rerun over a 30 day range when it is looked up
+by hashing the whole frame, as @st.cache_resource did on the render functions,
+against a chart cache keyed on the frame's version. Run from this folder:
+python bench_chart_cache.py
+"""
+from statistics import median
+from time import perf_counter
+
+import streamlit as st
+
+from bench_aggregations import synthetic_events
+from data.aggregations import histogram, histogram_2d, time_series, top_countries
+from data.chart_cache import ChartCache
+from data.load import EVENT_DTYPES
+from data.prepare import prepare_events
+
+ROWS = 820_000
+RUNS = 5
+
+
+def median_ms(func) -> float:
+    """Median run time of func in milliseconds."""
+    timings = []
+    for _ in range(RUNS):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+@st.cache_resource
+def hashed_lookup(df):
+    """Does nothing; calling it costs what st.cache_resource spends hashing df."""
+
+
+if __name__ == "__main__":
+    df = prepare_events(synthetic_events(ROWS).astype(
+        {column: dtype for column, dtype in EVENT_DTYPES.items() if column != "country_id"}))
+    df.attrs["version"] = ("store", 1, 0, ROWS)
+    charts = {
+        "magnitude histogram": lambda: histogram(df["magnitude_value"]),
+        "depth histogram": lambda: histogram(df["depth_km"]),
+        "depth vs magnitude": lambda: histogram_2d(df["magnitude_value"], df["depth_km"]),
+        "time series": lambda: time_series(df["start_time"], df["magnitude_value"]),
+        "top countries": lambda: top_countries(df["country_name"]),
+    }
+    cache = ChartCache()
+
+    print(f"hashing the frame (st.cache_resource key): {median_ms(lambda: hashed_lookup(df)):.1f} ms")
+    print(f"{'chart':<22}{'compute ms':>11}{'cached ms':>11}")
+    for name, compute in charts.items():
+        cache.get((name, df.attrs["version"], ()), compute)
+        cached = median_ms(lambda: cache.get((name, df.attrs["version"], ()), compute))
+        print(f"{name:<22}{median_ms(compute):>11.1f}{cached:>11.4f}")
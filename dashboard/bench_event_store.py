@@ -0,0 +1,56 @@
+"""
+Compares a dashboard rerun reloading its range from the database with answering it
+from the event store. Fill the event table first with database/synthetic.py, then
+run from this folder with the DB_* variables set: python bench_event_store.py
+"""
+from datetime import datetime, timedelta, timezone
+from os import environ as ENV
+from statistics import median
+from time import perf_counter
+
+from sqlalchemy import create_engine
+
+import data.load
+from data.event_store import EventStore
+
+RUNS = 5
+RANGES = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30}
+
+
+def env_engine():
+    """Engine from the same DB_* variables as the API."""
+    return create_engine(
+        f"postgresql+psycopg2://{ENV['DB_USERNAME']}:{ENV.get('DB_PASSWORD', '')}"
+        f"@{ENV['DB_HOST']}:{ENV['DB_PORT']}/{ENV['DB_NAME']}")
+
+
+def median_ms(func) -> float:
+    """Returns the median run time of func in milliseconds."""
+    timings = []
+    for _ in range(RUNS):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+if __name__ == "__main__":
+    engine = env_engine()
+    data.load.get_engine = lambda: engine
+    reload_range = data.load.load_earthquakes_range.__wrapped__
+
+    start = perf_counter()
+    store = EventStore(data.load.fetch_events)
+    store.refresh()
+    print(f"initial load: {len(store.df):,} rows, {(perf_counter() - start):.1f} s, "
+          f"{store.df.memory_usage(deep=True).sum() / 1e6:.0f} MB")
+    print(f"incremental refresh (nothing new): "
+          f"{median_ms(lambda: store.refresh(force=True)):.1f} ms")
+
+    print(f"{'mode':<16}{'rows':>10}{'reload ms':>12}{'store ms':>10}")
+    for mode, days in RANGES.items():
+        now = datetime.now(timezone.utc)
+        rows = len(store.slice(now - timedelta(days=days), now))
+        reload_ms = median_ms(lambda: reload_range(now - timedelta(days=days), now))
+        slice_ms = median_ms(lambda: store.slice(now - timedelta(days=days), now))
+        print(f"{mode:<16}{rows:>10,}{reload_ms:>12.0f}{slice_ms:>10.2f}")
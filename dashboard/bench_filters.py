@@ -0,0 +1,73 @@
+"""
+Times the map and timeframe filters on 1M events: string copies, per-condition
+masks and a full timeframe mask against categorical codes, one fused mask and a
+binary search on start_time. Run from this folder: python bench_filters.py
+"""
+from datetime import datetime, timezone
+from statistics import median
+from time import perf_counter
+
+import pandas as pd
+
+from bench_aggregations import synthetic_events
+from components.filters import filter_by_timeframe
+from data.load import EVENT_DTYPES
+from data.prepare import prepare_events
+from data.selection import filter_options, map_mask
+
+ROWS = 1_000_000
+RUNS = 20
+START = datetime(2026, 1, 8, tzinfo=timezone.utc)
+END = datetime(2026, 1, 15, tzinfo=timezone.utc)
+
+
+def median_ms(func) -> float:
+    """Median run time of func in milliseconds."""
+    timings = []
+    for _ in range(RUNS):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+def before_options(df):
+    """Slider bounds and country options as they were built on every rerun."""
+    return (float(df["magnitude_value"].min()), float(df["magnitude_value"].max()),
+            sorted(df["country_name"].dropna().astype(str).unique().tolist()))
+
+
+def before_mask(df, low, high, countries):
+    """Magnitude and country masks as they were built on every rerun."""
+    mask = (df["magnitude_value"] >= low) & (df["magnitude_value"] <= high)
+    if countries:
+        mask &= df["country_name"].astype(str).isin(countries)
+    return mask
+
+
+def before_timeframe(df):
+    """The timeframe filter as it was: re-parse and mask every row."""
+    d = df.copy()
+    d["start_time"] = pd.to_datetime(d["start_time"], utc=True, errors="coerce")
+    return d[(d["start_time"] >= START) & (d["start_time"] <= END)]
+
+
+if __name__ == "__main__":
+    df = prepare_events(synthetic_events(ROWS).astype(
+        {column: dtype for column, dtype in EVENT_DTYPES.items() if column != "country_id"}))
+    df = df.sort_values("start_time", kind="stable").reset_index(drop=True)
+
+    cases = {
+        "filter options": (lambda: before_options(df), lambda: filter_options(df)),
+        "magnitude mask": (lambda: before_mask(df, 1.0, 3.0, []),
+                           lambda: map_mask(df, 1.0, 3.0, [])),
+        "magnitude + country mask": (lambda: before_mask(df, 1.0, 3.0, ["Japan"]),
+                                     lambda: map_mask(df, 1.0, 3.0, ["Japan"])),
+        "timeframe (7 of 30 days)": (lambda: before_timeframe(df),
+                                     lambda: filter_by_timeframe(df, START, END)),
+    }
+    print(f"{'filter':<26}{'before ms':>10}{'after ms':>10}")
+    for name, (before, after) in cases.items():
+        print(f"{name:<26}{median_ms(before):>10.2f}{median_ms(after):>10.3f}")
+    mask = map_mask(df, 1.0, 3.0, ["Japan"])
+    print(f"selecting the {int(mask.sum()):,} masked rows: {median_ms(lambda: df[mask]):.1f} ms")
@@ -0,0 +1,59 @@
+"""
+Compares loading a dashboard range with read_sql over every event column against
+the lean COPY loader with compact dtypes. Fill the event table first with
+database/synthetic.py, then run from this folder with the DB_* variables set:
+python bench_load.py
+"""
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+import pandas as pd
+from sqlalchemy import text
+
+import data.load
+from bench_event_store import env_engine
+
+RANGES = {"Last 7 days": 7, "Last 30 days": 30}
+
+FULL_QUERY = """
+    SELECT e.*, c.country_name
+    FROM event e
+    LEFT JOIN country c ON e.country_id = c.country_id
+    WHERE e.start_time >= :start_dt AND e.start_time <= :end_dt
+    ORDER BY e.start_time
+"""
+
+
+def read_full(engine, start_dt, end_dt) -> pd.DataFrame:
+    """The loader as it was: every column through read_sql."""
+    with engine.connect() as conn:
+        return pd.read_sql(text(FULL_QUERY), conn,
+                           params={"start_dt": start_dt, "end_dt": end_dt})
+
+
+def timed(func):
+    """Returns func's result and its run time in seconds."""
+    start = perf_counter()
+    result = func()
+    return result, perf_counter() - start
+
+
+def mb_per_100k(df: pd.DataFrame) -> float:
+    """Deep memory use of the frame scaled to 100,000 rows, in MB."""
+    return df.memory_usage(deep=True).sum() / len(df) * 100_000 / 1e6
+
+
+if __name__ == "__main__":
+    engine = env_engine()
+    data.load.get_engine = lambda: engine
+    lean_range = data.load.load_earthquakes_range.__wrapped__
+
+    print(f"{'mode':<14}{'rows':>10}{'loader':>8}{'columns':>9}{'s':>7}{'MB/100k':>9}")
+    for mode, days in RANGES.items():
+        end_dt = datetime.now(timezone.utc)
+        start_dt = end_dt - timedelta(days=days)
+        for name, load in (("full", lambda: read_full(engine, start_dt, end_dt)),
+                           ("lean", lambda: lean_range(start_dt, end_dt))):
+            df, seconds = timed(load)
+            print(f"{mode:<14}{len(df):>10,}{name:>8}{len(df.columns):>9}"
+                  f"{seconds:>7.1f}{mb_per_100k(df):>9.1f}")
@@ -0,0 +1,44 @@
+"""
+Compares the deck the earthquake map sends to the browser when every event is drawn
+with all its columns against the lean point layer and the grid clusters. Run from
+this folder: python bench_map.py
+"""
+import pandas as pd
+import pydeck as pdk
+
+from bench_aggregations import synthetic_events, timed
+from components.earthquake_map import MAX_POINTS, point_layer, cluster_layer
+from data.aggregations import fit_zoom
+
+SIZES = [10_000, 100_000, 800_000]
+
+
+def full_layer(df: pd.DataFrame) -> pdk.Layer:
+    """The map layer as it was built before level of detail: a copy of every column."""
+    d = df.copy()
+    d["start_time_str"] = pd.to_datetime(
+        d["start_time"], utc=True, errors="coerce"
+    ).dt.strftime("%Y-%m-%d %H:%M:%S UTC")
+    d["radius"] = (d["magnitude_value"] ** 2) * 25000
+    d["g"] = (140 - d["magnitude_value"] * 20).clip(lower=0, upper=255).astype(int)
+    return pdk.Layer("ScatterplotLayer", data=d, get_position="[longitude, latitude]",
+                     get_radius="radius", get_fill_color="[255, g, 0, 160]")
+
+
+def deck_json(build) -> tuple[int, float]:
+    """Size in bytes of the serialised deck, and the time to build and serialise it."""
+    payload, ms = timed(lambda: pdk.Deck(layers=[build()]).to_json())
+    return len(payload), ms
+
+
+if __name__ == "__main__":
+    print(f"{'rows':>8}  {'layer':<10}{'KB':>10}{'ms':>10}")
+    for n in SIZES:
+        df = synthetic_events(n)
+        zoom = fit_zoom(df["latitude"], df["longitude"])
+        layers = {"full": lambda: full_layer(df), "clusters": lambda: cluster_layer(df, zoom)}
+        if n <= MAX_POINTS:
+            layers["points"] = lambda: point_layer(df)
+        for name, build in layers.items():
+            size, ms = deck_json(build)
+            print(f"{n:>8}  {name:<10}{size / 1024:>10.0f}{ms:>10.0f}")
@@ -0,0 +1,157 @@
+"""
+Headless benchmark of the dashboard pages. Runs Dashboard.py and the Analytics and
+Subscription pages with Streamlit's AppTest against each database given, in each
+timeframe mode, and records:
+- cold and warm (rerun) script time
+- database time in the cold run
+- bytes sent to the frontend
+- peak traced memory of a cold run
+It exits with status 1 if any figure is over its entry in BUDGETS.
+
+Seed one database per size with database/run_db.sh and
+database/synthetic.py --rows N, then run from this folder with the DB_* variables
+set, naming the databases smallest first:
+python bench_pages.py earthquakes_100k earthquakes_10m
+"""
+import sys
+import tracemalloc
+from os import environ as ENV
+from time import perf_counter
+
+import streamlit as st
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+
+import data.load
+
+TIMEOUT = 600
+MODES = ["Last 24 hours", "Last 7 days", "Last 30 days", "CUSTOM"]
+PAGES = {
+    "Dashboard": ("Dashboard.py", MODES),
+    "Analytics": ("pages/2_Analytics.py", MODES),
+    "Subscription": ("pages/3_Subscription.py", ["-"]),
+}
+
+# Limits for every database size and mode, about 1.5x the figures measured with
+# 100k and 10M synthetic events. Cold runs include filling the event store with
+# the last 31 days. About 1.6 MB of every page is the base64 logo markup.
+BUDGETS = {
+    "Dashboard": {"cold_ms": 8_000, "warm_ms": 600, "query_ms": 6_000,
+                  "frontend_kb": 7_000, "peak_mb": 300},
+    "Analytics": {"cold_ms": 9_000, "warm_ms": 200, "query_ms": 7_500,
+                  "frontend_kb": 2_500, "peak_mb": 300},
+    "Subscription": {"cold_ms": 800, "warm_ms": 200, "query_ms": 100,
+                     "frontend_kb": 2_500, "peak_mb": 32},
+}
+
+
+class Probe:
+    """Adds up database time and frontend bytes while pages run."""
+
+    def __init__(self):
+        self.query_seconds = 0.0
+        self.frontend_bytes = 0
+
+    def reset(self) -> None:
+        """Starts a new measurement."""
+        self.query_seconds = 0.0
+        self.frontend_bytes = 0
+
+    def install(self) -> None:
+        """Wraps the event loader, engine cursors and the forward message queue."""
+        read_events = data.load.read_events
+
+        def timed_read_events(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return read_events(*args, **kwargs)
+            finally:
+                self.query_seconds += perf_counter() - start
+
+        data.load.read_events = timed_read_events
+
+        @event.listens_for(Engine, "before_cursor_execute")
+        def before_execute(conn, *args):
+            conn.info["query_start"] = perf_counter()
+
+        @event.listens_for(Engine, "after_cursor_execute")
+        def after_execute(conn, *args):
+            self.query_seconds += perf_counter() - conn.info.pop("query_start")
+
+        enqueue = ForwardMsgQueue.enqueue
+
+        def counted_enqueue(queue, msg):
+            self.frontend_bytes += msg.ByteSize()
+            return enqueue(queue, msg)
+
+        ForwardMsgQueue.enqueue = counted_enqueue
+
+
+def new_app(path: str, database: str, mode: str) -> AppTest:
+    """An AppTest of the page at path, pointed at database, in timeframe mode."""
+    at = AppTest.from_file(path, default_timeout=TIMEOUT)
+    at.secrets["HOST_NAME"] = ENV["DB_HOST"]
+    at.secrets["PORT"] = ENV["DB_PORT"]
+    at.secrets["DB_NAME"] = database
+    at.secrets["DB_USERNAME"] = ENV["DB_USERNAME"]
+    at.secrets["DB_PASSWORD"] = ENV.get("DB_PASSWORD", "")
+    if mode in MODES:
+        at.session_state["tf_mode"] = mode
+    return at
+
+
+def timed_run(at: AppTest, probe: Probe) -> float:
+    """Runs the page once and returns the script time in ms."""
+    probe.reset()
+    start = perf_counter()
+    at.run()
+    ms = (perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return ms
+
+
+def measure(path: str, database: str, mode: str, probe: Probe) -> dict:
+    """Cold run, warm rerun and a traced cold run of one page in one mode."""
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = new_app(path, database, mode)
+    cold_ms = timed_run(at, probe)
+    query_ms = probe.query_seconds * 1000
+    warm_ms = timed_run(at, probe)
+    frontend_kb = probe.frontend_bytes / 1024
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    tracemalloc.start()
+    timed_run(new_app(path, database, mode), probe)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"cold_ms": cold_ms, "warm_ms": warm_ms, "query_ms": query_ms,
+            "frontend_kb": frontend_kb, "peak_mb": peak / 1e6}
+
+
+if __name__ == "__main__":
+    databases = sys.argv[1:] or [ENV["DB_NAME"]]
+    probe = Probe()
+    probe.install()
+
+    over = []
+    print(f"{'database':<18}{'page':<14}{'mode':<15}{'cold ms':>9}{'warm ms':>9}"
+          f"{'query ms':>10}{'sent KB':>9}{'peak MB':>9}")
+    for database in databases:
+        for page, (path, modes) in PAGES.items():
+            for mode in modes:
+                result = measure(path, database, mode, probe)
+                print(f"{database:<18}{page:<14}{mode:<15}{result['cold_ms']:>9.0f}"
+                      f"{result['warm_ms']:>9.0f}{result['query_ms']:>10.0f}"
+                      f"{result['frontend_kb']:>9.1f}{result['peak_mb']:>9.0f}")
+                over += [f"{database} {page} {mode}: {name} {result[name]:.0f} > {limit}"
+                         for name, limit in BUDGETS[page].items() if result[name] > limit]
+
+    if over:
+        print("\nOver budget:\n" + "\n".join(over))
+        sys.exit(1)
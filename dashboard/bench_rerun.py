@@ -0,0 +1,107 @@
+"""
+Measures the latency and peak memory of the data work in a dashboard rerun over a
+30 day range: recomputing derived columns and copying on every render against
+reading the columns prepared at load time. Run from this folder:
+python bench_rerun.py
+"""
+import tracemalloc
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from bench_aggregations import synthetic_events
+from components.earthquake_map import MAX_POINTS, point_layer, cluster_layer
+from components.map_filters import apply_map_filters
+from data.aggregations import histogram, histogram_2d, time_series, fit_zoom, grid_clusters
+from data.aggregations import cluster_cell_degrees
+from data.load import EVENT_DTYPES
+from data.metrics_calculations import deepest, shallowest
+from data.prepare import prepare_events
+
+ROWS = 820_000
+RUNS = 5
+SCENARIOS = {"no filter": [], "one country": ["Japan"]}
+
+
+def before_filters(df: pd.DataFrame, countries: list) -> pd.DataFrame:
+    """The map filters as they were: string copies and one copy per condition."""
+    filtered = df[(df["magnitude_value"] >= float(df["magnitude_value"].min())) &
+                  (df["magnitude_value"] <= float(df["magnitude_value"].max()))]
+    sorted(df["country_name"].dropna().astype(str).unique().tolist())
+    if countries:
+        filtered = filtered[filtered["country_name"].astype(str).isin(countries)]
+    return filtered
+
+
+def before_map(df: pd.DataFrame) -> None:
+    """The map frame as it was: colour, radius and times derived on every render."""
+    zoom = fit_zoom(df["latitude"], df["longitude"])
+    mag = df["magnitude_value"].to_numpy(dtype=float)
+    if len(df) <= MAX_POINTS:
+        pd.DataFrame({
+            "radius": ((mag ** 2) * 25000).round(),
+            "g": np.clip(140 - mag * 20, 0, 255).astype(np.uint8),
+            "start_time_str": pd.to_datetime(df["start_time"], utc=True, errors="coerce")
+            .dt.strftime("%Y-%m-%d %H:%M:%S UTC"),
+        })
+    else:
+        clusters = grid_clusters(df["latitude"], df["longitude"], df["magnitude_value"],
+                                 cluster_cell_degrees(zoom))
+        np.clip(140 - clusters["max_magnitude"].to_numpy() * 20, 0, 255).astype(np.uint8)
+
+
+def before_rerun(df: pd.DataFrame, countries: list) -> None:
+    """Metrics, map and depth/time charts without prepared columns."""
+    depth_km = df["depth"] / 1000.0
+    depth_km.max()
+    depth_km[depth_km >= 0].min()
+    before_map(before_filters(df, countries))
+    histogram(df["depth"] / 1000.0)
+    histogram_2d(df["magnitude_value"], df["depth"] / 1000.0)
+    time_series(pd.to_datetime(df["start_time"], utc=True))
+
+
+def after_rerun(df: pd.DataFrame, countries: list) -> None:
+    """The same work reading the prepared columns."""
+    st.multiselect = lambda *args, **kwargs: countries
+    deepest(df)
+    shallowest(df)
+    filtered = apply_map_filters(df)
+    if len(filtered) <= MAX_POINTS:
+        point_layer(filtered)
+    else:
+        cluster_layer(filtered, fit_zoom(filtered["latitude"], filtered["longitude"]))
+    histogram(df["depth_km"])
+    histogram_2d(df["magnitude_value"], df["depth_km"])
+    time_series(df["start_time"], df["magnitude_value"])
+
+
+def measure(func) -> tuple[float, float]:
+    """Median run time in ms and peak traced memory in MB of func."""
+    timings = []
+    for _ in range(RUNS):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return median(timings), peak / 1e6
+
+
+if __name__ == "__main__":
+    df = synthetic_events(ROWS).astype(
+        {column: dtype for column, dtype in EVENT_DTYPES.items() if column != "country_id"})
+    prepare_ms, prepare_mb = measure(lambda: prepare_events(df))
+    print(f"prepare at load: {prepare_ms:.0f} ms, {prepare_mb:.0f} MB peak")
+    prepared = prepare_events(df)
+
+    print(f"{'scenario':<14}{'before ms':>10}{'after ms':>10}{'before MB':>11}{'after MB':>10}")
+    for name, countries in SCENARIOS.items():
+        before_ms, before_mb = measure(lambda: before_rerun(df, countries))
+        after_ms, after_mb = measure(lambda: after_rerun(prepared, countries))
+        print(f"{name:<14}{before_ms:>10.0f}{after_ms:>10.0f}{before_mb:>11.0f}{after_mb:>10.0f}")
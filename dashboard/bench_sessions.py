@@ -0,0 +1,55 @@
+"""
+Measures how dashboard memory and connection cost grow with concurrent viewers.
+Memory: each session holding its own copy of a range, as st.cache_data hands out,
+against every session referencing the one shared frame. Connections: a new engine
+per cache miss against checking out of the shared pool. Run from this folder with
+the DB_* variables set: python bench_sessions.py
+"""
+import pickle
+import tracemalloc
+from statistics import median
+from time import perf_counter
+
+from sqlalchemy import text
+
+from bench_aggregations import synthetic_events
+from bench_event_store import env_engine
+from data.load import EVENT_DTYPES
+
+ROWS = 200_000
+SESSIONS = [1, 10, 50]
+CONNECTS = 20
+
+
+def held_mb(df, sessions: int, share: bool) -> float:
+    """Memory in MB held after each of sessions viewers loads a range."""
+    payload = pickle.dumps(df)
+    tracemalloc.start()
+    held = [df.copy(deep=False) if share else pickle.loads(payload)
+            for _ in range(sessions)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / 1e6
+
+
+def connect_ms(get_engine) -> float:
+    """Median time in ms to get a connection and run a trivial query."""
+    timings = []
+    for _ in range(CONNECTS):
+        start = perf_counter()
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+if __name__ == "__main__":
+    df = synthetic_events(ROWS).astype(
+        {column: dtype for column, dtype in EVENT_DTYPES.items() if column != "country_id"})
+    print(f"{'sessions':>8}{'copied MB':>11}{'shared MB':>11}")
+    for n in SESSIONS:
+        print(f"{n:>8}{held_mb(df, n, share=False):>11.0f}{held_mb(df, n, share=True):>11.0f}")
+
+    pooled = env_engine()
+    print(f"new engine per miss: {connect_ms(env_engine):.1f} ms")
+    print(f"shared pool:         {connect_ms(lambda: pooled):.1f} ms")
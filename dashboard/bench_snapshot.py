@@ -0,0 +1,75 @@
+"""
+Compares loading a long range for the Analytics page from the database against
+scanning the Parquet snapshot and fetching only the events created since its
+watermark. Fill the event table with database/synthetic.py and write a snapshot
+with snapshot/snapshot.py first, then run from this folder with the DB_* variables
+and SNAPSHOT_URI set: python bench_snapshot.py
+"""
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from os import environ as ENV
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import data.load
+from bench_event_store import env_engine
+from data.snapshot import open_snapshot
+
+RANGES = {"Last 60 days": 60, "Last 120 days": 120, "Last 180 days": 180}
+
+
+def measure(func, database_seconds: list) -> tuple[int, float, float, float]:
+    """
+    Rows returned, run time and database time in ms of func, then its peak traced
+    memory in MB from a second run, as tracing slows the first down.
+    """
+    database_seconds.clear()
+    start = perf_counter()
+    rows = len(func())
+    ms = (perf_counter() - start) * 1000
+    db_ms = sum(database_seconds) * 1000
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, ms, db_ms, peak / 1e6
+
+
+if __name__ == "__main__":
+    engine = env_engine()
+    data.load.get_engine = lambda: engine
+    snapshot = open_snapshot(ENV["SNAPSHOT_URI"])
+    database_seconds = []
+
+    read_events = data.load.read_events
+
+    def timed_read_events(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return read_events(*args, **kwargs)
+        finally:
+            database_seconds.append(perf_counter() - start)
+
+    data.load.read_events = timed_read_events
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def before_execute(conn, *args):
+        conn.info["query_start"] = perf_counter()
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def after_execute(conn, *args):
+        database_seconds.append(perf_counter() - conn.info.pop("query_start"))
+
+    end_dt = datetime.now(timezone.utc)
+    print(f"{'range':<15}{'source':<10}{'rows':>10}{'ms':>9}{'db ms':>9}{'peak MB':>9}")
+    for name, days in RANGES.items():
+        start_dt = end_dt - timedelta(days=days)
+        for source, value in (("database", None), ("snapshot", snapshot)):
+            data.load.get_snapshot = lambda value=value: value
+            rows, ms, db_ms, mb = measure(
+                lambda: data.load.load_earthquakes_range.__wrapped__(start_dt, end_dt),
+                database_seconds)
+            print(f"{name:<15}{source:<10}{rows:>10,}{ms:>9.0f}{db_ms:>9.0f}{mb:>9.0f}")
@@ -0,0 +1,41 @@
+"""
+Compares building the Subscription page's country options from a year of events
+against reading the country table. Fill the event table first with
+database/synthetic.py, then run from this folder with the DB_* variables set:
+python bench_subscription.py
+"""
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+import data.load
+from bench_event_store import env_engine
+
+
+def measure(func):
+    """Returns func's result, its run time in ms and its peak traced memory in MB."""
+    tracemalloc.start()
+    start = perf_counter()
+    result = func()
+    ms = (perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, ms, peak / 1e6
+
+
+def countries_from_events():
+    """The page's options as they were built: distinct countries in a year of events."""
+    end_dt = datetime.now(timezone.utc)
+    df = data.load.load_earthquakes_range.__wrapped__(end_dt - timedelta(days=365), end_dt)
+    return df[["country_id", "country_name"]].dropna().drop_duplicates()
+
+
+if __name__ == "__main__":
+    engine = env_engine()
+    data.load.get_engine = lambda: engine
+
+    print(f"{'source':<16}{'options':>8}{'ms':>10}{'peak MB':>9}")
+    for name, load in (("year of events", countries_from_events),
+                       ("country table", data.load.load_countries.__wrapped__)):
+        options, ms, mb = measure(load)
+        print(f"{name:<16}{len(options):>8}{ms:>10.1f}{mb:>9.1f}")
@@ -0,0 +1,55 @@
+"""
+Compares the earthquakes over time series as daily counts against automatically
+sized buckets, for 1M events spread over ranges from a day to five years: points
+sent to the chart and time to build them, with and without energy. Run from this folder:
+python bench_time_series.py
+"""
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from bench_aggregations import arrow_bytes
+from data.aggregations import time_series
+
+ROWS = 1_000_000
+RUNS = 5
+RANGES = {"24 hours": 1, "30 days": 30, "1 year": 365, "5 years": 5 * 365}
+
+
+def median_ms(func) -> float:
+    """Median run time of func in milliseconds."""
+    timings = []
+    for _ in range(RUNS):
+        start = perf_counter()
+        func()
+        timings.append((perf_counter() - start) * 1000)
+    return median(timings)
+
+
+def daily_counts(start_times: pd.Series) -> pd.DataFrame:
+    """The series as it was: events per UTC day, including days with none."""
+    days = start_times.dt.tz_convert(None).to_numpy().astype("datetime64[D]")
+    first = days.min()
+    counts = np.bincount((days - first).astype(np.int64))
+    return pd.DataFrame({"start_time": pd.to_datetime(first + np.arange(counts.size))
+                         .tz_localize("UTC"), "count": counts})
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    magnitudes = pd.Series(rng.gamma(2.0, 0.8, ROWS).astype(np.float32))
+    print(f"{'range':<10}{'bucket':>9}{'daily pts':>10}{'pts':>6}{'KB':>7}"
+          f"{'daily ms':>10}{'count ms':>10}{'+energy ms':>11}")
+    for name, days in RANGES.items():
+        offsets = np.sort(rng.integers(0, days * 86400, ROWS))
+        times = pd.Series(pd.to_datetime("2021-01-01", utc=True)
+                          + pd.to_timedelta(offsets, unit="s")).astype("datetime64[s, UTC]")
+        daily = daily_counts(times)
+        series = time_series(times, magnitudes)
+        print(f"{name:<10}{series.attrs['bucket']:>9}{len(daily):>10}{len(series):>6}"
+              f"{arrow_bytes(series) / 1024:>7.1f}"
+              f"{median_ms(lambda: daily_counts(times)):>10.1f}"
+              f"{median_ms(lambda: time_series(times)):>10.1f}"
+              f"{median_ms(lambda: time_series(times, magnitudes)):>11.1f}")
@@ -1,53 +1,93 @@
 """Earthquake map showcasing earthquakes from time period."""
+import numpy as np
 import pydeck as pdk
 import streamlit as st
 import pandas as pd
 
+from data.aggregations import fit_zoom, cluster_cell_degrees, grid_clusters
+from data.chart_cache import chart_data
+from data.prepare import magnitude_colour
 
-def render_quake_map(df: pd.DataFrame) -> None:
-    """Renders map with red points showcasing earthquakes based on loaded data."""
-    if df is None or df.empty:
-        st.info("No earthquakes found for the selected filters/time period.")
-        return
+MAX_POINTS = 10_000
 
-    d = df.copy()
 
-    d["start_time_str"] = pd.to_datetime(
-        d["start_time"], utc=True, errors="coerce"
-    ).dt.strftime("%Y-%m-%d %H:%M:%S UTC")
+def point_layer(df: pd.DataFrame) -> pdk.Layer:
+    """One circle per earthquake, with a tooltip."""
+    d = pd.DataFrame({
+        "longitude": df["longitude"].to_numpy(dtype=float).round(4),
+        "latitude": df["latitude"].to_numpy(dtype=float).round(4),
+        "magnitude_value": df["magnitude_value"].to_numpy(dtype=float).round(2),
+        "radius": df["radius"].to_numpy().round(),
+        "g": df["colour"].to_numpy(),
+        "description": df["description"].to_numpy(),
+        "country_name": df["country_name"].to_numpy(),
+        "start_time_str": df["start_time"].dt.strftime("%Y-%m-%d %H:%M:%S UTC").to_numpy(),
+        "depth": df["depth"].to_numpy(dtype=float).round(),
+    })
 
-    d["radius"] = (d["magnitude_value"] ** 2) * 25000
+    return pdk.Layer(
+        "ScatterplotLayer",
+        data=d,
+        get_position="[longitude, latitude]",
+        pickable=True,
+        auto_highlight=True,
+        get_radius="radius",
+        radius_min_pixels=2,
+        radius_max_pixels=60,
+        get_fill_color="[255, g, 0, 160]",
+    )
 
-    g = (140 - d["magnitude_value"] * 20).clip(lower=0, upper=255)
-    d["r"] = 255
-    d["g"] = g.astype(int)
-    d["b"] = 0
-    d["a"] = 160
 
-    view = pdk.ViewState(
-        latitude=float(d["latitude"].median()),
-        longitude=float(d["longitude"].median()),
-        zoom=1.4,
-        pitch=0,
-    )
+def cluster_layer(df: pd.DataFrame, zoom: float) -> pdk.Layer:
+    """One circle per grid cell, sized by count and coloured by max magnitude."""
+    clusters = grid_clusters(df["latitude"], df["longitude"], df["magnitude_value"],
+                             cluster_cell_degrees(zoom))
+    d = pd.DataFrame({
+        "longitude": clusters["longitude"].to_numpy().round(3),
+        "latitude": clusters["latitude"].to_numpy().round(3),
+        "count": clusters["count"].to_numpy(),
+        "max_magnitude": clusters["max_magnitude"].to_numpy().round(1),
+        "radius": np.clip(3 + 2 * np.sqrt(clusters["count"].to_numpy()), 3, 30).round(1),
+        "g": magnitude_colour(clusters["max_magnitude"].to_numpy()),
+    })
 
-    layer = pdk.Layer(
+    return pdk.Layer(
         "ScatterplotLayer",
         data=d,
         get_position="[longitude, latitude]",
         pickable=True,
         auto_highlight=True,
         get_radius="radius",
-        radius_min_pixels=2,
-        radius_max_pixels=60,
-        get_fill_color="[r, g, b, a]",
+        radius_units="pixels",
+        get_fill_color="[255, g, 0, 160]",
     )
 
-    deck = pdk.Deck(
-        layers=[layer],
-        initial_view_state=view,
-        map_style=None,
-        tooltip={
+
+def render_quake_map(df: pd.DataFrame) -> None:
+    """
+    Renders map with red points showcasing earthquakes based on loaded data. Up to
+    MAX_POINTS earthquakes are drawn individually; beyond that they are drawn as grid
+    clusters sized to the zoom level that fits the data.
+    """
+    if df is None or df.empty:
+        st.info("No earthquakes found for the selected filters/time period.")
+        return
+
+    zoom, latitude, longitude = chart_data(df, "map view", lambda: (
+        fit_zoom(df["latitude"], df["longitude"]),
+        float(df["latitude"].median()),
+        float(df["longitude"].median()),
+    ))
+    view = pdk.ViewState(
+        latitude=latitude,
+        longitude=longitude,
+        zoom=zoom,
+        pitch=0,
+    )
+
+    if len(df) <= MAX_POINTS:
+        layer = chart_data(df, "map points", lambda: point_layer(df))
+        tooltip = {
             "html": """
                 <b>{description}</b><br/>
                 Country: {country_name}<br/>
@@ -55,7 +95,23 @@ def render_quake_map(df: pd.DataFrame) -> None:
                 Magnitude: {magnitude_value}<br/>
                 Depth: {depth} m
             """
-        },
+        }
+    else:
+        layer = chart_data(df, "map clusters", lambda: cluster_layer(df, zoom))
+        st.caption(f"{len(df):,} earthquakes grouped into clusters; "
+                   f"filter down to {MAX_POINTS:,} or fewer to see individual events.")
+        tooltip = {
+            "html": """
+                <b>{count} earthquakes</b><br/>
+                Max magnitude: {max_magnitude}
+            """
+        }
+
+    deck = pdk.Deck(
+        layers=[layer],
+        initial_view_state=view,
+        map_style=None,
+        tooltip=tooltip,
     )
 
     st.pydeck_chart(deck, use_container_width=True)
@@ -4,6 +4,8 @@ import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta, timezone, date
 
+from data.event_store import search
+
 UTC = timezone.utc
 
 
@@ -47,7 +49,9 @@ def timeframe_selector():
     b4.button("CUSTOM", use_container_width=True,
               on_click=set_mode, args=("CUSTOM",))
 
-    now = datetime.now(UTC)
+    # Rolling ranges end at the next whole minute, so reruns within a minute ask for
+    # the same range and reuse its cached data and charts.
+    now = datetime.now(UTC).replace(second=0, microsecond=0) + timedelta(minutes=1)
 
     mode = st.session_state.tf_mode
     if mode == "Last 24 hours":
@@ -70,7 +74,12 @@ def timeframe_selector():
 
 
 def filter_by_timeframe(df: pd.DataFrame, start_dt, end_dt) -> pd.DataFrame:
-    d = df.copy()
-    d["start_time"] = pd.to_datetime(
-        d["start_time"], utc=True, errors="coerce")
-    return d[(d["start_time"] >= start_dt) & (d["start_time"] <= end_dt)]
+    """ Rows with start_time between start_dt and end_dt, found by binary search in
+    the start_time order the loaders return. The slice's version adds its row bounds
+    to df's, for the chart cache."""
+    times = df["start_time"].to_numpy()
+    lo, hi = search(times, start_dt, "left"), search(times, end_dt, "right")
+    part = df.iloc[lo:hi]
+    if "version" in df.attrs:
+        part.attrs["version"] = (df.attrs["version"], lo, hi)
+    return part
@@ -2,9 +2,16 @@
 import pandas as pd
 import streamlit as st
 
+from data.chart_cache import chart_data
+from data.selection import filter_options, map_mask
+
 
 def apply_map_filters(df: pd.DataFrame) -> pd.DataFrame:
-    """Filters using magnitude and country name."""
+    """
+    Filters using magnitude and country name, returning df itself when nothing is
+    filtered out and otherwise selecting the matching rows with one combined mask.
+    The selection's version adds the filter values to df's, for the chart cache.
+    """
     if df is None:
         return pd.DataFrame()
 
@@ -13,8 +20,8 @@ def apply_map_filters(df: pd.DataFrame) -> pd.DataFrame:
         st.multiselect("Country", options=[])
         return df
 
-    mag_min = float(df["magnitude_value"].min())
-    mag_max = float(df["magnitude_value"].max())
+    mag_min, mag_max, country_options = chart_data(df, "map filter options",
+                                                   lambda: filter_options(df))
 
     sel_min, sel_max = st.slider(
         "Magnitude",
@@ -24,22 +31,17 @@ def apply_map_filters(df: pd.DataFrame) -> pd.DataFrame:
         step=0.1
     )
 
-    country_series = df["country_name"].dropna().astype(str)
-    country_options = sorted(country_series.unique().tolist())
-
     selected_countries = st.multiselect(
         "Country",
         options=country_options,
         default=[]
     )
 
-    filtered = df[
-        (df["magnitude_value"] >= sel_min) &
-        (df["magnitude_value"] <= sel_max)
-    ]
-
-    if selected_countries:
-        filtered = filtered[filtered["country_name"].astype(
-            str).isin(selected_countries)]
+    if sel_min <= mag_min and sel_max >= mag_max and not selected_countries:
+        return df
 
+    filtered = df[map_mask(df, sel_min, sel_max, selected_countries)]
+    if "version" in df.attrs:
+        filtered.attrs["version"] = (df.attrs["version"], sel_min, sel_max,
+                                     tuple(selected_countries))
     return filtered
@@ -0,0 +1,195 @@
+"""Functions to aggregate events into the small frames the charts plot"""
+import math
+
+import numpy as np
+import pandas as pd
+
+MAX_BINS = 30
+TARGET_POINTS = 200
+BUCKETS = {"minute": 60, "hour": 3600, "day": 86400, "week": 7 * 86400}
+WEEK_ORIGIN = 4 * 86400  # 1970-01-05, the first Monday after the epoch
+LN_10 = math.log(10)
+
+
+def as_floats(values) -> np.ndarray:
+    """Non-missing values as a float array, parsing them only if not already numeric."""
+    series = pd.Series(values)
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series, errors="coerce")
+    v = series.to_numpy(dtype=float, na_value=np.nan)
+    return v[~np.isnan(v)]
+
+
+def nice_step(span: float, maxbins: int = MAX_BINS) -> float:
+    """Smallest 1, 2 or 5 x 10^k bin width that covers span in maxbins bins."""
+    if span <= 0:
+        return 1.0
+    raw = span / maxbins
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for factor in (1, 2, 5, 10):
+        if factor * magnitude >= raw:
+            return factor * magnitude
+    return 10 * magnitude
+
+
+def histogram(values, maxbins: int = MAX_BINS) -> pd.DataFrame:
+    """Counts values into equal, round-numbered bins."""
+    v = as_floats(values)
+    if v.size == 0:
+        return pd.DataFrame({"bin_start": [], "bin_end": [], "count": []})
+
+    low, high = v.min(), v.max()
+    step = nice_step(high - low, maxbins)
+    start = math.floor(low / step) * step
+    index = np.floor((v - start) / step).astype(np.int64)
+    counts = np.bincount(index)
+    starts = start + step * np.arange(counts.size)
+
+    return pd.DataFrame({"bin_start": starts.round(6),
+                         "bin_end": (starts + step).round(6),
+                         "count": counts})
+
+
+def histogram_2d(x_values, y_values, maxbins: int = MAX_BINS) -> pd.DataFrame:
+    """Counts (x, y) pairs into a grid of round-numbered bins, omitting empty cells."""
+    pairs = pd.DataFrame({"x": pd.to_numeric(pd.Series(x_values), errors="coerce"),
+                          "y": pd.to_numeric(pd.Series(y_values), errors="coerce")}).dropna()
+    if pairs.empty:
+        return pd.DataFrame({"x_start": [], "x_end": [], "y_start": [], "y_end": [],
+                             "count": []})
+
+    x, y = pairs["x"].to_numpy(dtype=float), pairs["y"].to_numpy(dtype=float)
+    x_step = nice_step(x.max() - x.min(), maxbins)
+    y_step = nice_step(y.max() - y.min(), maxbins)
+    x_start = math.floor(x.min() / x_step) * x_step
+    y_start = math.floor(y.min() / y_step) * y_step
+    xi = np.floor((x - x_start) / x_step).astype(np.int64)
+    yi = np.floor((y - y_start) / y_step).astype(np.int64)
+
+    width = int(yi.max()) + 1
+    cells, counts = np.unique(xi * width + yi, return_counts=True)
+    xs = x_start + x_step * (cells // width)
+    ys = y_start + y_step * (cells % width)
+
+    return pd.DataFrame({"x_start": xs.round(6), "x_end": (xs + x_step).round(6),
+                         "y_start": ys.round(6), "y_end": (ys + y_step).round(6),
+                         "count": counts})
+
+
+def as_utc_datetimes(values) -> pd.Series:
+    """Values as naive UTC datetimes, parsing them only if not already datetimes."""
+    times = pd.Series(values)
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, utc=True)
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert(None)
+    return times
+
+
+def pick_bucket(span_seconds: float, target_points: int = TARGET_POINTS) -> tuple[str, int]:
+    """
+    The smallest of BUCKETS that splits span_seconds into at most target_points
+    buckets, widening to several weeks when even one week is too fine. A span
+    not aligned to bucket boundaries touches up to span // width + 2 buckets.
+    """
+    for name, seconds in BUCKETS.items():
+        if span_seconds // seconds + 2 <= target_points:
+            return name, seconds
+    weeks = max(2, math.ceil(span_seconds / BUCKETS["week"] / target_points))
+    while span_seconds // (weeks * BUCKETS["week"]) + 2 > target_points:
+        weeks += 1
+    return f"{weeks} weeks", weeks * BUCKETS["week"]
+
+
+def time_series(start_times, magnitudes=None, target_points: int = TARGET_POINTS) -> pd.DataFrame:
+    """
+    Counts events per time bucket, including buckets with none, choosing the bucket
+    size with pick_bucket so the series has at most target_points points. Weeks
+    start on Monday. With magnitudes, also sums each bucket's radiated energy in
+    joules, log10 E = 1.5 M + 4.8. The bucket name is kept in attrs["bucket"].
+    """
+    times = as_utc_datetimes(start_times)
+    valid = times.notna().to_numpy()
+    if not valid.any():
+        series = pd.DataFrame({"start_time": pd.to_datetime([], utc=True),
+                               "count": [], "energy": []})
+        series.attrs["bucket"] = "day"
+        return series
+
+    seconds = times.to_numpy().astype("datetime64[s]").astype(np.int64)
+    if not valid.all():
+        seconds = seconds[valid]
+    name, width = pick_bucket(float(seconds.max() - seconds.min()), target_points)
+    index = (seconds - WEEK_ORIGIN) // width
+    first = index.min()
+    index -= first
+    starts = (first + np.arange(index.max() + 1)) * width + WEEK_ORIGIN
+
+    series = pd.DataFrame({
+        "start_time": pd.to_datetime(starts, unit="s", utc=True),
+        "count": np.bincount(index),
+    })
+    if magnitudes is not None:
+        magnitude = np.asarray(magnitudes, dtype=float)
+        if not valid.all():
+            magnitude = magnitude[valid]
+        energy = np.exp((1.5 * LN_10) * magnitude + 4.8 * LN_10)
+        series["energy"] = np.bincount(index, weights=np.nan_to_num(energy, copy=False))
+    series.attrs["bucket"] = name
+    return series
+
+
+def top_countries(country_names, top_n: int = 10) -> pd.DataFrame:
+    """Counts events per country, largest first."""
+    counts = pd.Series(country_names).value_counts(dropna=False)
+    counts = counts[counts > 0]
+    names = counts.index.astype(object).fillna("Unknown").astype(str)
+    counts = (
+        counts.groupby(names, sort=False)
+        .sum()
+        .sort_values(ascending=False, kind="stable")
+        .head(top_n)
+        .reset_index()
+    )
+    counts.columns = ["country_name", "count"]
+    return counts
+
+
+def fit_zoom(latitudes, longitudes, min_zoom: float = 1.4, max_zoom: float = 8.0) -> float:
+    """Web map zoom that fits the central 96% of points."""
+    lat = pd.to_numeric(pd.Series(latitudes), errors="coerce").dropna()
+    lon = pd.to_numeric(pd.Series(longitudes), errors="coerce").dropna()
+    if lat.empty:
+        return min_zoom
+
+    lat_span = lat.quantile(0.98) - lat.quantile(0.02)
+    lon_span = lon.quantile(0.98) - lon.quantile(0.02)
+    span = max(lon_span, lat_span * 2, 1e-3)
+    return float(np.clip(math.log2(360 / span), min_zoom, max_zoom))
+
+
+def cluster_cell_degrees(zoom: float, cell_pixels: int = 24) -> float:
+    """Grid cell size in degrees that covers cell_pixels on screen at a zoom level."""
+    return cell_pixels * 360 / (256 * 2 ** zoom)
+
+
+def grid_clusters(latitudes, longitudes, magnitudes, cell_degrees: float) -> pd.DataFrame:
+    """
+    Groups points into cell_degrees grid cells, returning each non-empty cell's
+    mean position, point count and maximum magnitude.
+    """
+    latitudes, longitudes = np.asarray(latitudes), np.asarray(longitudes)
+    columns = int(math.ceil(360 / cell_degrees))
+    row = np.floor((latitudes + 90) / cell_degrees).astype(np.int32)
+    col = np.floor((longitudes + 180) / cell_degrees).astype(np.int32)
+    points = pd.DataFrame({"latitude": latitudes,
+                           "longitude": longitudes,
+                           "magnitude_value": np.asarray(magnitudes),
+                           "cell": row * columns + col}, copy=False)
+
+    return (points.groupby("cell", sort=False)
+            .agg(latitude=("latitude", "mean"),
+                 longitude=("longitude", "mean"),
+                 count=("magnitude_value", "size"),
+                 max_magnitude=("magnitude_value", "max"))
+            .reset_index(drop=True))
@@ -0,0 +1,95 @@
+"""Process-wide cache of the small frames the charts and map are drawn from"""
+import sys
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MAX_CHART_ENTRIES = 128
+# Map layers hold a record per point, a few MB each at the map's point limit, and
+# every store refresh adds entries under a new version, so entries are also
+# bounded by their estimated size.
+MAX_CHART_BYTES = 128 * 1024 * 1024
+
+
+def estimate_bytes(value) -> int:
+    """
+    Rough size of a cached value in bytes. Frames and arrays report their own;
+    lists, such as a map layer's records, are scaled from their first item, and
+    other objects, such as map layers, are sized by their attributes.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        return size + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, tuple):
+        return size + sum(estimate_bytes(item) for item in value)
+    if isinstance(value, list):
+        return size + (len(value) * estimate_bytes(value[0]) if value else 0)
+    if hasattr(value, "__dict__"):
+        return size + estimate_bytes(vars(value))
+    return size
+
+
+class ChartCache:
+    """
+    Least recently used store of computed chart data, holding at most max_entries
+    and max_bytes of estimated size. A value larger than max_bytes is not kept.
+    Keys are built from a frame's attrs["version"], which the loaders set, so a
+    lookup costs a tuple hash rather than hashing every row of the frame.
+    """
+
+    def __init__(self, max_entries: int = MAX_CHART_ENTRIES, max_bytes: int = MAX_CHART_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """Returns the value cached under key, calling compute() to fill it on a miss."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_bytes(value)
+        if size > self.max_bytes:
+            return value
+        with self.lock:
+            self.bytes += size - self.sizes.get(key, 0)
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                evicted, _ = self.entries.popitem(last=False)
+                self.bytes -= self.sizes.pop(evicted)
+        return value
+
+
+@st.cache_resource
+def get_chart_cache() -> ChartCache:
+    """ The chart cache shared by every session in this process."""
+    return ChartCache()
+
+
+def chart_data(df: pd.DataFrame, name: str, compute, *params):
+    """
+    compute(), memoized on df's version, the chart name and params. Frames without
+    a version, such as ones built by hand, are computed every time.
+    """
+    version = df.attrs.get("version")
+    if version is None:
+        return compute()
+    return get_chart_cache().get((name, version, params), compute)
@@ -0,0 +1,164 @@
+"""Process-wide, append-only store of recent events for the dashboard."""
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from time import monotonic
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+UTC = timezone.utc
+STORE_WINDOW_DAYS = 31
+REFRESH_SECONDS = 60
+FULL_RELOAD_SECONDS = 3600
+# An event's updated_at is the start of the transaction that wrote it, which may
+# commit after a later one, so each refresh reads back this far past the newest.
+UPDATED_AT_LAG = timedelta(minutes=5)
+
+
+def search(times: np.ndarray, dt: datetime, side: str) -> int:
+    """
+    Position of dt in the sorted datetime64 array times. The key is rounded to the
+    array's own unit so numpy does not convert the whole array on every search.
+    """
+    unit = np.datetime_data(times.dtype)[0]
+    key = pd.Timestamp(to_naive_utc(dt))
+    key = key.ceil(unit) if side == "left" else key.floor(unit)
+    return int(times.searchsorted(key.as_unit(unit).to_datetime64(), side))
+
+
+def concat(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates frames, keeping categorical columns categorical."""
+    df = pd.concat(frames, ignore_index=True)
+    for column, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[column] = union_categoricals([f[column] for f in frames], sort_categories=True)
+    return df
+
+
+def to_naive_utc(dt: datetime) -> datetime:
+    """Converts an aware datetime to naive UTC, matching the event table."""
+    if dt.tzinfo is not None:
+        return dt.astimezone(UTC).replace(tzinfo=None)
+    return dt
+
+
+class EventStore:
+    """
+    Holds the last STORE_WINDOW_DAYS of events, sorted by start_time, in a single
+    DataFrame. Every REFRESH_SECONDS it fetches only rows added or revised since
+    its updated_at high-water mark, less UPDATED_AT_LAG, merges them by event_id
+    and drops rows that have slid out of the window. The whole window is reloaded
+    every FULL_RELOAD_SECONDS to pick up anything the watermark missed.
+
+    fetch(window_start, since_updated_at) must return the events starting at or
+    after window_start, or when since_updated_at is given, every event with an
+    updated_at at or after it, with their updated_at.
+    """
+
+    def __init__(self, fetch, window=timedelta(days=STORE_WINDOW_DAYS),
+                 refresh_seconds=REFRESH_SECONDS, full_reload_seconds=FULL_RELOAD_SECONDS,
+                 clock=monotonic, now=lambda: datetime.now(UTC)):
+        self.fetch = fetch
+        self.window = window
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.clock = clock
+        self.now = now
+        self.lock = Lock()
+        self.df = None
+        self.window_start = None
+        self.max_updated_at = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        self.version = 0
+
+    def refresh(self, force: bool = False) -> None:
+        """Brings the store up to date if it is older than refresh_seconds."""
+        with self.lock:
+            t = self.clock()
+            if not force and self.df is not None and t - self.refreshed_at < self.refresh_seconds:
+                return
+
+            window_start = to_naive_utc(self.now() - self.window)
+            since = None
+            if self.max_updated_at is not None:
+                since = self.max_updated_at - UPDATED_AT_LAG
+            if self.df is None or since is None or t - self.loaded_at >= self.full_reload_seconds:
+                df = self.fetch(window_start, None)
+                self.loaded_at = t
+                self.see(df)
+                self.set_frame(df.sort_values("start_time", kind="stable")
+                               .reset_index(drop=True))
+            else:
+                new = self.fetch(window_start, since)
+                self.see(new)
+                new = self.unseen(self.df, new, window_start)
+                df = self.df
+                if not new.empty:
+                    df = self.merge(df, new)
+                first = search(df["start_time"].to_numpy(), window_start, "left")
+                if first:
+                    df = df.iloc[first:].reset_index(drop=True)
+                if df is not self.df:
+                    self.set_frame(df)
+
+            self.window_start = window_start
+            self.refreshed_at = t
+
+    def see(self, fetched: pd.DataFrame) -> None:
+        """Moves the updated_at high-water mark on past the rows fetched."""
+        if not fetched.empty:
+            latest = fetched["updated_at"].max()
+            if self.max_updated_at is None or latest > self.max_updated_at:
+                self.max_updated_at = latest
+
+    @staticmethod
+    def unseen(df: pd.DataFrame, new: pd.DataFrame, window_start: datetime) -> pd.DataFrame:
+        """
+        The rows of new that change df: those it does not hold as they are, by
+        event_id and updated_at, that are in the window or replace a row it holds.
+        """
+        held = df.loc[df["event_id"].isin(new["event_id"]), ["event_id", "updated_at"]]
+        keys = pd.MultiIndex.from_frame(new[["event_id", "updated_at"]])
+        changed = ~keys.isin(pd.MultiIndex.from_frame(held))
+        relevant = (new["start_time"] >= window_start) | new["event_id"].isin(held["event_id"])
+        return new[changed & relevant]
+
+    @staticmethod
+    def merge(df: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+        """Replaces revised events and appends new ones, keeping start_time order."""
+        df = df[~df["event_id"].isin(new["event_id"])]
+        new = new.sort_values("start_time", kind="stable")
+        if df.empty or new["start_time"].iloc[0] >= df["start_time"].iloc[-1]:
+            return concat([df, new])
+        return (concat([df, new])
+                .sort_values("start_time", kind="stable")
+                .reset_index(drop=True))
+
+    def set_frame(self, df: pd.DataFrame) -> None:
+        """Swaps in a new frame and moves the version on."""
+        self.df = df
+        self.version += 1
+
+    def covers(self, start_dt: datetime) -> bool:
+        """Returns True if a range starting at start_dt can be answered from memory."""
+        self.refresh()
+        return to_naive_utc(start_dt) >= self.window_start
+
+    def slice(self, start_dt: datetime, end_dt: datetime) -> pd.DataFrame:
+        """
+        Returns the events with start_time between start_dt and end_dt inclusive,
+        or None if the range starts before the window. The slice's attrs["version"]
+        is the store version and row bounds, which identify its contents.
+        """
+        if not self.covers(start_dt):
+            return None
+        with self.lock:
+            df, version = self.df, self.version
+        times = df["start_time"].to_numpy()
+        lo = search(times, start_dt, "left")
+        hi = search(times, end_dt, "right")
+        part = df.iloc[lo:hi]
+        part.attrs["version"] = ("store", version, lo, hi)
+        return part
@@ -1,47 +1,194 @@
 """Functions to connect and load data"""
+import io
 import os
+from itertools import count
 import pandas as pd
 import streamlit as st
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
+from data.event_store import EventStore, to_naive_utc
+from data.prepare import prepare_events
+from data.snapshot import open_snapshot, scan_events
 load_dotenv()
 
+EVENT_FIELDS = """
+    e.event_id,
+    e.start_time,
+    e.creation_time,
+    e.description,
+    e.latitude,
+    e.longitude,
+    e.depth,
+    e.magnitude_value,
+    e.country_id,
+    c.country_name"""
+EVENT_FROM = """
+    FROM event e
+    LEFT JOIN country c
+    ON e.country_id = c.country_id
+"""
+EVENT_COLUMNS = f"SELECT{EVENT_FIELDS}{EVENT_FROM}"
+# The event store also keeps each event's updated_at, to fetch only revisions.
+STORE_COLUMNS = f"SELECT{EVENT_FIELDS},\n    e.updated_at{EVENT_FROM}"
 
+EVENT_DTYPES = {
+    "event_id": "int64",
+    "description": "str",
+    "latitude": "float32",
+    "longitude": "float32",
+    "depth": "float32",
+    "magnitude_value": "float32",
+    "country_id": "Int16",
+    "country_name": "category",
+}
+EVENT_TIMES = ["start_time", "creation_time"]
+
+POOL_SIZE = 5
+MAX_OVERFLOW = 5
+RANGE_CACHE_ENTRIES = 16
+
+RANGE_LOADS = count(1)
+
+COUNTRY_TTL_SECONDS = 3600
+SNAPSHOT_TTL_SECONDS = 300
+
+
+@st.cache_resource
 def get_engine():
-    """ Create a SQLAlchemy engine for the RDS database."""
+    """ The pooled SQLAlchemy engine for the RDS database, shared by every session."""
     DB_HOST = st.secrets["HOST_NAME"]
     DB_PORT = st.secrets["PORT"]
     DB_NAME = st.secrets["DB_NAME"]
     DB_USER = st.secrets["DB_USERNAME"]
     DB_PASSWORD = st.secrets["DB_PASSWORD"]
-    print(DB_HOST)
     connection_url = (
         f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}"
         f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
 
-    return create_engine(connection_url)
+    return create_engine(connection_url, pool_size=POOL_SIZE,
+                         max_overflow=MAX_OVERFLOW, pool_pre_ping=True)
 
 
-@st.cache_data(ttl=120)
-def load_earthquakes(start_dt, end_dt):
-    """ Load earthquakes data between the timeframe set."""
-    engine = get_engine()
+def read_events(query, params, times=EVENT_TIMES):
+    """
+    Run an event query through COPY, parse the CSV into compact dtypes and add the
+    derived columns the visuals share.
+    """
+    buffer = io.BytesIO()
+    conn = get_engine().raw_connection()
+    try:
+        with conn.cursor() as cur:
+            sql = cur.mogrify(query, params).decode()
+            cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH CSV HEADER", buffer)
+    finally:
+        conn.close()
+
+    buffer.seek(0)
+    return prepare_events(pd.read_csv(buffer, dtype=EVENT_DTYPES,
+                                      parse_dates=times, engine="pyarrow"))
+
+
+def fetch_events(window_start, since_updated_at=None):
+    """
+    Load events in the store window, or only those added or revised at or after
+    since_updated_at if given, wherever they start, as a seek on event_updated_at_idx.
+    """
+    if since_updated_at is None:
+        query = STORE_COLUMNS + "WHERE e.start_time >= %(window_start)s"
+        params = {"window_start": window_start}
+    else:
+        query = STORE_COLUMNS + "WHERE e.updated_at >= %(since_updated_at)s"
+        params = {"since_updated_at": since_updated_at}
+
+    return read_events(query, params, times=EVENT_TIMES + ["updated_at"])
+
+
+@st.cache_resource
+def get_event_store():
+    """ The event store shared by every session in this process."""
+    return EventStore(fetch_events)
 
+
+@st.cache_resource(ttl=SNAPSHOT_TTL_SECONDS)
+def get_snapshot():
+    """
+    The Parquet snapshot of the event table and its updated_at watermark, or None
+    if SNAPSHOT_URI is not set or the snapshot job has not run yet. Reopened every
+    SNAPSHOT_TTL_SECONDS to see the files of the job's later runs.
+    """
+    uri = st.secrets.get("SNAPSHOT_URI")
+    return open_snapshot(uri) if uri else None
+
+
+def load_snapshot_range(snapshot, start_dt, end_dt):
+    """
+    Load earthquakes data between the timeframe set from the snapshot, merged with
+    the few events in the range added or revised since its watermark, read from the
+    database.
+    Parquet keeps times in milliseconds, so they are cast back to the table's seconds.
+    """
+    dataset, watermark = snapshot
+    table = scan_events(dataset, to_naive_utc(start_dt), to_naive_utc(end_dt))
+    df = prepare_events(table.to_pandas().astype(
+        {**EVENT_DTYPES, **{column: "datetime64[s]" for column in EVENT_TIMES}}))
+    if not df["start_time"].is_monotonic_increasing:
+        df = df.sort_values("start_time", kind="stable").reset_index(drop=True)
+
+    query = EVENT_COLUMNS + """
+        WHERE e.start_time >= %(start_dt)s
+        AND e.start_time <= %(end_dt)s
+        AND e.updated_at >= %(watermark)s
+    """
+    recent = read_events(query, {"start_dt": start_dt, "end_dt": end_dt,
+                                 "watermark": watermark})
+    if recent.empty:
+        return df
+    return EventStore.merge(df, recent)
+
+
+@st.cache_resource(ttl=120, max_entries=RANGE_CACHE_ENTRIES)
+def load_earthquakes_range(start_dt, end_dt):
+    """
+    Load earthquakes data between the timeframe set, from the snapshot when there is
+    one, else from the database. The frame is shared by every session asking for the
+    same range, so callers must not modify it. Each load gets a new attrs["version"]
+    for the chart cache to key on.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        df = load_snapshot_range(snapshot, start_dt, end_dt)
+    else:
+        query = EVENT_COLUMNS + """
+            WHERE e.start_time >= %(start_dt)s
+            AND e.start_time <= %(end_dt)s
+            ORDER BY e.start_time
+        """
+        df = read_events(query, {"start_dt": start_dt, "end_dt": end_dt})
+    df.attrs["version"] = ("range", next(RANGE_LOADS))
+    return df
+
+
+@st.cache_data(ttl=COUNTRY_TTL_SECONDS)
+def load_countries():
+    """ Load every country's id and name, in name order."""
     query = text("""
-        SELECT
-        e.*,
-        c.country_name
-        FROM event e
-        LEFT JOIN country c
-        ON e.country_id = c.country_id
-        WHERE e.start_time >= :start_dt
-        AND e.start_time <= :end_dt
-        ORDER BY e.start_time DESC;
+        SELECT country_id, country_name
+        FROM country
+        ORDER BY country_name
     """)
 
-    with engine.connect() as conn:
-        df = pd.read_sql(query, conn, params={
-                         "start_dt": start_dt, "end_dt": end_dt, },)
+    with get_engine().connect() as conn:
+        return pd.read_sql(query, conn)
 
-    return df
+
+def load_earthquakes(start_dt, end_dt):
+    """
+    Load earthquakes data between the timeframe set, from memory when recent. Returns
+    a shallow copy of the shared frame: with copy-on-write, adding or changing columns
+    on it copies only what is touched and leaves the shared data as it was.
+    """
+    df = get_event_store().slice(start_dt, end_dt)
+    if df is None:
+        df = load_earthquakes_range(start_dt, end_dt)
+    return df.copy(deep=False)
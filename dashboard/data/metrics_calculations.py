@@ -10,14 +10,14 @@ def max_magnitude(df):
     """Maximum recorded magnitude."""
     if df.empty:
         return "—"
-    return round(df["magnitude_value"].max(), 2)
+    return round(float(df["magnitude_value"].max()), 2)
 
 
 def average_magnitude(df):
     """Average magnitude."""
     if df.empty:
         return "—"
-    return round(df["magnitude_value"].mean(), 2)
+    return round(float(df["magnitude_value"].mean()), 2)
 
 
 def deepest(df):
@@ -25,8 +25,7 @@ def deepest(df):
     if df.empty:
         return "—"
 
-    depth_km = df["depth"] / 1000.0
-    return round(depth_km.max(), 1)
+    return round(float(df["depth_km"].max()), 1)
 
 
 def shallowest(df):
@@ -34,13 +33,13 @@ def shallowest(df):
     if df.empty:
         return "—"
 
-    depth_km = df["depth"] / 1000.0
+    depth_km = df["depth_km"].to_numpy()
     depth_km = depth_km[depth_km >= 0]
 
-    if depth_km.empty:
+    if depth_km.size == 0:
         return "—"
 
-    return round(depth_km.min(), 1)
+    return round(float(depth_km.min()), 1)
 
 
 def countries_affected(df):
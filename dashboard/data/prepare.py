@@ -0,0 +1,21 @@
+"""Derived columns computed once when events are loaded, rather than on every render"""
+import numpy as np
+import pandas as pd
+
+
+def magnitude_colour(magnitudes) -> np.ndarray:
+    """Green channel of the map's red-to-yellow magnitude colour scale."""
+    return np.clip(140 - np.asarray(magnitudes, dtype=np.float32) * 20, 0, 255).astype(np.uint8)
+
+
+def prepare_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the columns the visuals share to a freshly loaded event frame:
+    depth_km and the map's colour and radius.
+    """
+    magnitude = df["magnitude_value"].to_numpy(dtype=np.float32)
+    return df.assign(
+        depth_km=(df["depth"].to_numpy(dtype=np.float32) / 1000).astype(np.float32),
+        colour=magnitude_colour(magnitude),
+        radius=(magnitude ** 2 * 25000).astype(np.float32),
+    )
@@ -0,0 +1,57 @@
+"""Vectorised filter options and masks for the map filters"""
+import math
+
+import numpy as np
+import pandas as pd
+
+MAX_EQUALITY_CODES = 8
+
+
+def filter_options(df: pd.DataFrame) -> tuple[float, float, list]:
+    """
+    Magnitude slider bounds, rounded outward to 0.01, and the sorted names of the
+    countries present. Categorical names are read from their codes.
+    """
+    magnitude = df["magnitude_value"].to_numpy()
+    names = df["country_name"]
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        codes = names.cat.codes.to_numpy()
+        present = np.bincount(codes + 1, minlength=len(names.cat.categories) + 1)[1:] > 0
+        options = sorted(names.cat.categories[present].tolist())
+    else:
+        options = sorted(names.dropna().unique().tolist())
+
+    return (math.floor(float(magnitude.min()) * 100) / 100,
+            math.ceil(float(magnitude.max()) * 100) / 100,
+            options)
+
+
+def map_mask(df: pd.DataFrame, low: float, high: float, countries) -> np.ndarray:
+    """
+    Rows with magnitude between low and high and, when countries are given, in one
+    of them. Categorical names are matched on their integer codes rather than as
+    strings: by equality for a few countries, else through a lookup table.
+    """
+    magnitude = df["magnitude_value"].to_numpy()
+    mask = magnitude >= low
+    mask &= magnitude <= high
+    if not countries:
+        return mask
+
+    names = df["country_name"]
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        codes = names.cat.codes.to_numpy()
+        categories = names.cat.categories
+        indexes = [categories.get_loc(name) for name in countries if name in categories]
+        if len(indexes) <= MAX_EQUALITY_CODES:
+            matched = np.zeros(len(codes), dtype=bool)
+            for index in indexes:
+                matched |= codes == index
+        else:
+            wanted = np.zeros(len(categories) + 1, dtype=bool)
+            wanted[np.array(indexes) + 1] = True
+            matched = wanted.take(codes.astype(np.intp) + 1)
+        mask &= matched
+    else:
+        mask &= names.isin(countries).to_numpy()
+    return mask
@@ -0,0 +1,50 @@
+"""Scans the monthly Parquet snapshots of the event table written by the snapshot job"""
+import json
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+MANIFEST = "_manifest.json"
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+
+def open_snapshot(uri: str) -> tuple[ds.Dataset, datetime]:
+    """
+    The snapshot dataset at uri and the updated_at it is complete up to, or None if
+    no snapshot has been written there yet. The dataset is made of the files the
+    manifest lists, which the snapshot job never rewrites, so it keeps reading
+    while later runs write new ones.
+    """
+    filesystem, root = fs.FileSystem.from_uri(uri)
+    try:
+        with filesystem.open_input_stream(f"{root}/{MANIFEST}") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if not manifest.get("files"):
+        return None
+
+    dataset = ds.dataset([f"{root}/{path}" for path in manifest["files"].values()],
+                         filesystem=filesystem, format="parquet",
+                         partitioning=PARTITIONING, partition_base_dir=root)
+    return dataset, datetime.fromisoformat(manifest["updated_at"])
+
+
+def scan_events(dataset: ds.Dataset, start: datetime, end: datetime) -> pa.Table:
+    """
+    Events with start_time between the naive UTC datetimes start and end inclusive,
+    rounded inward to whole seconds like the table. The month filter skips other
+    months' files and the start_time filter skips row groups whose statistics fall
+    outside the range.
+    """
+    if start.microsecond:
+        start = start.replace(microsecond=0) + timedelta(seconds=1)
+    end = end.replace(microsecond=0)
+    columns = [name for name in dataset.schema.names if name != "month"]
+    condition = ((ds.field("month") >= f"{start:%Y-%m}")
+                 & (ds.field("month") <= f"{end:%Y-%m}")
+                 & (ds.field("start_time") >= pa.scalar(start, pa.timestamp("s")))
+                 & (ds.field("start_time") <= pa.scalar(end, pa.timestamp("s"))))
+    return dataset.to_table(columns=columns, filter=condition)
@@ -0,0 +1,114 @@
+import pytest
+import pandas as pd
+from datetime import datetime, timedelta
+
+from aggregations import (nice_step, histogram, histogram_2d, time_series, pick_bucket,
+                          top_countries, fit_zoom, cluster_cell_degrees, grid_clusters)
+
+
+@pytest.mark.parametrize("span,expected", [
+    (6.0, 0.2),
+    (300.0, 10),
+    (0.0, 1.0),
+])
+def test_nice_step(span, expected):
+    assert nice_step(span, 30) == pytest.approx(expected)
+
+
+def test_histogram_counts_every_value():
+    bins = histogram([1.0, 1.1, 2.5, 4.9], maxbins=4)
+
+    assert bins["count"].sum() == 4
+    assert bins["bin_start"].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert bins["count"].tolist() == [2, 1, 0, 1]
+
+
+def test_histogram_empty():
+    assert histogram(pd.Series([], dtype=float)).empty
+
+
+def test_histogram_2d_omits_empty_cells():
+    cells = histogram_2d([1.0, 1.0, 5.0], [10.0, 10.0, 300.0], maxbins=2)
+
+    assert cells["count"].tolist() == [2, 1]
+    assert cells[["x_start", "y_start"]].values.tolist() == [[0.0, 0.0], [4.0, 200.0]]
+
+
+def test_time_series_fills_gaps():
+    series = time_series([datetime(2026, 2, 1, 3), datetime(2026, 2, 1, 20),
+                          datetime(2026, 2, 3, 1)], target_points=10)
+
+    assert series.attrs["bucket"] == "day"
+    assert series["count"].tolist() == [2, 0, 1]
+    assert str(series["start_time"].iloc[0]) == "2026-02-01 00:00:00+00:00"
+
+
+def test_time_series_sums_energy():
+    series = time_series([datetime(2026, 2, 1, 3, 10), datetime(2026, 2, 1, 3, 50)],
+                         [2.0, 4.0])
+
+    assert series.attrs["bucket"] == "minute"
+    assert series["energy"].iloc[0] == pytest.approx(10 ** 7.8)
+    assert series["energy"].iloc[-1] == pytest.approx(10 ** 10.8)
+    assert series["count"].sum() == 2
+
+
+@pytest.mark.parametrize("days", [1, 30, 365, 3650])
+def test_time_series_points_are_bounded(days):
+    times = pd.date_range("2020-01-01", periods=1000, freq=f"{days * 86.4}s", tz="UTC")
+
+    assert len(time_series(times, target_points=100)) <= 100
+
+
+@pytest.mark.parametrize("span, bucket", [(3000, "minute"), (86400, "hour"),
+                                          (30 * 86400, "day"), (365 * 86400, "week"),
+                                          (3650 * 86400, "3 weeks")])
+def test_pick_bucket(span, bucket):
+    assert pick_bucket(span)[0] == bucket
+
+
+@pytest.mark.parametrize("days", [199.5, 1399.5, 3650])
+def test_unaligned_span_stays_within_target_points(days):
+    start = datetime(2026, 1, 1, 12)
+    times = [start, start + timedelta(days=days)]
+
+    assert len(time_series(times, target_points=200)) <= 200
+
+
+def test_weeks_start_on_monday():
+    series = time_series([datetime(2026, 1, 1), datetime(2026, 6, 1)], target_points=30)
+
+    assert series.attrs["bucket"] == "week"
+    assert series["start_time"].dt.dayofweek.unique().tolist() == [0]
+
+
+def test_top_countries():
+    counts = top_countries(["Japan", "Chile", None, "Japan"], top_n=2)
+
+    assert counts.values.tolist() == [["Japan", 2], ["Chile", 1]]
+
+
+def test_top_countries_categorical():
+    counts = top_countries(pd.Categorical(["Japan", None, None, "Chile"]), top_n=1)
+
+    assert counts.values.tolist() == [["Unknown", 2]]
+
+
+def test_fit_zoom_world_and_region():
+    assert fit_zoom([-60, 60], [-180, 180]) == pytest.approx(1.4)
+    assert fit_zoom([35.0, 36.0], [139.0, 140.0]) == pytest.approx(7.55, abs=0.01)
+    assert fit_zoom([], []) == 1.4
+
+
+def test_cluster_cell_degrees_halves_per_zoom_level():
+    assert cluster_cell_degrees(3) == pytest.approx(cluster_cell_degrees(2) / 2)
+
+
+def test_grid_clusters():
+    clusters = grid_clusters([1.0, 2.0, 50.0], [1.0, 3.0, 50.0], [2.0, 4.5, 1.0],
+                             cell_degrees=10)
+    clusters = clusters.sort_values("count", ascending=False).reset_index(drop=True)
+
+    assert clusters["count"].tolist() == [2, 1]
+    assert clusters["max_magnitude"].tolist() == [4.5, 1.0]
+    assert clusters.loc[0, ["latitude", "longitude"]].tolist() == [1.5, 2.0]
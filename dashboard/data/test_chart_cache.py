@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from chart_cache import ChartCache, chart_data, estimate_bytes
+
+
+def test_hit_skips_compute():
+    cache = ChartCache()
+    calls = []
+
+    for _ in range(3):
+        value = cache.get("key", lambda: calls.append(1) or "value")
+
+    assert value == "value"
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_evicts_least_recently_used():
+    cache = ChartCache(max_entries=2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: 1)
+    cache.get("c", lambda: 3)
+
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_evicts_least_recently_used_past_max_bytes():
+    cache = ChartCache(max_bytes=2000)
+    cache.get("a", lambda: np.zeros(100))
+    cache.get("b", lambda: np.zeros(100))
+    cache.get("a", lambda: np.zeros(100))
+    cache.get("c", lambda: np.zeros(100))
+
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.bytes == 1600
+
+
+def test_does_not_keep_a_value_larger_than_max_bytes():
+    cache = ChartCache(max_bytes=1000)
+    cache.get("small", lambda: np.zeros(10))
+    value = cache.get("big", lambda: np.zeros(1000))
+
+    assert len(value) == 1000
+    assert list(cache.entries) == ["small"]
+
+
+def test_estimate_bytes_counts_a_map_layers_records():
+    points = pd.DataFrame({"longitude": np.arange(10_000, dtype=float),
+                           "latitude": np.arange(10_000, dtype=float),
+                           "description": ["somewhere"] * 10_000})
+    layer = pdk.Layer("ScatterplotLayer", data=points)
+
+    assert estimate_bytes(layer) > 10_000 * estimate_bytes(layer.data[0]) * 0.9
+    assert estimate_bytes(layer) > 1_000_000
+
+
+def test_chart_data_without_version_always_computes():
+    df = pd.DataFrame({"x": [1, 2]})
+    calls = []
+
+    chart_data(df, "sum", lambda: calls.append(1))
+    chart_data(df, "sum", lambda: calls.append(1))
+
+    assert len(calls) == 2
+
+
+def test_chart_data_keys_on_version_and_params():
+    df = pd.DataFrame({"x": [1, 2]})
+    df.attrs["version"] = ("test", 1)
+
+    first = chart_data(df, "top", lambda: df["x"].head(1).tolist(), 1)
+    again = chart_data(df, "top", lambda: [], 1)
+    other = chart_data(df, "top", lambda: df["x"].head(2).tolist(), 2)
+
+    assert first == again == [1]
+    assert other == [1, 2]
@@ -0,0 +1,176 @@
+import pytest
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+
+from event_store import EventStore, UPDATED_AT_LAG, search
+
+NOW = datetime(2026, 2, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def make_events(rows):
+    return pd.DataFrame(rows, columns=["event_id", "start_time", "creation_time",
+                                       "magnitude_value", "updated_at"])
+
+
+class FakeSource:
+    """Stands in for the database: returns the window, or rows past the watermark."""
+
+    def __init__(self, rows):
+        self.events = make_events(rows)
+        self.calls = []
+
+    def __call__(self, window_start, since_updated_at):
+        self.calls.append((window_start, since_updated_at))
+        if since_updated_at is None:
+            return self.events[self.events["start_time"] >= window_start].copy()
+        return self.events[self.events["updated_at"] >= since_updated_at].copy()
+
+    def revise(self, event_id, **values):
+        rows = self.events["event_id"] == event_id
+        for column, value in values.items():
+            self.events.loc[rows, column] = value
+
+
+@pytest.fixture
+def clock():
+    return {"t": 0.0, "now": NOW}
+
+
+@pytest.fixture
+def source():
+    return FakeSource([
+        (1, datetime(2026, 2, 9, 10), datetime(2026, 2, 9, 10), 2.0, datetime(2026, 2, 9, 10)),
+        (2, datetime(2026, 2, 1, 10), datetime(2026, 2, 1, 10), 3.0, datetime(2026, 2, 1, 10)),
+        (3, datetime(2026, 2, 10, 11), datetime(2026, 2, 10, 11), 4.0,
+         datetime(2026, 2, 10, 11)),
+    ])
+
+
+def make_store(source, clock):
+    return EventStore(source, window=timedelta(days=7), refresh_seconds=60,
+                      full_reload_seconds=3600, clock=lambda: clock["t"],
+                      now=lambda: clock["now"])
+
+
+def test_slice_returns_range_in_time_order(source, clock):
+    store = make_store(source, clock)
+
+    df = store.slice(NOW - timedelta(days=2), NOW)
+
+    assert df["event_id"].tolist() == [1, 3]
+
+
+def test_slice_before_window_returns_none(source, clock):
+    store = make_store(source, clock)
+    assert store.slice(NOW - timedelta(days=30), NOW) is None
+
+
+def test_refresh_is_throttled(source, clock):
+    store = make_store(source, clock)
+    store.slice(NOW - timedelta(days=1), NOW)
+    clock["t"] = 30
+    store.slice(NOW - timedelta(days=1), NOW)
+    assert len(source.calls) == 1
+
+
+def test_refresh_fetches_only_past_watermarks(source, clock):
+    store = make_store(source, clock)
+    store.refresh()
+    source.events = make_events([
+        *source.events.itertuples(index=False),
+        (4, datetime(2026, 2, 10, 11, 30), datetime(2026, 2, 10, 11, 30), 5.0,
+         datetime(2026, 2, 10, 11, 31)),
+    ])
+    clock["t"] = 61
+
+    df = store.slice(NOW - timedelta(days=1), NOW)
+
+    assert source.calls[-1][1] == pd.Timestamp(datetime(2026, 2, 10, 11)) - UPDATED_AT_LAG
+    assert df["event_id"].tolist() == [3, 4]
+    assert store.version == 2
+
+
+def test_revision_without_new_creation_time_replaces_event(source, clock):
+    store = make_store(source, clock)
+    store.refresh()
+    source.revise(1, magnitude_value=2.5, updated_at=datetime(2026, 2, 10, 11, 45))
+    clock["t"] = 61
+
+    df = store.slice(NOW - timedelta(days=2), NOW)
+
+    assert df["event_id"].tolist() == [1, 3]
+    assert df["magnitude_value"].tolist() == [2.5, 4.0]
+    assert df["creation_time"].tolist() == [pd.Timestamp(datetime(2026, 2, 9, 10)),
+                                            pd.Timestamp(datetime(2026, 2, 10, 11))]
+
+
+def test_rows_read_again_within_the_lag_leave_the_version(source, clock):
+    store = make_store(source, clock)
+    store.refresh()
+    clock["t"] = 61
+
+    store.refresh()
+
+    assert source.calls[-1][1] is not None
+    assert store.version == 1
+
+
+def test_revision_moving_an_event_out_of_the_window_drops_it(source, clock):
+    store = make_store(source, clock)
+    store.refresh()
+    source.revise(1, start_time=datetime(2026, 1, 1), updated_at=datetime(2026, 2, 10, 11, 45))
+    clock["t"] = 61
+
+    store.refresh()
+
+    assert store.df["event_id"].tolist() == [3]
+
+
+def test_window_slides(source, clock):
+    store = make_store(source, clock)
+    store.refresh()
+    clock["t"] = 61
+    clock["now"] = NOW + timedelta(days=6, hours=1)
+
+    store.refresh()
+
+    assert store.df["event_id"].tolist() == [3]
+
+
+def test_merge_keeps_categories():
+    df = pd.DataFrame({"event_id": [1], "start_time": [datetime(2026, 2, 9)],
+                       "country_name": pd.Categorical(["Japan"])})
+    new = pd.DataFrame({"event_id": [2], "start_time": [datetime(2026, 2, 8)],
+                        "country_name": pd.Categorical(["Chile"])})
+
+    merged = EventStore.merge(df, new)
+
+    assert isinstance(merged["country_name"].dtype, pd.CategoricalDtype)
+    assert merged["country_name"].tolist() == ["Chile", "Japan"]
+
+
+def test_search_rounds_key_to_array_unit():
+    times = pd.to_datetime(["2026-02-09 10:00:00", "2026-02-09 10:00:01"]).as_unit("s").to_numpy()
+    key = datetime(2026, 2, 9, 10, 0, 0, 500_000)
+
+    assert search(times, key, "left") == 1
+    assert search(times, key, "right") == 1
+
+
+def test_slice_version_changes_with_contents(source, clock):
+    store = make_store(source, clock)
+
+    first = store.slice(NOW - timedelta(days=2), NOW).attrs["version"]
+    same = store.slice(NOW - timedelta(days=2), NOW + timedelta(minutes=1)).attrs["version"]
+    store.refresh(force=True)
+    unchanged = store.slice(NOW - timedelta(days=2), NOW).attrs["version"]
+    source.events = make_events([
+        *source.events.itertuples(index=False),
+        (4, datetime(2026, 2, 10, 11, 30), datetime(2026, 2, 10, 11, 30), 5.0,
+         datetime(2026, 2, 10, 11, 31)),
+    ])
+    store.refresh(force=True)
+    refreshed = store.slice(NOW - timedelta(days=2), NOW).attrs["version"]
+
+    assert first == same == unchanged
+    assert refreshed != first
@@ -16,6 +16,7 @@ def sample_df():
     return pd.DataFrame({
         "magnitude_value": [4.123, 5.678, 3.456],
         "depth": [10000, 5000, 20000],
+        "depth_km": [10.0, 5.0, 20.0],
         "country_id": [1, 2, 1]
     })
 
@@ -25,6 +26,7 @@ def empty_df():
     return pd.DataFrame(columns=[
         "magnitude_value",
         "depth",
+        "depth_km",
         "country_id"
     ])
 
@@ -73,6 +75,7 @@ def test_shallowest_empty(empty_df):
 def test_shallowest_all_negative():
     df = pd.DataFrame({
         "depth": [-1000, -5000],
+        "depth_km": [-1.0, -5.0],
         "magnitude_value": [1, 2],
         "country_id": [1, 1]
     })
@@ -0,0 +1,25 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from prepare import magnitude_colour, prepare_events
+
+
+def test_magnitude_colour_clips():
+    assert magnitude_colour([0.0, 3.0, 9.0]).tolist() == [140, 80, 0]
+
+
+def test_prepare_events_adds_derived_columns():
+    df = pd.DataFrame({
+        "start_time": [datetime(2026, 2, 1, 23, 59), datetime(2026, 2, 2, 0, 1)],
+        "depth": np.array([12500.0, -300.0], dtype=np.float32),
+        "magnitude_value": np.array([2.0, 4.0], dtype=np.float32),
+    })
+
+    prepared = prepare_events(df)
+
+    assert prepared["depth_km"].tolist() == pytest.approx([12.5, -0.3])
+    assert prepared["colour"].tolist() == [100, 60]
+    assert prepared["radius"].tolist() == [100000, 400000]
+    assert "depth_km" not in df
@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from selection import filter_options, map_mask
+
+
+@pytest.fixture
+def events():
+    return pd.DataFrame({
+        "magnitude_value": np.array([1.234, 2.5, 4.0, 6.789], dtype=np.float32),
+        "country_name": pd.Categorical(["Peru", None, "Japan", "Peru"],
+                                       categories=["Chile", "Japan", "Peru"]),
+    })
+
+
+def test_filter_options_lists_present_countries(events):
+    assert filter_options(events) == (1.23, 6.79, ["Japan", "Peru"])
+
+
+def test_filter_options_plain_strings(events):
+    events["country_name"] = events["country_name"].astype(object)
+
+    assert filter_options(events)[2] == ["Japan", "Peru"]
+
+
+@pytest.mark.parametrize("low,high,countries,expected", [
+    (0.0, 10.0, [], [True, True, True, True]),
+    (2.0, 5.0, [], [False, True, True, False]),
+    (0.0, 10.0, ["Peru"], [True, False, False, True]),
+    (2.0, 10.0, ["Peru", "Atlantis"], [False, False, False, True]),
+    (0.0, 10.0, ["Chile"], [False, False, False, False]),
+])
+def test_map_mask(events, low, high, countries, expected):
+    assert map_mask(events, low, high, countries).tolist() == expected
+    plain = events.assign(country_name=events["country_name"].astype(object))
+    assert map_mask(plain, low, high, countries).tolist() == expected
+
+
+def test_map_mask_many_countries_uses_table(events, monkeypatch):
+    monkeypatch.setattr("selection.MAX_EQUALITY_CODES", 1)
+
+    assert map_mask(events, 0.0, 10.0, ["Japan", "Peru"]).tolist() == [True, False, True, True]
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from snapshot import open_snapshot, scan_events
+
+
+def write_snapshot(root, months, run="1"):
+    files = {}
+    for month, times in months.items():
+        (root / f"month={month}").mkdir(exist_ok=True)
+        files[month] = f"month={month}/part-{run}.parquet"
+        pq.write_table(pa.table({"event_id": pa.array(range(len(times)), pa.int64()),
+                                 "start_time": pa.array(times, pa.timestamp("s"))}),
+                       root / files[month], row_group_size=2)
+    (root / "_manifest.json").write_text(json.dumps({"updated_at": "2026-03-01T09:00:00",
+                                                     "files": files}))
+
+
+def test_open_snapshot_without_manifest(tmp_path):
+    assert open_snapshot(str(tmp_path)) is None
+
+
+def test_open_snapshot_without_files(tmp_path):
+    (tmp_path / "_manifest.json").write_text(json.dumps({"creation_time": "2026-03-01T09:00:00"}))
+
+    assert open_snapshot(str(tmp_path)) is None
+
+
+def test_open_snapshot_reads_only_listed_files(tmp_path):
+    write_snapshot(tmp_path, {"2026-02": [datetime(2026, 2, 1)]}, run="1")
+    dataset, _ = open_snapshot(str(tmp_path))
+    write_snapshot(tmp_path, {"2026-02": [datetime(2026, 2, 1), datetime(2026, 2, 2)]}, run="2")
+
+    before = scan_events(dataset, datetime(2026, 2, 1), datetime(2026, 2, 28))
+    after = scan_events(open_snapshot(str(tmp_path))[0], datetime(2026, 2, 1),
+                        datetime(2026, 2, 28))
+
+    assert before.num_rows == 1
+    assert after.num_rows == 2
+
+
+def test_scan_events_reads_only_the_range(tmp_path):
+    write_snapshot(tmp_path, {
+        "2026-01": [datetime(2026, 1, 5), datetime(2026, 1, 31, 23)],
+        "2026-02": [datetime(2026, 2, 1), datetime(2026, 2, 10), datetime(2026, 2, 20)],
+    })
+    dataset, watermark = open_snapshot(str(tmp_path))
+
+    table = scan_events(dataset, datetime(2026, 1, 31), datetime(2026, 2, 10, 0, 0, 0, 500))
+
+    assert watermark == datetime(2026, 3, 1, 9)
+    assert table.column_names == ["event_id", "start_time"]
+    assert table.column("start_time").to_pylist() == [
+        datetime(2026, 1, 31, 23), datetime(2026, 2, 1), datetime(2026, 2, 10)]
+
+
+def test_scan_events_rounds_start_up(tmp_path):
+    write_snapshot(tmp_path, {"2026-02": [datetime(2026, 2, 1), datetime(2026, 2, 1, 0, 0, 1)]})
+    dataset, _ = open_snapshot(str(tmp_path))
+
+    table = scan_events(dataset, datetime(2026, 2, 1, 0, 0, 0, 1), datetime(2026, 2, 2))
+
+    assert table.column("start_time").to_pylist() == [datetime(2026, 2, 1, 0, 0, 1)]
@@ -2,10 +2,13 @@
 import os
 from pathlib import Path
 import base64
-import pandas as pd
 import streamlit as st
 from sqlalchemy import text
-from data.load import get_engine, load_earthquakes
+from data.load import get_engine, load_countries
+
+# Must match subscriber_radius_check in database/schema.sql.
+MAX_RADIUS_KM = 500
+AREA_CHOICES = ["In a country", "Near a location"]
 
 style_sheet = os.path.join(os.path.dirname(__file__),
                             "../styles.css")
@@ -84,22 +87,41 @@ def get_country_from_df(df):
     return country_id, country_name
 
 
+def get_area_choice():
+    """Radio to choose between alerts for a country and alerts near a location."""
+    return st.radio("Alert me about earthquakes", options=AREA_CHOICES, horizontal=True)
+
+
+def get_home_location():
+    """Inputs to retrieve the home location and alert radius."""
+    latitude = st.number_input("Home latitude", min_value=-90.0, max_value=90.0,
+                               value=0.0, step=0.0001, format="%.4f")
+    longitude = st.number_input("Home longitude", min_value=-180.0, max_value=180.0,
+                                value=0.0, step=0.0001, format="%.4f")
+    radius_km = st.slider("Within (km)", min_value=10, max_value=MAX_RADIUS_KM,
+                          value=100, step=10)
+    return latitude, longitude, radius_km
+
+
 def get_weekly_alert():
     """Adds check box, to get know if user wants alerts weekly or not."""
     weekly = st.checkbox("Weekly alerts", value=True)
     return weekly
 
 
-def insert_subscriber(name, email, weekly, country_id, magnitude_value):
+def insert_subscriber(name, email, weekly, country_id, magnitude_value,
+                      home_latitude=None, home_longitude=None, radius_km=None):
     """Inputs all retrieved data to the subscriber table"""
     engine = get_engine()
     with engine.begin() as conn:
         conn.execute(
             text("""
                 INSERT INTO subscriber
-                    (subscriber_name, subscriber_email, weekly, country_id, magnitude_value)
+                    (subscriber_name, subscriber_email, weekly, country_id, magnitude_value,
+                     home_latitude, home_longitude, radius_km)
                 VALUES
-                    (:name, :email, :weekly, :country_id, :mag);
+                    (:name, :email, :weekly, :country_id, :mag,
+                     :home_latitude, :home_longitude, :radius_km);
             """),
             {
                 "name": name,
@@ -107,6 +129,9 @@ def insert_subscriber(name, email, weekly, country_id, magnitude_value):
                 "weekly": bool(weekly),
                 "country_id": (country_id),
                 "mag": float(magnitude_value),
+                "home_latitude": home_latitude,
+                "home_longitude": home_longitude,
+                "radius_km": radius_km,
             },
         )
 
@@ -114,16 +139,22 @@ def insert_subscriber(name, email, weekly, country_id, magnitude_value):
 st.markdown("<div class='dashboard-title'>Subscribe to receive alerts!</div>",
             unsafe_allow_html=True)
 
-end_dt = pd.Timestamp.utcnow()
-start_dt = end_dt - pd.Timedelta(days=365)
-df_quakes = load_earthquakes(start_dt, end_dt)
+df_countries = load_countries()
+
+# Outside the form, so the form shows the inputs for the chosen area.
+area = get_area_choice()
 
 with st.form("subscribe_form", clear_on_submit=True):
     name = get_name()
     email = get_email()
     magnitude = get_magnitude_threshold()
     weekly = get_weekly_alert()
-    country_id, country_name = get_country_from_df(df_quakes)
+    home_latitude = home_longitude = radius_km = None
+    if area == AREA_CHOICES[0]:
+        country_id, country_name = get_country_from_df(df_countries)
+    else:
+        country_id = None
+        home_latitude, home_longitude, radius_km = get_home_location()
 
     submitted = st.form_submit_button("Submit")
 
@@ -143,6 +174,9 @@ if submitted:
                 weekly=weekly,
                 country_id=country_id,
                 magnitude_value=magnitude,
+                home_latitude=home_latitude,
+                home_longitude=home_longitude,
+                radius_km=radius_km,
             )
             st.success(
                 f"Subscribed!")
@@ -2,105 +2,100 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+from data.aggregations import histogram, histogram_2d, time_series, top_countries
+from data.chart_cache import chart_data
 
-@st.cache_resource(ttl=120)
-def magnitude_distribution(df: pd.DataFrame) -> None:
-    """Graph showing magnitude distribution"""
-    st.markdown("### Magnitude distribution")
 
-    chart = (
-        alt.Chart(df)
+def binned_bar(bins: pd.DataFrame, title: str) -> alt.Chart:
+    """Bar chart of pre-binned counts."""
+    return (
+        alt.Chart(bins)
         .mark_bar()
         .encode(
-            x=alt.X("magnitude_value:Q", bin=alt.Bin(
-                maxbins=30), title="Magnitude"),
-            y=alt.Y("count():Q", title="Number of earthquakes"),
+            x=alt.X("bin_start:Q", bin="binned", title=title),
+            x2="bin_end:Q",
+            y=alt.Y("count:Q", title="Number of earthquakes"),
         )
     )
+
+
+def magnitude_distribution(df: pd.DataFrame) -> None:
+    """Graph showing magnitude distribution"""
+    st.markdown("### Magnitude distribution")
+
+    bins = chart_data(df, "magnitude histogram", lambda: histogram(df["magnitude_value"]))
+    chart = binned_bar(bins, "Magnitude")
     st.altair_chart(chart, use_container_width=True)
 
 
-@st.cache_resource(ttl=120)
 def depth_distribution(df: pd.DataFrame) -> None:
     """Graph showing depth distribution"""
     st.markdown("### Depth distribution")
 
-    d = df.copy()
-    d["depth"] = pd.to_numeric(d["depth"], errors="coerce")
-
-    chart = (
-        alt.Chart(d.dropna(subset=["depth"]))
-        .mark_bar()
-        .encode(
-            x=alt.X("depth:Q", bin=alt.Bin(
-                maxbins=30), title="Depth (km)"),
-            y=alt.Y("count():Q", title="Number of earthquakes"),
-        )
-    )
+    bins = chart_data(df, "depth histogram", lambda: histogram(df["depth_km"]))
+    chart = binned_bar(bins, "Depth (km)")
     st.altair_chart(chart, use_container_width=True)
 
 
-@st.cache_resource(ttl=120)
 def depth_vs_magnitude(df: pd.DataFrame) -> None:
     """Graph showing Depth against magnitude"""
     st.markdown("### Depth vs Magnitude")
 
-    d = df.copy()
-    d["depth"] = pd.to_numeric(
-        d["depth"], errors="coerce")
-    d["magnitude_value"] = pd.to_numeric(
-        d["magnitude_value"], errors="coerce")
+    cells = chart_data(df, "depth vs magnitude",
+                       lambda: histogram_2d(df["magnitude_value"], df["depth_km"]))
 
     chart = (
-        alt.Chart(d.dropna(subset=["depth", "magnitude_value"]))
-        .mark_circle(opacity=0.5)
+        alt.Chart(cells)
+        .mark_rect()
         .encode(
-            x=alt.X("magnitude_value:Q", title="Magnitude"),
-            y=alt.Y("depth:Q", title="Depth (km)"),
+            x=alt.X("x_start:Q", bin="binned", title="Magnitude"),
+            x2="x_end:Q",
+            y=alt.Y("y_start:Q", bin="binned", title="Depth (km)"),
+            y2="y_end:Q",
+            color=alt.Color("count:Q", title="Earthquakes",
+                            scale=alt.Scale(scheme="oranges")),
+            tooltip=["x_start:Q", "y_start:Q", "count:Q"],
         )
         .interactive()
     )
     st.altair_chart(chart, use_container_width=True)
 
 
-@st.cache_resource(ttl=120)
 def render_earthquakes_over_time(df: pd.DataFrame) -> None:
-    """Renders an earthquake over time graph."""
+    """
+    Renders an earthquake over time graph, bucketed by minute, hour, day or week to
+    keep the number of points bounded, optionally as energy released.
+    """
     st.markdown("#### Earthquakes over time")
 
     if df is None or df.empty:
         st.info("No data to plot.")
         return
 
-    d = df.copy()
-    d["start_time"] = pd.to_datetime(d["start_time"], utc=True)
+    series = chart_data(df, "time series",
+                        lambda: time_series(df["start_time"], df["magnitude_value"]))
+    energy = st.toggle("Show energy released", key="time_series_energy")
 
-    daily = (
-        d.set_index("start_time")
-        .resample("D")
-        .size()
-        .reset_index(name="count")
-    )
+    if energy:
+        y = alt.Y("energy:Q", title="Energy released (J)", scale=alt.Scale(type="symlog"))
+    else:
+        y = alt.Y("count:Q", title="Number of earthquakes")
 
     chart = (
-        alt.Chart(daily)
+        alt.Chart(series)
         .mark_line()
         .encode(
             x=alt.X(
                 "start_time:T",
-                title="Time of earthquake"
+                title=f"Time of earthquake (per {series.attrs['bucket']})"
             ),
-            y=alt.Y(
-                "count:Q",
-                title="Number of earthquakes"
-            )
+            y=y
         )
     )
 
     st.altair_chart(chart, use_container_width=True)
 
 
-@st.cache_resource(ttl=120)
 def render_top_countries(df: pd.DataFrame, top_n: int = 10) -> None:
     """Renders a top countries with earthquakes chart."""
     st.markdown("#### Top affected countries")
@@ -109,15 +104,8 @@ def render_top_countries(df: pd.DataFrame, top_n: int = 10) -> None:
         st.info("No data to plot.")
         return
 
-    counts = (
-        df["country_name"]
-        .fillna("Unknown")
-        .astype(str)
-        .value_counts()
-        .head(top_n)
-        .reset_index()
-    )
-    counts.columns = ["country_name", "count"]
+    counts = chart_data(df, "top countries",
+                        lambda: top_countries(df["country_name"], top_n), top_n)
 
     chart = (
         alt.Chart(counts)
@@ -3,8 +3,10 @@ import pandas as pd
 import streamlit as st
 import altair as alt
 
+from data.aggregations import histogram
+from data.chart_cache import chart_data
+
 
-@st.cache_resource(ttl=120)
 def render_magnitude_distribution(df: pd.DataFrame) -> None:
     """Renders a magnitude distribution graph."""
     st.markdown("#### Magnitude distribution")
@@ -13,12 +15,15 @@ def render_magnitude_distribution(df: pd.DataFrame) -> None:
         st.info("No data to plot.")
         return
 
+    bins = chart_data(df, "magnitude histogram", lambda: histogram(df["magnitude_value"]))
+
     chart = (
-        alt.Chart(df)
+        alt.Chart(bins)
         .mark_bar()
         .encode(
-            x=alt.X("magnitude_value:Q", bin=True, title="Magnitude"),
-            y=alt.Y("count()", title="Number of earthquakes")
+            x=alt.X("bin_start:Q", bin="binned", title="Magnitude"),
+            x2="bin_end:Q",
+            y=alt.Y("count:Q", title="Number of earthquakes")
         )
     )
 
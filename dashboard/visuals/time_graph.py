@@ -3,38 +3,39 @@ import pandas as pd
 import streamlit as st
 import altair as alt
 
+from data.aggregations import time_series
+from data.chart_cache import chart_data
+
 
-@st.cache_resource(ttl=120)
 def render_earthquakes_over_time(df: pd.DataFrame) -> None:
-    """Renders an earthquake over time graph."""
+    """
+    Renders an earthquake over time graph, bucketed by minute, hour, day or week to
+    keep the number of points bounded, optionally as energy released.
+    """
     st.markdown("#### Earthquakes over time")
 
     if df is None or df.empty:
         st.info("No data to plot.")
         return
 
-    d = df.copy()
-    d["start_time"] = pd.to_datetime(d["start_time"], utc=True)
+    series = chart_data(df, "time series",
+                        lambda: time_series(df["start_time"], df["magnitude_value"]))
+    energy = st.toggle("Show energy released", key="time_series_energy")
 
-    daily = (
-        d.set_index("start_time")
-        .resample("D")
-        .size()
-        .reset_index(name="count")
-    )
+    if energy:
+        y = alt.Y("energy:Q", title="Energy released (J)", scale=alt.Scale(type="symlog"))
+    else:
+        y = alt.Y("count:Q", title="Number of earthquakes")
 
     chart = (
-        alt.Chart(daily)
+        alt.Chart(series)
         .mark_line()
         .encode(
             x=alt.X(
                 "start_time:T",
-                title="Time of earthquake"
+                title=f"Time of earthquake (per {series.attrs['bucket']})"
             ),
-            y=alt.Y(
-                "count:Q",
-                title="Number of earthquakes"
-            )
+            y=y
         )
     )
 
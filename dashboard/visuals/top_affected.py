@@ -3,8 +3,10 @@ import pandas as pd
 import streamlit as st
 import altair as alt
 
+from data.aggregations import top_countries
+from data.chart_cache import chart_data
+
 
-@st.cache_resource(ttl=120)
 def render_top_countries(df: pd.DataFrame, top_n: int = 10) -> None:
     """Renders a top countries with earthquakes chart."""
     st.markdown("#### Top affected countries")
@@ -13,15 +15,8 @@ def render_top_countries(df: pd.DataFrame, top_n: int = 10) -> None:
         st.info("No data to plot.")
         return
 
-    counts = (
-        df["country_name"]
-        .fillna("Unknown")
-        .astype(str)
-        .value_counts()
-        .head(top_n)
-        .reset_index()
-    )
-    counts.columns = ["country_name", "count"]
+    counts = chart_data(df, "top countries",
+                        lambda: top_countries(df["country_name"], top_n), top_n)
 
     chart = (
         alt.Chart(counts)
@@ -9,6 +9,10 @@ DROP TABLE IF EXISTS event CASCADE;
 DROP TABLE IF EXISTS country CASCADE ;
 DROP TABLE IF EXISTS magnitude_type CASCADE ;
 DROP TABLE IF EXISTS subscriber CASCADE ;
+DROP TABLE IF EXISTS alert_dispatch CASCADE ;
+DROP TABLE IF EXISTS alert_pending CASCADE ;
+DROP TABLE IF EXISTS radius_subscriber_version CASCADE ;
+DROP TABLE IF EXISTS event_moved_month CASCADE ;
 
 CREATE TABLE "event"(
     "event_id" BIGINT UNIQUE NOT NULL GENERATED ALWAYS AS IDENTITY,
@@ -26,7 +30,8 @@ CREATE TABLE "event"(
     "magnitude_value" FLOAT(53) NOT NULL,
     "magnitude_uncertainty" FLOAT(53) NOT NULL,
     "magnitude_type_id" SMALLINT NOT NULL,
-    "country_id" SMALLINT
+    "country_id" SMALLINT,
+    "updated_at" TIMESTAMP(0) WITHOUT TIME ZONE NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc')
 );
 ALTER TABLE
     "event" ADD PRIMARY KEY("event_id");
@@ -49,14 +54,142 @@ CREATE TABLE "subscriber"(
     "subscriber_email" TEXT NOT NULL,
     "weekly" BOOLEAN NOT NULL,
     "country_id" SMALLINT,
-    "magnitude_value" FLOAT(53) NOT NULL
+    "magnitude_value" FLOAT(53) NOT NULL,
+    "updated_at" TIMESTAMP(0) WITHOUT TIME ZONE NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+    "policy_hash" TEXT,
+    "home_latitude" FLOAT(53),
+    "home_longitude" FLOAT(53),
+    "radius_km" FLOAT(53)
 );
 ALTER TABLE
     "subscriber" ADD PRIMARY KEY("subscriber_id");
+-- A subscriber picks either a country (or all of them) or a circle around a home
+-- location, of at most 500 km to match MAX_RADIUS_KM in alerts/geo.py.
+ALTER TABLE
+    "subscriber" ADD CONSTRAINT "subscriber_radius_check" CHECK (
+        ("home_latitude" IS NULL AND "home_longitude" IS NULL AND "radius_km" IS NULL)
+        OR ("home_latitude" BETWEEN -90 AND 90 AND "home_longitude" BETWEEN -180 AND 180
+            AND "radius_km" > 0 AND "radius_km" <= 500 AND "country_id" IS NULL)
+    );
+-- Per SNS topic, the last event_id the alerts Lambda has published. Each batch of
+-- alerts locks the row, publishes the events past it and moves it on in the same
+-- transaction, so every event is published once even when runs overlap.
+CREATE TABLE "alert_dispatch"(
+    "topic_arn" TEXT NOT NULL,
+    "last_event_id" BIGINT NOT NULL,
+    "updated_at" TIMESTAMP(0) WITHOUT TIME ZONE NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc')
+);
+ALTER TABLE
+    "alert_dispatch" ADD PRIMARY KEY("topic_arn");
+-- PublishBatch entries SNS still failed to take after retries, saved as sent in
+-- the transaction that moves the topic's watermark past their batch. Each run
+-- sends them again before new events and deletes them once taken.
+CREATE TABLE "alert_pending"(
+    "topic_arn" TEXT NOT NULL,
+    "entry_id" VARCHAR(80) NOT NULL,
+    "entry" JSONB NOT NULL,
+    "created_at" TIMESTAMP(0) WITHOUT TIME ZONE NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc')
+);
+ALTER TABLE
+    "alert_pending" ADD PRIMARY KEY("topic_arn", "entry_id");
 ALTER TABLE
     "event" ADD CONSTRAINT "event_country_id_foreign" FOREIGN KEY("country_id") REFERENCES "country"("country_id");
 ALTER TABLE
     "event" ADD CONSTRAINT "event_magnitude_type_id_foreign" FOREIGN KEY("magnitude_type_id") REFERENCES "magnitude_type"("magnitude_type_id");
 ALTER TABLE
     "subscriber" ADD CONSTRAINT "subscriber_country_id_foreign" FOREIGN KEY("country_id") REFERENCES "country"("country_id");
+
+-- Serves / and /recent, and covers their ETag validators and the /stats and
+-- /histogram aggregates as index-only scans. The validators hash updated_at, which
+-- every revision of an event moves on.
+CREATE INDEX "event_start_time_idx" ON "event"("start_time" DESC)
+    INCLUDE ("event_id", "updated_at", "country_id", "magnitude_value", "depth");
+
+-- Lets the snapshot job, the dashboard and its event store find the events added
+-- or revised since their watermarks. The pipeline can revise an event without
+-- changing its creation_time, but every revision moves updated_at.
+CREATE INDEX "event_updated_at_idx" ON "event"("updated_at");
+
+-- Serves the /<country_name> API endpoint as a single index seek.
+CREATE INDEX "event_country_id_start_time_idx" ON "event"("country_id", "start_time" DESC);
+
+-- 1 degree grid cell of each event, used by the /near and /bbox API endpoints.
+-- Must match GRID_CELL_SQL in app/geo.py.
+CREATE INDEX "event_grid_cell_idx" ON "event"(
+    ((FLOOR("latitude")::INTEGER + 90) * 360 + FLOOR("longitude")::INTEGER + 180)
+);
+
+-- Lets the alerts Lambda reconcile SNS subscriptions for only the subscribers whose
+-- preferences changed since its last run. policy_hash is the hash of the filter
+-- policy last applied to SNS, and writing it does not move updated_at.
+CREATE INDEX "subscriber_updated_at_idx" ON "subscriber"("updated_at");
+
+CREATE FUNCTION touch_subscriber_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW() AT TIME ZONE 'utc';
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER "subscriber_touch_updated_at"
+    BEFORE UPDATE OF "subscriber_email", "country_id", "magnitude_value",
+        "home_latitude", "home_longitude", "radius_km" ON "subscriber"
+    FOR EACH ROW EXECUTE FUNCTION touch_subscriber_updated_at();
+
+-- Months an event's start_time has been revised out of, with when, so the snapshot
+-- job rewrites the month the event left as well as the one it moved to.
+CREATE TABLE "event_moved_month"(
+    "month" TIMESTAMP(0) WITHOUT TIME ZONE NOT NULL,
+    "updated_at" TIMESTAMP(0) WITHOUT TIME ZONE NOT NULL
+);
+ALTER TABLE
+    "event_moved_month" ADD PRIMARY KEY("month");
+
+CREATE FUNCTION touch_event_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW() AT TIME ZONE 'utc';
+    IF date_trunc('month', NEW.start_time) <> date_trunc('month', OLD.start_time) THEN
+        INSERT INTO event_moved_month (month, updated_at)
+        VALUES (date_trunc('month', OLD.start_time), NEW.updated_at)
+        ON CONFLICT (month) DO UPDATE SET updated_at = EXCLUDED.updated_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER "event_touch_updated_at"
+    BEFORE UPDATE ON "event"
+    FOR EACH ROW EXECUTE FUNCTION touch_event_updated_at();
+
+-- Lets the alerts Lambda check whether its in-memory spatial index of radius
+-- subscribers is still current without reading them all. Every change to a radius
+-- subscriber adds one in its own transaction, so the new version is seen exactly
+-- when the change commits, however close together or late changes commit.
+CREATE TABLE "radius_subscriber_version"(
+    "version" BIGINT NOT NULL
+);
+INSERT INTO "radius_subscriber_version" ("version") VALUES (0);
+
+CREATE FUNCTION bump_radius_subscriber_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE radius_subscriber_version SET version = version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER "subscriber_radius_version_insert"
+    AFTER INSERT ON "subscriber"
+    FOR EACH ROW WHEN (NEW.radius_km IS NOT NULL)
+    EXECUTE FUNCTION bump_radius_subscriber_version();
+
+CREATE TRIGGER "subscriber_radius_version_update"
+    AFTER UPDATE OF "subscriber_name", "subscriber_email", "weekly", "country_id",
+        "magnitude_value", "home_latitude", "home_longitude", "radius_km" ON "subscriber"
+    FOR EACH ROW WHEN (OLD.radius_km IS NOT NULL OR NEW.radius_km IS NOT NULL)
+    EXECUTE FUNCTION bump_radius_subscriber_version();
+
+CREATE TRIGGER "subscriber_radius_version_delete"
+    AFTER DELETE ON "subscriber"
+    FOR EACH ROW WHEN (OLD.radius_km IS NOT NULL)
+    EXECUTE FUNCTION bump_radius_subscriber_version();
 --
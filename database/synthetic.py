@@ -0,0 +1,93 @@
+"""This script fills the event table with synthetic earthquakes for benchmarking."""
+
+import argparse
+import logging
+
+from dotenv import load_dotenv
+
+from seed import get_db_connection
+
+logging.basicConfig(level=logging.INFO)
+
+CHUNK_SIZE = 500_000
+
+# Roughly half of the rows land near a handful of seismic hotspots so the
+# data is as clustered as the real USGS feed, the rest are spread globally.
+INSERT_SYNTHETIC_EVENTS = """
+    INSERT INTO event (usgs_event_id, start_time, description, creation_time,
+        longitude, latitude, depth, depth_uncertainty, used_phase_count,
+        used_station_count, azimuthal_gap, magnitude_value, magnitude_uncertainty,
+        magnitude_type_id, country_id)
+    SELECT
+        'synthetic' || (%(offset)s + g),
+        t,
+        'Synthetic earthquake ' || (%(offset)s + g),
+        t + INTERVAL '2 minutes',
+        CASE WHEN hot < 0.5
+             THEN (ARRAY[-122.4, 139.7, -70.6, 28.9, 120.9])[1 + (g %% 5)] + (random() - 0.5) * 8
+             ELSE random() * 360 - 180 END,
+        CASE WHEN hot < 0.5
+             THEN (ARRAY[37.8, 35.7, -33.4, 41.0, 23.7])[1 + (g %% 5)] + (random() - 0.5) * 8
+             ELSE random() * 140 - 65 END,
+        random() * 300000,
+        random() * 1000,
+        (random() * 100)::SMALLINT,
+        (random() * 100)::SMALLINT,
+        (random() * 360)::SMALLINT,
+        ROUND((POWER(random(), 3) * 8 - 1)::NUMERIC, 2),
+        random(),
+        %(magnitude_type_id)s,
+        (%(country_ids)s::SMALLINT[])[1 + (random() * (%(country_count)s - 1))::INT]
+    FROM (
+        SELECT g, random() AS hot,
+               (NOW() AT TIME ZONE 'utc') - random() * (%(days)s * INTERVAL '1 day') AS t
+        FROM generate_series(1, %(rows)s) AS g
+    ) AS s;
+"""
+
+
+def insert_synthetic_events(conn, rows: int, days: int) -> None:
+    """Inserts the requested number of synthetic events in chunks."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT country_id FROM country ORDER BY country_id;")
+        country_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT MIN(magnitude_type_id) FROM magnitude_type;")
+        magnitude_type_id = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM event;")
+        offset = cur.fetchone()[0]
+
+    if not country_ids or magnitude_type_id is None:
+        raise RuntimeError("Seed the country and magnitude_type tables first.")
+
+    inserted = 0
+    while inserted < rows:
+        chunk = min(CHUNK_SIZE, rows - inserted)
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(INSERT_SYNTHETIC_EVENTS, {
+                    "offset": offset + inserted,
+                    "rows": chunk,
+                    "days": days,
+                    "magnitude_type_id": magnitude_type_id,
+                    "country_ids": country_ids,
+                    "country_count": len(country_ids),
+                })
+        inserted += chunk
+        logging.info(f"Inserted {inserted}/{rows} synthetic events.")
+
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE event;")
+    conn.autocommit = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = get_db_connection()
+    insert_synthetic_events(conn, args.rows, args.days)
+    conn.close()
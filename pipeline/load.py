@@ -1,10 +1,14 @@
 """Load script to upload transformed data into database"""
 
+import json
 from os import environ as ENV, _Environ
 from dotenv import load_dotenv
 import psycopg2
 from opencage.geocoder import OpenCageGeocode
 
+FEED_CHANNEL = "event_upserted"
+NOTIFY_BATCH_SIZE = 100
+
 
 def get_connection(config: _Environ):
     """Connection to RDS instance"""
@@ -118,9 +122,20 @@ def upload_data(conn, new_events):
 
     with conn.cursor() as cur:
         cur.executemany(upsert_query, new_events)
+        notify_new_events(cur, [e["usgs_event_id"] for e in new_events])
     conn.commit()
 
 
+def notify_new_events(cur, usgs_event_ids: list[str]):
+    """
+    Tells the API live feed which events were upserted. Notifications are sent on
+    commit, in batches that stay under Postgres's 8000 byte payload limit.
+    """
+    for i in range(0, len(usgs_event_ids), NOTIFY_BATCH_SIZE):
+        cur.execute("SELECT pg_notify(%s, %s);",
+                    (FEED_CHANNEL, json.dumps(usgs_event_ids[i:i + NOTIFY_BATCH_SIZE])))
+
+
 def filter_new_events(conn, events):
     """Return only events not already in the database"""
     if not events:
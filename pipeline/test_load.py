@@ -4,7 +4,8 @@
 
 import pytest
 
-from load import get_magnitude_type_id, get_location_id, upload_data, filter_new_events
+from load import (get_magnitude_type_id, get_location_id, upload_data, filter_new_events,
+                  notify_new_events, FEED_CHANNEL)
 
 
 def test_get_magnitude_type_id_maps_value(mocker, test_earthquake_data):
@@ -61,6 +62,20 @@ def test_upload_data_executes_and_commits(mocker, test_earthquake_data):
     assert data == test_earthquake_data
 
 
+def test_upload_data_notifies_feed(mocker, test_earthquake_data):
+    conn = mocker.MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    upload_data(conn, test_earthquake_data)
+    cur.execute.assert_called_once_with(
+        "SELECT pg_notify(%s, %s);", (FEED_CHANNEL, '["75306651"]'))
+
+
+def test_notify_new_events_batches(mocker):
+    cur = mocker.MagicMock()
+    notify_new_events(cur, [str(i) for i in range(250)])
+    assert cur.execute.call_count == 3
+
+
 def test_upload_data_with_empty_events(mocker):
     conn = mocker.MagicMock()
     cur = conn.cursor.return_value.__enter__.return_value
@@ -0,0 +1,34 @@
+"""This script contains fixtures to be used across all tests in this directory."""
+# pylint: skip-file
+from unittest.mock import MagicMock
+
+import pytest
+
+MONTH_CSV = (
+    "event_id,start_time,creation_time,description,latitude,longitude,depth,"
+    "magnitude_value,country_id,country_name\n"
+    "1,2026-02-01 03:00:00,2026-02-01 03:05:00,5 km NW of Ridgeway,60.5,-151.1,10200,"
+    "5.6,235,United States of America\n"
+    "2,2026-02-09 12:30:00,2026-02-09 12:31:00,South Atlantic Ocean,-40.1,-20.2,8000,"
+    "4.1,,\n"
+)
+
+
+@pytest.fixture
+def mock_db():
+    """Builds a mocked psycopg2 connection and cursor."""
+    def make_mock_db(rows=(), csv=MONTH_CSV):
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = list(rows)
+        mock_cursor.fetchone.side_effect = lambda: rows[0] if rows else None
+        mock_cursor.mogrify.return_value = b"SELECT 1"
+        mock_cursor.copy_expert.side_effect = lambda sql, buffer: buffer.write(csv.encode())
+
+        mock_cursor.__enter__.return_value = mock_cursor
+        mock_cursor.__exit__.return_value = None
+
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        return mock_conn, mock_cursor
+
+    return make_mock_db
@@ -0,0 +1,226 @@
+"""
+Lambda handler that snapshots the event table, joined with country, into Parquet
+files partitioned by month, for the dashboard to scan instead of the database.
+"""
+
+import io
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from os import environ as ENV
+
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+from pyarrow import fs
+from dotenv import load_dotenv
+from psycopg2 import connect, Error
+from psycopg2.extensions import connection
+
+logging.basicConfig(level=logging.INFO)
+
+MANIFEST = "_manifest.json"
+ROW_GROUP_SIZE = 64_000
+# An event's updated_at is the start of the transaction that wrote it, which may
+# commit after a later one, so the watermark is set back by this much and anything
+# updated since is fetched again.
+WATERMARK_LAG = timedelta(hours=1)
+# Files replaced by a later run are deleted this long after, well past the
+# dashboard's SNAPSHOT_TTL_SECONDS, so a dataset it opened before still reads.
+RETIRED_FILE_GRACE = timedelta(hours=1)
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ("event_id", pa.int64()),
+    ("start_time", pa.timestamp("s")),
+    ("creation_time", pa.timestamp("s")),
+    ("description", pa.string()),
+    ("latitude", pa.float32()),
+    ("longitude", pa.float32()),
+    ("depth", pa.float32()),
+    ("magnitude_value", pa.float32()),
+    ("country_id", pa.int16()),
+    ("country_name", pa.dictionary(pa.int32(), pa.string())),
+])
+
+MONTH_QUERY = """
+    SELECT
+    e.event_id,
+    e.start_time,
+    e.creation_time,
+    e.description,
+    e.latitude,
+    e.longitude,
+    e.depth,
+    e.magnitude_value,
+    e.country_id,
+    c.country_name
+    FROM event e
+    LEFT JOIN country c
+    ON e.country_id = c.country_id
+    WHERE e.start_time >= %(month_start)s
+    AND e.start_time < %(month_end)s
+    ORDER BY e.start_time
+"""
+
+
+def get_db_connection() -> connection:
+    """Returns a database connection."""
+    try:
+        conn = connect(
+            user=ENV.get("DB_USERNAME"),
+            password=ENV.get("DB_PASSWORD"),
+            host=ENV.get("DB_HOST"),
+            port=ENV.get("DB_PORT"),
+            database=ENV.get("DB_NAME")
+        )
+        logging.info("Successfully connected to database.")
+        return conn
+    except Error as e:
+        logging.warning(f"Error connecting to database: {e}.")
+        return None
+
+
+def next_month(month: datetime) -> datetime:
+    """The first instant of the month after month."""
+    return (month.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def month_path(month: datetime, run_id: str) -> str:
+    """
+    Path, relative to the snapshot root, of the Parquet file one run writes for a
+    month's events. Each run writes new files rather than replacing the last ones.
+    """
+    return f"month={month:%Y-%m}/part-{run_id}.parquet"
+
+
+def read_manifest(filesystem: fs.FileSystem, root: str) -> dict:
+    """The manifest of the last snapshot, or None if there is none."""
+    try:
+        with filesystem.open_input_stream(f"{root}/{MANIFEST}") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(filesystem: fs.FileSystem, root: str, manifest: dict) -> None:
+    """
+    Writes the manifest, once every file it lists has been written: the updated_at
+    watermark, the current file of each month and the files replaced, with when.
+    """
+    with filesystem.open_output_stream(f"{root}/{MANIFEST}") as f:
+        f.write(json.dumps(manifest).encode())
+
+
+def get_watermark(conn: connection) -> datetime:
+    """The updated_at up to which this run's snapshot is complete."""
+    with conn.cursor() as curs:
+        curs.execute("SELECT MAX(updated_at) FROM event")
+        latest = curs.fetchone()[0]
+    return latest - WATERMARK_LAG if latest else None
+
+
+def changed_months(conn: connection, since: datetime = None) -> list[datetime]:
+    """
+    Months with events added or revised at or after since, and months an event was
+    revised out of, or all months.
+    """
+    query = "SELECT DISTINCT date_trunc('month', start_time) AS month FROM event"
+    params = {}
+    if since is not None:
+        query = """
+            SELECT date_trunc('month', start_time) AS month FROM event
+            WHERE updated_at >= %(since)s
+            UNION
+            SELECT month FROM event_moved_month
+            WHERE updated_at >= %(since)s
+        """
+        params["since"] = since
+    with conn.cursor() as curs:
+        curs.execute(query + " ORDER BY month", params)
+        return [row[0] for row in curs.fetchall()]
+
+
+def fetch_month(conn: connection, month: datetime) -> pa.Table:
+    """One month's events, read through COPY into the snapshot schema."""
+    buffer = io.BytesIO()
+    with conn.cursor() as curs:
+        sql = curs.mogrify(MONTH_QUERY, {"month_start": month,
+                                         "month_end": next_month(month)}).decode()
+        curs.copy_expert(f"COPY ({sql}) TO STDOUT WITH CSV HEADER", buffer)
+    buffer.seek(0)
+    return pv.read_csv(buffer, convert_options=pv.ConvertOptions(
+        column_types=SNAPSHOT_SCHEMA, strings_can_be_null=True))
+
+
+def write_month(filesystem: fs.FileSystem, root: str, month: datetime, run_id: str,
+                table: pa.Table) -> str:
+    """
+    Writes one month's file for this run and returns its path relative to root.
+    Rows are in start_time order, so each row group's statistics let readers skip
+    the groups outside their range.
+    """
+    path = month_path(month, run_id)
+    filesystem.create_dir(f"{root}/{path.rsplit('/', 1)[0]}")
+    pq.write_table(table, f"{root}/{path}", filesystem=filesystem,
+                   row_group_size=ROW_GROUP_SIZE, compression="zstd")
+    return path
+
+
+def delete_files(filesystem: fs.FileSystem, root: str, paths: list[str]) -> None:
+    """Deletes replaced files, skipping any already gone."""
+    for path in paths:
+        try:
+            filesystem.delete_file(f"{root}/{path}")
+        except FileNotFoundError:
+            pass
+
+
+def handler(event, context):
+    """
+    Writes new files for the months with events updated since the last snapshot's
+    watermark, or every month when there is no snapshot yet or the event asks
+    for {"full": true}, then moves the manifest on to them. The files they replace
+    are deleted RETIRED_FILE_GRACE later, by a later run.
+    """
+    load_dotenv()
+    filesystem, root = fs.FileSystem.from_uri(ENV["SNAPSHOT_URI"])
+    manifest = read_manifest(filesystem, root) or {}
+    started = datetime.now(timezone.utc).replace(tzinfo=None)
+    run_id = f"{started:%Y%m%dT%H%M%S}"
+
+    conn = get_db_connection()
+    watermark = get_watermark(conn)
+    since = None
+    if "updated_at" in manifest and not (event or {}).get("full"):
+        since = datetime.fromisoformat(manifest["updated_at"])
+    months = changed_months(conn, since)
+
+    files = dict(manifest.get("files", {}))
+    retired = dict(manifest.get("retired", {}))
+    rows = 0
+    for month in months:
+        table = fetch_month(conn, month)
+        path = write_month(filesystem, root, month, run_id, table)
+        key = f"{month:%Y-%m}"
+        if key in files and files[key] != path:
+            retired[files[key]] = started.isoformat()
+        files[key] = path
+        rows += table.num_rows
+        logging.info(f"Wrote {table.num_rows} events for {month:%Y-%m}.")
+    conn.close()
+
+    if watermark is not None:
+        expired = [path for path, at in retired.items()
+                   if started - datetime.fromisoformat(at) >= RETIRED_FILE_GRACE]
+        write_manifest(filesystem, root, {
+            "updated_at": watermark.isoformat(),
+            "files": dict(sorted(files.items())),
+            "retired": {path: at for path, at in retired.items() if path not in expired},
+        })
+        delete_files(filesystem, root, expired)
+    logging.info(f"Snapshot of {len(months)} months, {rows} events, complete.")
+    return {"status": "success", "months": len(months), "rows": rows}
+
+
+if __name__ == "__main__":
+    handler({"full": True}, None)
@@ -0,0 +1,131 @@
+"""Tests for the event table snapshot job."""
+# pylint: skip-file
+from datetime import datetime
+from unittest.mock import patch
+
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+import snapshot
+from snapshot import (SNAPSHOT_SCHEMA, RETIRED_FILE_GRACE, next_month, month_path,
+                      read_manifest, write_manifest, get_watermark, changed_months,
+                      fetch_month, write_month, handler)
+
+
+def test_next_month_rolls_over_year():
+    assert next_month(datetime(2025, 12, 1)) == datetime(2026, 1, 1)
+    assert next_month(datetime(2026, 1, 31)) == datetime(2026, 2, 1)
+
+
+def test_changed_months_since_watermark(mock_db):
+    conn, cursor = mock_db([(datetime(2026, 2, 1),)])
+
+    months = changed_months(conn, datetime(2026, 2, 9))
+
+    query, params = cursor.execute.call_args[0]
+    assert "updated_at >= %(since)s" in query
+    assert "FROM event_moved_month" in query
+    assert params == {"since": datetime(2026, 2, 9)}
+    assert months == [datetime(2026, 2, 1)]
+
+
+def test_changed_months_without_watermark_reads_all(mock_db):
+    conn, cursor = mock_db([])
+
+    changed_months(conn)
+
+    assert "WHERE" not in cursor.execute.call_args[0][0]
+
+
+def test_get_watermark_lags_latest_updated_at(mock_db):
+    conn, _ = mock_db([(datetime(2026, 2, 9, 12),)])
+
+    assert get_watermark(conn) == datetime(2026, 2, 9, 11)
+
+
+def test_fetch_month_uses_snapshot_schema(mock_db):
+    conn, cursor = mock_db()
+
+    table = fetch_month(conn, datetime(2026, 2, 1))
+
+    assert cursor.mogrify.call_args[0][1] == {"month_start": datetime(2026, 2, 1),
+                                              "month_end": datetime(2026, 3, 1)}
+    assert table.schema == SNAPSHOT_SCHEMA
+    assert table.column("country_name").to_pylist() == ["United States of America", None]
+    assert table.column("country_id").to_pylist() == [235, None]
+
+
+def test_write_month_and_manifest(mock_db, tmp_path):
+    conn, _ = mock_db()
+    local = fs.LocalFileSystem()
+
+    table = fetch_month(conn, datetime(2026, 2, 1))
+    path = write_month(local, str(tmp_path), datetime(2026, 2, 1), "20260209T123500", table)
+    write_manifest(local, str(tmp_path), {"updated_at": "2026-02-09T11:31:00"})
+
+    assert path == month_path(datetime(2026, 2, 1), "20260209T123500")
+    assert path == "month=2026-02/part-20260209T123500.parquet"
+    table = pq.read_table(tmp_path / path)
+    assert table.column("event_id").to_pylist() == [1, 2]
+    assert read_manifest(local, str(tmp_path)) == {"updated_at": "2026-02-09T11:31:00"}
+
+
+def test_read_manifest_missing(tmp_path):
+    assert read_manifest(fs.LocalFileSystem(), str(tmp_path)) is None
+
+
+class FrozenDatetime(datetime):
+    current = datetime(2026, 2, 9, 12, 35)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current.replace(tzinfo=tz)
+
+
+@patch("snapshot.get_db_connection")
+def test_handler_rewrites_changed_months(mock_get_conn, mock_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("SNAPSHOT_URI", str(tmp_path))
+    monkeypatch.setattr(snapshot, "datetime", FrozenDatetime)
+    write_manifest(fs.LocalFileSystem(), str(tmp_path), {"updated_at": "2026-02-01T00:00:00"})
+    conn, cursor = mock_db([(datetime(2026, 2, 1),)])
+    cursor.fetchone.side_effect = lambda: (datetime(2026, 2, 9, 12, 31),)
+    mock_get_conn.return_value = conn
+
+    result = handler({}, None)
+
+    assert result == {"status": "success", "months": 1, "rows": 2}
+    assert cursor.execute.call_args_list[1][0][1] == {"since": datetime(2026, 2, 1)}
+    assert (tmp_path / "month=2026-02" / "part-20260209T123500.parquet").exists()
+    assert read_manifest(fs.LocalFileSystem(), str(tmp_path)) == {
+        "updated_at": "2026-02-09T11:31:00",
+        "files": {"2026-02": "month=2026-02/part-20260209T123500.parquet"},
+        "retired": {}}
+
+
+@patch("snapshot.get_db_connection")
+def test_handler_keeps_replaced_files_for_the_grace_period(mock_get_conn, mock_db, tmp_path,
+                                                          monkeypatch):
+    monkeypatch.setenv("SNAPSHOT_URI", str(tmp_path))
+    monkeypatch.setattr(snapshot, "datetime", FrozenDatetime)
+    conn, cursor = mock_db([(datetime(2026, 2, 1),)])
+    cursor.fetchone.side_effect = lambda: (datetime(2026, 2, 9, 12, 31),)
+    mock_get_conn.return_value = conn
+    first = tmp_path / "month=2026-02" / "part-20260209T123500.parquet"
+
+    handler({}, None)
+    monkeypatch.setattr(FrozenDatetime, "current", datetime(2026, 2, 9, 13, 35))
+    handler({}, None)
+
+    assert first.exists()
+    assert read_manifest(fs.LocalFileSystem(), str(tmp_path))["retired"] == {
+        "month=2026-02/part-20260209T123500.parquet": "2026-02-09T13:35:00"}
+
+    monkeypatch.setattr(FrozenDatetime, "current",
+                        datetime(2026, 2, 9, 13, 35) + RETIRED_FILE_GRACE)
+    handler({"full": True}, None)
+
+    manifest = read_manifest(fs.LocalFileSystem(), str(tmp_path))
+    assert not first.exists()
+    assert manifest["files"] == {"2026-02": "month=2026-02/part-20260209T143500.parquet"}
+    assert list(manifest["retired"]) == ["month=2026-02/part-20260209T133500.parquet"]
+    assert "WHERE" not in cursor.execute.call_args_list[-1][0][0]
@@ -472,3 +472,71 @@ resource "aws_lambda_function" "pipeline_lambda" {
   tags = local.common_tags
 }
 
+
+# Event snapshots (Parquet, partitioned by month)
+
+resource "aws_s3_bucket" "snapshots" {
+  bucket = "${local.name_prefix}-event-snapshots"
+  tags   = local.common_tags
+}
+
+resource "aws_iam_policy" "lambda_write_snapshots" {
+  name = "${local.name_prefix}-lambda-write-snapshots"
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect   = "Allow"
+      Action   = ["s3:GetObject", "s3:PutObject", "s3:DeleteObject", "s3:ListBucket"]
+      Resource = [aws_s3_bucket.snapshots.arn, "${aws_s3_bucket.snapshots.arn}/*"]
+    }]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "lambda_write_snapshots" {
+  role       = aws_iam_role.lambda_exec.name
+  policy_arn = aws_iam_policy.lambda_write_snapshots.arn
+}
+
+resource "aws_lambda_function" "snapshot" {
+  count         = var.enable_snapshot_lambda ? 1 : 0
+  function_name = "${local.name_prefix}-snapshot"
+  role          = aws_iam_role.lambda_exec.arn
+
+  package_type = "Image"
+  image_uri    = var.snapshot_image_uri
+
+  timeout     = 900
+  memory_size = 2048
+
+  environment {
+    variables = merge(var.lambda_env, {
+      SNAPSHOT_URI = "s3://${aws_s3_bucket.snapshots.bucket}/events"
+    })
+  }
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_rule" "snapshot" {
+  name                = "${local.name_prefix}-snapshot"
+  description         = "Snapshot the event table to Parquet"
+  schedule_expression = var.snapshot_schedule_expression
+  tags                = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "snapshot_target" {
+  count     = var.enable_snapshot_lambda ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.snapshot.name
+  target_id = "snapshot-lambda"
+  arn       = aws_lambda_function.snapshot[0].arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_snapshot" {
+  count         = var.enable_snapshot_lambda ? 1 : 0
+  statement_id  = "AllowSnapshotFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.snapshot[0].function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.snapshot.arn
+}
@@ -31,4 +31,9 @@ output "ecr_repository_urls" {
     for k, r in aws_ecr_repository.repositories :
     k => r.repository_url
   }
-}
\ No newline at end of file
+}
+
+output "snapshot_bucket" {
+  value       = aws_s3_bucket.snapshots.bucket
+  description = "S3 bucket holding the monthly Parquet event snapshots"
+}
@@ -206,6 +206,12 @@ variable "ecr_repositories" {
         force_delete = true
         retention_days = 30
         }
+      snapshot = {
+        mutable_tags = true
+        scan_on_push = true
+        force_delete = true
+        retention_days = 30
+        }
     }
 }
 
@@ -255,4 +261,22 @@ variable "pipeline_image_uri" {
   type = string
   description = "ECR image URI for the pipeline Lambda"
   default = ""
-}
\ No newline at end of file
+}
+
+variable "enable_snapshot_lambda" {
+  type = bool
+  description = "Create the event snapshot Lambda and its trigger"
+  default = false
+}
+
+variable "snapshot_image_uri" {
+  type = string
+  description = "ECR image URI for the snapshot Lambda"
+  default = ""
+}
+
+variable "snapshot_schedule_expression" {
+  type = string
+  description = "EventBridge schedule for the event snapshot"
+  default = "rate(1 hour)"
+}